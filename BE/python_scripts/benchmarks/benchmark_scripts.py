@@ -0,0 +1,320 @@
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+# Benchmarks the prediction scripts against the models in python_scripts/models and writes the
+# results as JSON, so that the process-per-request, daemon (--serve) and batched modes can be
+# compared on the same hardware.
+#
+# Usage: python benchmarks/benchmark_scripts.py [--output PATH] [--requests N] [--batch-sizes 1,8,64]
+#
+# Every result contains:
+# - cold_start: wall time of a complete one-shot run of the script (process per request)
+# - warm_latency: per-request latency of a running --serve worker, one input row per subject
+# - throughput: input rows per second of a running worker for several batch sizes
+# - peak_rss_kb: peak resident set size of the measured processes
+# subject_clustering.py is measured with the requests of SubjectService.getSimilarSubjects
+# (cluster assignment, ranking and paging) in both modes. Its requests always carry the focus
+# vectors of CHOSEN_SUBJECTS subjects, so its throughput is in requests per second.
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+
+# Subject -> (mark model, chance model, input size), same models as in SubjectService
+SUBJECTS = {
+    "Matematicka analyza 1": ("mata1.h5", "mata1.pkl", 3),
+    "Diskretna pravdepodobnost": ("dp.h5", "dp.pkl", 2),
+    "Algoritmy a udajove struktury 1": ("aus1.h5", "aus1.pkl", 3),
+    "Diskretna simulacia": ("best_model_DIS.h5", "model_DIS.pkl", 3),
+    "Optimalizacia sieti": ("best_model_OPTS.h5", "model_OPTS.pkl", 3),
+    "Algoritmy a udajove struktury 2": ("best_model_AUS.h5", "model_AUS.pkl", 3),
+}
+
+MARK_MODEL_PATHS = {subject: os.path.join(MODELS_DIR, files[0]) for subject, files in SUBJECTS.items()}
+CHANCE_MODEL_PATHS = {subject: os.path.join(MODELS_DIR, files[1]) for subject, files in SUBJECTS.items()}
+CLUSTERING_MODEL_PATHS = [os.path.join(MODELS_DIR, "kmeans_model.pkl"),
+                          os.path.join(MODELS_DIR, "kmeans_model_manazment.pkl")]
+# Study program of kmeans_model.pkl, see kmeans_model.meta.json
+CLUSTERING_STUDY_PROGRAM_ID = 3
+CLUSTERING_TOP_K = 10
+CLUSTERING_MODES = ("blend", "union")
+
+# Encoded marks 0-6 (see MARK_MAPPING in SubjectService), focus values 0-10 with 12 features
+MARK_VALUES = 7
+FOCUS_VALUES = 11
+FOCUS_FEATURES = 12
+CHOSEN_SUBJECTS = 3
+
+
+def random_rows(input_size, count, rng):
+    return [[rng.randrange(MARK_VALUES) for _ in range(input_size)] for _ in range(count)]
+
+
+def random_request(batch_size, rng):
+    """
+    :param batch_size: Number of input rows per subject, None for a single row.
+    :return: Request data with random encoded marks for every subject.
+    """
+    return {
+        subject: random_rows(input_size, 1, rng)[0] if batch_size is None else random_rows(input_size, batch_size, rng)
+        for subject, (_, _, input_size) in SUBJECTS.items()
+    }
+
+
+def random_focus_rows(rng):
+    return [[rng.randrange(FOCUS_VALUES) for _ in range(FOCUS_FEATURES)] for _ in range(CHOSEN_SUBJECTS)]
+
+
+def random_clustering_request(mode, rng):
+    return {"studyProgramId": CLUSTERING_STUDY_PROGRAM_ID, "focusVectors": random_focus_rows(rng), "mode": mode,
+            "topK": CLUSTERING_TOP_K, "offset": 0}
+
+
+def percentile(sorted_values, percent):
+    """
+    :return: Nearest-rank percentile of the sorted values.
+    """
+    rank = max(1, -(-len(sorted_values) * percent // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def latency_summary(seconds):
+    values = sorted(seconds)
+    return {
+        "requests": len(values),
+        "mean_ms": round(sum(values) / len(values) * 1000, 3),
+        "p50_ms": round(percentile(values, 50) * 1000, 3),
+        "p95_ms": round(percentile(values, 95) * 1000, 3),
+        "p99_ms": round(percentile(values, 99) * 1000, 3),
+    }
+
+
+def wait_for_exit(process):
+    """
+    Wait for the process and return its peak RSS in kB (ru_maxrss of the child on Linux).
+    """
+    _, status, usage = os.wait4(process.pid, 0)
+    process.returncode = os.waitstatus_to_exitcode(status)
+    return usage.ru_maxrss
+
+
+def run_once(arguments, input_text=None):
+    """
+    Run a script to completion.
+    :param arguments: Script name followed by its arguments.
+    :param input_text: Optional request written to stdin.
+    :return: Tuple of wall time in seconds and peak RSS in kB.
+    """
+    start = time.perf_counter()
+    process = subprocess.Popen([sys.executable, *arguments], cwd=SCRIPTS_DIR, stdin=subprocess.PIPE,
+                               stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    process.stdin.write(input_text or "")
+    process.stdin.close()
+    process.stdout.read()
+    process.stdout.close()
+    peak_rss_kb = wait_for_exit(process)
+    elapsed = time.perf_counter() - start
+
+    if process.returncode != 0:
+        raise RuntimeError(f"{arguments[0]} exited with code {process.returncode}")
+    return elapsed, peak_rss_kb
+
+
+def measure_cold_start(arguments, runs, input_text=None):
+    measurements = [run_once(arguments, input_text) for _ in range(runs)]
+    summary = latency_summary([elapsed for elapsed, _ in measurements])
+    summary["peak_rss_kb"] = max(peak_rss_kb for _, peak_rss_kb in measurements)
+    return summary
+
+
+class ServeWorker:
+    """
+    Script started with --serve, answering one newline-delimited JSON request at a time.
+    """
+
+    def __init__(self, arguments):
+        start = time.perf_counter()
+        self.process = subprocess.Popen([sys.executable, *arguments, "--serve"], cwd=SCRIPTS_DIR,
+                                        stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+                                        stderr=subprocess.DEVNULL, text=True)
+        ready = json.loads(self.process.stdout.readline())
+        if not ready.get("ready"):
+            raise RuntimeError(f"{arguments[0]} did not start: {ready}")
+        self.startup_seconds = time.perf_counter() - start
+
+    def request(self, data):
+        """
+        :param data: Subject -> input dictionary of a prediction request.
+        :return: Tuple of the response and the round trip time in seconds.
+        """
+        return self.call({"data": data})
+
+    def call(self, request):
+        """
+        :param request: Complete request of the script.
+        :return: Tuple of the response and the round trip time in seconds.
+        """
+        start = time.perf_counter()
+        self.process.stdin.write(json.dumps(request) + "\n")
+        self.process.stdin.flush()
+        response = json.loads(self.process.stdout.readline())
+        elapsed = time.perf_counter() - start
+
+        if "error" in response:
+            raise RuntimeError(response["error"])
+        return response, elapsed
+
+    def close(self):
+        """
+        :return: Peak RSS of the worker in kB.
+        """
+        self.process.stdin.close()
+        self.process.stdout.read()
+        self.process.stdout.close()
+        return wait_for_exit(self.process)
+
+
+def measure_worker(arguments, requests, batch_sizes, rng):
+    """
+    Measure warm latency and throughput of one --serve worker.
+    :return: Dictionary with the worker results.
+    """
+    worker = ServeWorker(arguments)
+    try:
+        first_request_seconds = worker.request(random_request(None, rng))[1]
+        for _ in range(3):
+            worker.request(random_request(None, rng))
+
+        latencies = [worker.request(random_request(None, rng))[1] for _ in range(requests)]
+
+        throughput = {}
+        for batch_size in batch_sizes:
+            batch_requests = max(1, requests // batch_size)
+            data = [random_request(batch_size, rng) for _ in range(batch_requests)]
+            elapsed = sum(worker.request(request_data)[1] for request_data in data)
+            rows = batch_requests * batch_size * len(SUBJECTS)
+            throughput[str(batch_size)] = {
+                "requests": batch_requests,
+                "rows_per_second": round(rows / elapsed, 1),
+                "mean_request_ms": round(elapsed / batch_requests * 1000, 3),
+            }
+    finally:
+        peak_rss_kb = worker.close()
+
+    return {
+        "startup_ms": round(worker.startup_seconds * 1000, 3),
+        "first_request_ms": round(first_request_seconds * 1000, 3),
+        "warm_latency": latency_summary(latencies),
+        "throughput": throughput,
+        "peak_rss_kb": peak_rss_kb,
+    }
+
+
+def benchmark_prediction_script(script, model_arguments, table_path, runs, requests, batch_sizes, rng):
+    """
+    Benchmark a prediction script with the models and with the prediction tables (--lookup).
+    :param script: Script file name.
+    :param model_arguments: JSON model path arguments of the script.
+    :return: Dictionary with mode names as keys and results as values.
+    """
+    input_json = json.dumps({"data": random_request(None, rng)})
+    results = {}
+
+    for mode, extra_arguments in (("model", []), ("lookup", ["--lookup", table_path])):
+        if extra_arguments:
+            run_once([script, input_json, *model_arguments, *extra_arguments])  # build the tables
+        results[mode] = {
+            "cold_start": measure_cold_start([script, input_json, *model_arguments, *extra_arguments], runs),
+            "serve": measure_worker([script, *model_arguments, *extra_arguments], requests, batch_sizes, rng),
+        }
+    return results
+
+
+def benchmark_clustering(runs, requests, rng):
+    """
+    Benchmark subject_clustering.py one-shot and as a --serve worker.
+    """
+    cold_start_arguments = ["subject_clustering.py", *CLUSTERING_MODEL_PATHS,
+                            "--study-program-id", str(CLUSTERING_STUDY_PROGRAM_ID), "--top-k", str(CLUSTERING_TOP_K)]
+    request = json.dumps({"focusVectors": random_focus_rows(rng)})
+    results = {"cold_start": measure_cold_start(cold_start_arguments, runs, request)}
+
+    worker = ServeWorker(["subject_clustering.py", *CLUSTERING_MODEL_PATHS])
+    try:
+        first_request_seconds = worker.call(random_clustering_request(CLUSTERING_MODES[0], rng))[1]
+        for _ in range(3):
+            worker.call(random_clustering_request(CLUSTERING_MODES[0], rng))
+
+        warm_latency = {}
+        throughput = {}
+        for mode in CLUSTERING_MODES:
+            latencies = [worker.call(random_clustering_request(mode, rng))[1] for _ in range(requests)]
+            warm_latency[mode] = latency_summary(latencies)
+            throughput[mode] = {"requests_per_second": round(len(latencies) / sum(latencies), 1)}
+    finally:
+        peak_rss_kb = worker.close()
+
+    results["serve"] = {
+        "startup_ms": round(worker.startup_seconds * 1000, 3),
+        "first_request_ms": round(first_request_seconds * 1000, 3),
+        "warm_latency": warm_latency,
+        "throughput": throughput,
+        "peak_rss_kb": peak_rss_kb,
+    }
+    return results
+
+
+def parse_batch_sizes(value):
+    return [int(size) for size in value.split(",")]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the prediction scripts.")
+    parser.add_argument("--output", help="file to write the JSON results to (stdout by default)")
+    parser.add_argument("--runs", type=int, default=5, help="one-shot runs per cold start measurement")
+    parser.add_argument("--requests", type=int, default=200, help="requests per warm latency measurement")
+    parser.add_argument("--batch-sizes", type=parse_batch_sizes, default=[1, 8, 64, 512],
+                        help="comma separated rows per subject of the throughput measurements")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random inputs")
+    arguments = parser.parse_args()
+
+    rng = random.Random(arguments.seed)
+    mark_paths_json = json.dumps(MARK_MODEL_PATHS)
+    chance_paths_json = json.dumps(CHANCE_MODEL_PATHS)
+    measurement = (arguments.runs, arguments.requests, arguments.batch_sizes, rng)
+
+    with tempfile.TemporaryDirectory() as table_dir:
+        table_path = os.path.join(table_dir, "prediction_tables.npz")
+        results = {
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "machine": platform.machine(),
+                "cpu_count": os.cpu_count(),
+                "seed": arguments.seed,
+            },
+            "neural_network_marks_predictions": benchmark_prediction_script(
+                "neural_network_marks_predictions.py", [mark_paths_json], table_path, *measurement),
+            "passing_chance_prediction": benchmark_prediction_script(
+                "passing_chance_prediction.py", [chance_paths_json], table_path, *measurement),
+            "subject_predictions": benchmark_prediction_script(
+                "subject_predictions.py", [mark_paths_json, chance_paths_json], table_path, *measurement),
+            "subject_clustering": benchmark_clustering(arguments.runs, arguments.requests, rng),
+        }
+
+    output = json.dumps(results, indent=4)
+    if arguments.output:
+        with open(arguments.output, "w") as f:
+            f.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
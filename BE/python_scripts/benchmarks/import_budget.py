@@ -0,0 +1,136 @@
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+# Reports how long the prediction scripts spend importing modules, measured with
+# python -X importtime, and checks the totals against import_budgets.json.
+#
+# Usage: python benchmarks/import_budget.py [--runs N] [--top N] [--budgets PATH]
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+DEFAULT_BUDGETS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "import_budgets.json")
+
+MARK_MODEL_PATHS = {"Matematicka analyza 1": os.path.join(MODELS_DIR, "mata1.h5")}
+CHANCE_MODEL_PATHS = {"Matematicka analyza 1": os.path.join(MODELS_DIR, "mata1.pkl")}
+INPUT_DATA = {"data": {"Matematicka analyza 1": [0, 1, 6]}}
+
+# Scenario name -> arguments of the script. "invalid" runs must fail before any model library
+# is imported, "predict" runs load the models and answer one request.
+SCENARIOS = {
+    "neural_network_marks_predictions.invalid": [
+        "neural_network_marks_predictions.py", "{", json.dumps(MARK_MODEL_PATHS)],
+    "neural_network_marks_predictions.predict": [
+        "neural_network_marks_predictions.py", json.dumps(INPUT_DATA), json.dumps(MARK_MODEL_PATHS)],
+    "passing_chance_prediction.invalid": [
+        "passing_chance_prediction.py", "{", json.dumps(CHANCE_MODEL_PATHS)],
+    "passing_chance_prediction.predict": [
+        "passing_chance_prediction.py", json.dumps(INPUT_DATA), json.dumps(CHANCE_MODEL_PATHS)],
+    "subject_predictions.invalid": [
+        "subject_predictions.py", "{", json.dumps(MARK_MODEL_PATHS), json.dumps(CHANCE_MODEL_PATHS)],
+    "subject_predictions.predict": [
+        "subject_predictions.py", json.dumps(INPUT_DATA), json.dumps(MARK_MODEL_PATHS),
+        json.dumps(CHANCE_MODEL_PATHS)],
+    "subject_clustering.invalid": [
+        "subject_clustering.py"],
+    "subject_clustering.predict": [
+        "subject_clustering.py", os.path.join(MODELS_DIR, "kmeans_model.pkl")],
+}
+
+# Scenario name -> request written to stdin
+SCENARIO_INPUTS = {
+    "subject_clustering.predict": json.dumps({"focusVectors": [[0] * 12]}),
+}
+
+
+def parse_importtime(stderr):
+    """
+    Parse the output of python -X importtime.
+    :param stderr: Standard error of the measured process.
+    :return: List of (module, self_us, cumulative_us, depth) in the order of the output.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|", 2)
+        module = name.strip()
+        depth = (len(name) - len(name.lstrip()) - 1) // 2
+        imports.append((module, int(self_us), int(cumulative_us), depth))
+    return imports
+
+
+def measure_scenario(arguments, input_text=None):
+    """
+    Run one scenario under python -X importtime.
+    :param arguments: Script name followed by its arguments.
+    :param input_text: Optional request written to stdin.
+    :return: Tuple of total import time in microseconds and imports as returned by parse_importtime.
+    """
+    process = subprocess.run([sys.executable, "-X", "importtime", *arguments], cwd=SCRIPTS_DIR, input=input_text,
+                             stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    imports = parse_importtime(process.stderr)
+    total_us = sum(cumulative_us for _, _, cumulative_us, depth in imports if depth == 0)
+    return total_us, imports
+
+
+def report_scenario(arguments, input_text, runs, top):
+    """
+    :return: Dictionary with the median total import time over the runs and the slowest
+             top-level imports of the median run.
+    """
+    measurements = sorted((measure_scenario(arguments, input_text) for _ in range(runs)), key=lambda m: m[0])
+    total_us, imports = measurements[len(measurements) // 2]
+    top_level = sorted((m for m in imports if m[3] == 0), key=lambda m: m[2], reverse=True)
+
+    return {
+        "total_ms": round(total_us / 1000, 1),
+        "modules": len(imports),
+        "top": [{"module": module, "cumulative_ms": round(cumulative_us / 1000, 1)}
+                for module, _, cumulative_us, _ in top_level[:top]],
+    }
+
+
+def load_budgets(budgets_path):
+    """
+    :return: Dictionary with scenario names as keys and budgets in milliseconds as values.
+    """
+    try:
+        with open(budgets_path) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report import times of the prediction scripts.")
+    parser.add_argument("--runs", type=int, default=3, help="runs per scenario, the median is reported")
+    parser.add_argument("--top", type=int, default=5, help="number of slowest top-level imports reported")
+    parser.add_argument("--budgets", default=DEFAULT_BUDGETS_PATH, help="JSON file with budgets in ms")
+    arguments = parser.parse_args()
+
+    budgets = load_budgets(arguments.budgets)
+    report = {}
+    over_budget = []
+
+    for scenario, scenario_arguments in SCENARIOS.items():
+        result = report_scenario(scenario_arguments, SCENARIO_INPUTS.get(scenario), arguments.runs, arguments.top)
+        budget_ms = budgets.get(scenario)
+        if budget_ms is not None:
+            result["budget_ms"] = budget_ms
+            result["within_budget"] = result["total_ms"] <= budget_ms
+            if not result["within_budget"]:
+                over_budget.append(scenario)
+        report[scenario] = result
+
+    print(json.dumps(report, indent=4))
+
+    if over_budget:
+        print(f"Import time over budget: {', '.join(over_budget)}", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+import json
+import os
+import signal
+import socketserver
+import struct
+import sys
+
+import numpy as np
+
+# Length-prefixed binary protocol over a Unix domain socket, used by the --socket mode of the
+# prediction scripts and by UnixSocketModelClient on the Java side. All integers are little-endian.
+#
+# Every message is a frame: uint32 payload length followed by the payload.
+# - Right after connecting, the server sends a hello frame with the UTF-8 subject names joined
+#   by "\n". The position of a name is its subject id in requests.
+# - Request payload: REQUEST_HEADER (uint8 request type, uint16 subject id, uint16 rows,
+#   uint8 columns) followed by rows * columns int8 encoded marks, row by row.
+# - Response payload: RESPONSE_HEADER (uint8 status, uint16 rows) followed by
+#   - for MARK: rows uint8 class ids (see DECODE_MAP in neural_network_marks_predictions.py)
+#   - for CHANCE: rows float32 passing probabilities from 0 to 1
+#   or, with status ERROR, a UTF-8 error message instead.
+# Requests are answered in order, one connection can send any number of them.
+
+FRAME_HEADER = struct.Struct("<I")
+REQUEST_HEADER = struct.Struct("<BHHB")
+RESPONSE_HEADER = struct.Struct("<BH")
+MAX_FRAME_BYTES = 1024 * 1024
+
+# Request types
+MARK = 1
+CHANCE = 2
+
+# Response statuses
+OK = 0
+ERROR = 1
+
+RESPONSE_DTYPES = {
+    MARK: np.dtype("u1"),
+    CHANCE: np.dtype("<f4"),
+}
+
+
+def read_exactly(stream, size):
+    """
+    :return: The bytes read, None if the stream ended before the first byte.
+    :raises ConnectionError: If the stream ended in the middle.
+    """
+    data = stream.read(size)
+    if not data:
+        return None
+    while len(data) < size:
+        chunk = stream.read(size - len(data))
+        if not chunk:
+            raise ConnectionError("Connection closed in the middle of a frame")
+        data += chunk
+    return data
+
+
+def read_frame(stream):
+    """
+    :return: Payload of the next frame, None if the stream ended.
+    """
+    header = read_exactly(stream, FRAME_HEADER.size)
+    if header is None:
+        return None
+    (length,) = FRAME_HEADER.unpack(header)
+    if length > MAX_FRAME_BYTES:
+        raise ConnectionError(f"Frame of {length} bytes is larger than {MAX_FRAME_BYTES}")
+    return read_exactly(stream, length) if length else b""
+
+
+def write_frame(stream, payload):
+    stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+    stream.flush()
+
+
+def parse_request(payload, subjects):
+    """
+    :return: Tuple of the request type, subject name and int8 array with one input row per row.
+    :raises ValueError: If the payload does not match its header.
+    """
+    if len(payload) < REQUEST_HEADER.size:
+        raise ValueError("Request is shorter than its header.")
+    request_type, subject_id, rows, columns = REQUEST_HEADER.unpack_from(payload)
+    marks = payload[REQUEST_HEADER.size:]
+    if len(marks) != rows * columns:
+        raise ValueError(f"Request does not contain {rows}x{columns} marks.")
+    if subject_id >= len(subjects):
+        raise ValueError(f"Unknown subject id {subject_id}.")
+    return request_type, subjects[subject_id], np.frombuffer(marks, dtype=np.int8).reshape(rows, columns)
+
+
+def encode_response(request_type, values):
+    values = np.asarray(values, dtype=RESPONSE_DTYPES[request_type])
+    return RESPONSE_HEADER.pack(OK, len(values)) + values.tobytes()
+
+
+def encode_error(message):
+    return RESPONSE_HEADER.pack(ERROR, 0) + message.encode()
+
+
+def answer(payload, subjects, handlers):
+    """
+    :param handlers: Dictionary with request types as keys and functions taking the subject name
+                     and the input rows as values.
+    :return: Response payload of one request.
+    """
+    try:
+        request_type, subject, input_rows = parse_request(payload, subjects)
+        handler = handlers.get(request_type)
+        if handler is None:
+            raise ValueError(f"Request type {request_type} is not served by this worker.")
+        return encode_response(request_type, handler(subject, input_rows) if len(input_rows) else [])
+    except Exception as e:  # a single bad request must not take the worker down
+        return encode_error(str(e))
+
+
+def serve_unix_socket(socket_path, subjects, handlers):
+    """
+    Answer requests in the binary protocol on a Unix domain socket until the process is stopped,
+    one thread per connection. Writes {"ready": true, "socket": ..., "subjects": [...]} to stdout
+    once the socket accepts connections.
+    :param socket_path: Path of the socket, an existing socket file is replaced.
+    :param subjects: Subject names, their positions are the subject ids.
+    :param handlers: Dictionary with request types as keys and functions taking the subject name
+                     and an int8 array of input rows and returning one value per row.
+    """
+    subjects = list(subjects)
+    hello = "\n".join(subjects).encode()
+
+    class Handler(socketserver.StreamRequestHandler):
+        def handle(self):
+            try:
+                write_frame(self.wfile, hello)
+                while (payload := read_frame(self.rfile)) is not None:
+                    write_frame(self.wfile, answer(payload, subjects, handlers))
+            except ConnectionError:
+                pass
+
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    # Stopping with SIGTERM removes the socket file too
+    signal.signal(signal.SIGTERM, lambda signal_number, frame: sys.exit(0))
+
+    with socketserver.ThreadingUnixStreamServer(socket_path, Handler) as server:
+        server.daemon_threads = True
+        print(json.dumps({"ready": True, "socket": socket_path, "subjects": subjects}), flush=True)
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(socket_path)
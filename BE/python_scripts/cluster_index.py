@@ -0,0 +1,50 @@
+import numpy as np
+
+
+class ClusterIndex:
+    """
+    Members of every cluster of a KMeans model, sorted by subject index and stored in CSR
+    layout: the members of cluster c are members[offsets[c]:offsets[c + 1]].
+    """
+
+    def __init__(self, offsets, members):
+        self.offsets = offsets
+        self.members = members
+        self.nbytes = offsets.nbytes + members.nbytes
+
+    @classmethod
+    def from_labels(cls, labels, n_clusters):
+        """
+        :param labels: Cluster of every subject, e.g. labels_ of a fitted KMeans model.
+        :param n_clusters: Number of clusters of the model.
+        :return: The ClusterIndex.
+        """
+        labels = np.asarray(labels)
+        offsets = np.zeros(n_clusters + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_clusters), out=offsets[1:])
+        # A stable sort keeps the subjects of one cluster in ascending order
+        members = np.argsort(labels, kind="stable").astype(np.int32)
+        return cls(offsets, members)
+
+    @property
+    def n_clusters(self):
+        return len(self.offsets) - 1
+
+    def members_of(self, cluster):
+        """
+        :param cluster: Cluster id.
+        :return: Sorted array with the indices of the subjects in the cluster.
+        """
+        if not 0 <= cluster < self.n_clusters:
+            raise ValueError(f"Cluster {cluster} does not exist, the model has {self.n_clusters} clusters")
+        return self.members[self.offsets[cluster]:self.offsets[cluster + 1]]
+
+
+def verify_against_labels(index, labels):
+    """
+    Check that the index lists exactly the subjects with each label.
+    :raises ValueError: If the members of a cluster differ.
+    """
+    for cluster in range(index.n_clusters):
+        if not np.array_equal(index.members_of(cluster), np.where(labels == cluster)[0]):
+            raise ValueError(f"Cluster index does not match the model labels for cluster {cluster}")
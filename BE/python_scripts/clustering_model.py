@@ -0,0 +1,358 @@
+import json
+import os
+import sys
+import time
+import warnings
+
+import numpy as np
+
+from cluster_index import ClusterIndex, verify_against_labels
+from model_files import file_sha256, load_npy_directory, save_npy_directory_atomically
+
+# Focus values of the subjects are whole numbers from 0 to 10
+FOCUS_VALUES = 11
+VERIFY_SAMPLES = 10000
+ARRAY_NAMES = ("centers", "labels", "offsets", "members")
+# retrain_clustering.py replaces the model files one after another, a reader which finds files of
+# different versions tries again after a while
+LOAD_ATTEMPTS = 5
+RETRY_SECONDS = 0.2
+
+# Columns of the focus table in the order of the features, see getFocusesAttributes in SubjectService
+FOCUS_COLUMNS = (
+    "math_focus", "logic_focus", "programming_focus", "design_focus", "economics_focus", "management_focus",
+    "hardware_focus", "network_focus", "data_focus", "testing_focus", "language_focus", "physical_focus",
+)
+
+
+class MixedVersionsError(ValueError):
+    pass
+
+
+class ClusteringModel:
+    """
+    Fitted KMeans model reduced to its cluster centers and subject labels, assigning clusters
+    with NumPy only. Loaded models keep their arrays memory-mapped, so that every worker process
+    of a model shares one copy in the page cache.
+    """
+
+    def __init__(self, centers, labels, index=None, focus=None, metadata=None):
+        """
+        :param centers: Array with one cluster center per row.
+        :param labels: Cluster of every subject.
+        :param index: ClusterIndex of the labels, built if not given.
+        :param focus: Optional array with the focus vector of every subject, in the order of the labels.
+        :param metadata: Optional metadata as returned by load_metadata.
+        """
+        self.centers = centers
+        self.labels = labels
+        self.index = index if index is not None else ClusterIndex.from_labels(labels, len(centers))
+        self.focus = focus
+        metadata = metadata or {}
+        self.study_program_ids = metadata.get("study_program_ids", ())
+        self.is_default = metadata.get("default", False)
+        # Without metadata the subjects are identified by their row
+        self.subject_ids = metadata.get("subject_ids", np.arange(len(labels)))
+        self.center_norms = np.einsum("ij,ij->i", centers, centers)
+        self.nbytes = centers.nbytes + labels.nbytes + self.index.nbytes + (focus.nbytes if focus is not None else 0)
+
+    @classmethod
+    def from_estimator(cls, model):
+        return cls(np.asarray(model.cluster_centers_, dtype=np.float64), np.asarray(model.labels_, dtype=np.int32))
+
+    @property
+    def n_features(self):
+        return self.centers.shape[1]
+
+    @property
+    def n_clusters(self):
+        return self.centers.shape[0]
+
+    def squared_distances(self, queries):
+        """
+        :param queries: 2D array-like with one focus vector per row.
+        :return: Array of shape (queries, clusters) with the squared distances to every center.
+        """
+        x = np.asarray(queries, dtype=np.float64)
+        if x.ndim != 2 or x.shape[1] != self.n_features:
+            raise ValueError(f"Focus vectors must have {self.n_features} values, got shape {x.shape}")
+
+        # |x - c|^2 = |x|^2 - 2 x.c + |c|^2, clipped against rounding below zero
+        distances = np.einsum("ij,ij->i", x, x)[:, np.newaxis] - 2 * (x @ self.centers.T) + self.center_norms
+        return np.maximum(distances, 0, out=distances)
+
+    def predict(self, queries):
+        """
+        :param queries: 2D array-like with one focus vector per row.
+        :return: Array with the nearest cluster of every row.
+        """
+        return np.argmin(self.squared_distances(queries), axis=1)
+
+    def members_of(self, cluster):
+        return self.index.members_of(cluster)
+
+
+def sidecar_path(model_path):
+    return os.path.splitext(model_path)[0] + ".clusters"
+
+
+def metadata_path(model_path):
+    return os.path.splitext(model_path)[0] + ".meta.json"
+
+
+def load_metadata(model_path, clustering_model):
+    """
+    Load the metadata of a KMeans model, stored as <model>.meta.json next to it:
+    {
+        "studyProgramIds": [3],       study programs whose subjects the model recommends
+        "default": false,             true if the model serves study programs without their own model
+        "subjectIds": [1, 2, ...],    subject id of every row the model was fitted on
+        "featureOrder": [...],        FOCUS_COLUMNS in the order of the model features
+        "modelSha256": "...",         optional SHA-256 of the pickled model the metadata belongs to
+        "focusSha256": "..."          optional SHA-256 of the focus matrix of the model
+    }
+    The checksums are written by retrain_clustering.py, see load_clustering_model.
+    :param model_path: Path to the pickled model.
+    :param clustering_model: ClusteringModel of the model.
+    :return: Dictionary with study_program_ids, default, subject_ids, feature_order, the
+             position of every model feature in FOCUS_COLUMNS, and model_sha256 and focus_sha256,
+             None if the metadata has no checksums.
+    :raises ValueError: If the metadata is missing or does not match the model.
+    """
+    path = metadata_path(model_path)
+    try:
+        with open(path) as f:
+            metadata = json.load(f)
+    except FileNotFoundError:
+        raise ValueError(f"Clustering model {model_path} has no metadata file {path}")
+    except json.JSONDecodeError:
+        raise ValueError(f"Invalid JSON in {path}")
+
+    subject_ids = np.asarray(metadata.get("subjectIds", []), dtype=np.int64)
+    if subject_ids.shape != clustering_model.labels.shape:
+        raise ValueError(f"{path} must contain one subject id per subject of the model ({len(clustering_model.labels)})")
+
+    feature_order = metadata.get("featureOrder", [])
+    if sorted(feature_order) != sorted(FOCUS_COLUMNS) or len(feature_order) != clustering_model.n_features:
+        raise ValueError(f"{path} must list every one of {', '.join(FOCUS_COLUMNS)} in featureOrder")
+
+    return {
+        "study_program_ids": tuple(int(study_program_id) for study_program_id in metadata.get("studyProgramIds", [])),
+        "default": bool(metadata.get("default", False)),
+        "subject_ids": subject_ids,
+        "feature_order": np.array([FOCUS_COLUMNS.index(column) for column in feature_order]),
+        "model_sha256": metadata.get("modelSha256"),
+        "focus_sha256": metadata.get("focusSha256"),
+    }
+
+
+def focus_matrix_path(model_path):
+    return os.path.splitext(model_path)[0] + ".focus.csv"
+
+
+def focus_cache_path(model_path):
+    return os.path.splitext(model_path)[0] + ".focus"
+
+
+def read_focus_csv(path):
+    """
+    :return: Array with the rows of a focus matrix CSV file.
+    :raises ValueError: If the header is not FOCUS_COLUMNS.
+    """
+    with open(path) as f:
+        header = tuple(column.strip() for column in f.readline().split(","))
+        focus = np.loadtxt(f, delimiter=",", dtype=np.float64, ndmin=2)
+
+    if header != FOCUS_COLUMNS:
+        raise ValueError(f"{path} must have the columns {', '.join(FOCUS_COLUMNS)}")
+    return focus
+
+
+def load_focus_matrix(model_path, clustering_model, expected_sha256=None):
+    """
+    Load the focus vectors of the subjects the model was fitted on. The file is optional, a CSV
+    file with the FOCUS_COLUMNS header and one row per subject in the order of the labels. It is
+    written by retrain_clustering.py, for an existing model with:
+    python retrain_clustering.py <model.pkl> --export-focus (--database-url URL | --dump FILE | --csv FILE)
+    Without it subjects are ranked by the center of their cluster and the kdtree backend of
+    subject_clustering.py is not available.
+    The parsed matrix is stored as <model>.focus/focus.npy and memory-mapped while the CSV file
+    does not change.
+    :param model_path: Path to the pickled model.
+    :param clustering_model: ClusteringModel of the model.
+    :param expected_sha256: SHA-256 the metadata of the model lists for the file, if any.
+    :return: Array with one focus vector per subject, None if the file does not exist.
+    :raises MixedVersionsError: If the file is not the one listed in the metadata.
+    :raises ValueError: If the file does not match the model.
+    """
+    path = focus_matrix_path(model_path)
+    try:
+        source_sha256 = file_sha256(path)
+    except FileNotFoundError:
+        source_sha256 = None
+    if expected_sha256 is not None and source_sha256 != expected_sha256:
+        raise MixedVersionsError(f"{path} is not the focus matrix listed in {metadata_path(model_path)}")
+    if source_sha256 is None:
+        print(f"{model_path} has no focus matrix {path}, subjects are ranked by the center of their cluster",
+              file=sys.stderr)
+        return None
+
+    focus = None
+    try:
+        metadata, arrays = load_npy_directory(focus_cache_path(model_path), ("focus",))
+        if metadata.get("source_sha256") == source_sha256:
+            focus = arrays["focus"]
+    except (OSError, KeyError, ValueError):
+        pass
+
+    if focus is None:
+        focus = read_focus_csv(path)
+        try:
+            save_npy_directory_atomically(focus_cache_path(model_path), source_sha256[:16],
+                                          {"source_sha256": source_sha256}, focus=focus)
+        except OSError as e:
+            print(f"Could not store focus matrix for {model_path}: {e}", file=sys.stderr)
+
+    if focus.shape != (len(clustering_model.labels), clustering_model.n_features):
+        raise ValueError(f"{path} must have one row per subject of the model ({len(clustering_model.labels)}), "
+                         f"got {focus.shape[0]}")
+    return focus
+
+
+def load_kmeans_model(model_path):
+    """
+    :param model_path: Path to the pre-trained KMeans model.
+    :return: The loaded scikit-learn model.
+    """
+    import joblib
+    from sklearn.exceptions import InconsistentVersionWarning
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", InconsistentVersionWarning)
+        return joblib.load(model_path)
+
+
+def verify_against_estimator(clustering_model, model, samples=VERIFY_SAMPLES):
+    """
+    Check that the NumPy model assigns the same clusters as sklearn, both for the cluster
+    centers and for random focus vectors, and that its index matches the labels.
+    :raises ValueError: If an assignment differs.
+    """
+    verify_against_labels(clustering_model.index, model.labels_)
+
+    rng = np.random.default_rng(0)
+    queries = np.vstack([clustering_model.centers,
+                         rng.integers(0, FOCUS_VALUES, size=(samples, clustering_model.n_features))])
+    mismatches = np.count_nonzero(clustering_model.predict(queries) != model.predict(queries))
+    if mismatches:
+        raise ValueError(f"NumPy clustering differs from sklearn for {mismatches} of {len(queries)} focus vectors")
+
+
+def save_clustering_model(path, clustering_model, source_sha256):
+    """
+    :param path: Path of the directory symlink, see sidecar_path.
+    :param clustering_model: ClusteringModel to store.
+    :param source_sha256: SHA-256 of the pickled model it was converted from.
+    """
+    save_npy_directory_atomically(path, source_sha256[:16], {"source_sha256": source_sha256},
+                                  centers=clustering_model.centers, labels=clustering_model.labels,
+                                  offsets=clustering_model.index.offsets, members=clustering_model.index.members)
+
+
+def export_clustering_model(model_path):
+    """
+    Unpickle a KMeans model, convert it to a ClusteringModel, verify it against sklearn and
+    store it next to the model. Storing is skipped if the directory is read-only.
+    :param model_path: Path to the pickled model.
+    :return: The ClusteringModel.
+    """
+    model = load_kmeans_model(model_path)
+    clustering_model = ClusteringModel.from_estimator(model)
+    verify_against_estimator(clustering_model, model)
+
+    try:
+        save_clustering_model(sidecar_path(model_path), clustering_model, file_sha256(model_path))
+    except OSError as e:
+        print(f"Could not store clustering model for {model_path}: {e}", file=sys.stderr)
+
+    return clustering_model
+
+
+def load_model_files(model_path, with_focus):
+    """
+    Load the ClusteringModel of a pickled KMeans model once, see load_clustering_model.
+    :raises MixedVersionsError: If the files come from different versions of the model.
+    """
+    model_sha256 = file_sha256(model_path)
+    clustering_model = None
+    try:
+        metadata, arrays = load_npy_directory(sidecar_path(model_path), ARRAY_NAMES)
+        if metadata.get("source_sha256") == model_sha256:
+            clustering_model = ClusteringModel(arrays["centers"], arrays["labels"],
+                                               ClusterIndex(arrays["offsets"], arrays["members"]))
+    except (OSError, KeyError, ValueError):
+        pass
+
+    if clustering_model is None:
+        clustering_model = export_clustering_model(model_path)
+
+    metadata = load_metadata(model_path, clustering_model)
+    if metadata["model_sha256"] is not None and metadata["model_sha256"] != model_sha256:
+        raise MixedVersionsError(f"{metadata_path(model_path)} does not belong to {model_path}")
+    centers = np.empty_like(clustering_model.centers)
+    centers[:, metadata["feature_order"]] = clustering_model.centers
+
+    focus = load_focus_matrix(model_path, clustering_model, metadata["focus_sha256"]) if with_focus else None
+    # The model could have been replaced while its other files were read
+    if file_sha256(model_path) != model_sha256:
+        raise MixedVersionsError(f"{model_path} was replaced while it was loaded")
+    return ClusteringModel(centers, clustering_model.labels, clustering_model.index, focus, metadata)
+
+
+def load_clustering_model(model_path, with_focus=True):
+    """
+    Load the ClusteringModel of a pickled KMeans model with its metadata (see load_metadata) and
+    the focus matrix if it exists and with_focus is set (see load_focus_matrix). The features of the returned model
+    are in the order of FOCUS_COLUMNS. The stored arrays are memory-mapped when they were
+    exported from the current model file, otherwise the model is exported again, which is the
+    only case scikit-learn is imported.
+    When the metadata lists the checksums of the model and its focus matrix, the files are loaded
+    again until they all come from the same version, so that a model being retrained is not mixed
+    with the files of the previous one.
+    :param model_path: Path to the pickled model.
+    :param with_focus: False to load the model without its focus matrix.
+    :return: The ClusteringModel.
+    :raises MixedVersionsError: If the files still come from different versions after LOAD_ATTEMPTS.
+    """
+    for attempt in range(LOAD_ATTEMPTS):
+        try:
+            return load_model_files(model_path, with_focus)
+        except MixedVersionsError:
+            if attempt == LOAD_ATTEMPTS - 1:
+                raise
+            time.sleep(RETRY_SECONDS)
+
+
+def model_files(model_path):
+    """
+    :return: Paths of every file a ClusteringModel is loaded from.
+    """
+    return [model_path, metadata_path(model_path), focus_matrix_path(model_path)]
+
+
+def main():
+    """
+    Export and verify clustering models of the given KMeans models.
+    Usage: python clustering_model.py --export <model.pkl> [<model.pkl> ...]
+    """
+    if len(sys.argv) < 3 or sys.argv[1] != "--export":
+        print("Usage: python clustering_model.py --export <model.pkl> [<model.pkl> ...]")
+        sys.exit(1)
+
+    for path in sys.argv[2:]:
+        clustering_model = export_clustering_model(path)
+        print(f"{path}: {clustering_model.n_clusters} clusters exported to {sidecar_path(path)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+import itertools
+import json
+import sys
+
+import numpy as np
+
+
+def softmax(x):
+    exponents = np.exp(x - np.max(x, axis=-1, keepdims=True))
+    return exponents / np.sum(exponents, axis=-1, keepdims=True)
+
+
+def sigmoid(x):
+    return 1 / (1 + np.exp(-x))
+
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "tanh": np.tanh,
+    "sigmoid": sigmoid,
+    "softmax": softmax,
+}
+
+# Layers which do nothing at inference time
+INFERENCE_IDENTITY_LAYERS = {"InputLayer", "Dropout"}
+
+
+class UnsupportedModelError(Exception):
+    pass
+
+
+class DenseNetwork:
+    """
+    Forward pass of a Keras Sequential model made of Dense layers, computed in NumPy.
+    Weights are kept in float32 like in Keras, so the predicted classes are the same.
+    """
+
+    def __init__(self, layers):
+        """
+        :param layers: List of (kernel, bias, activation name) tuples in execution order.
+        """
+        self.layers = [(kernel, bias, ACTIVATIONS[activation]) for kernel, bias, activation in layers]
+        self.nbytes = sum(kernel.nbytes + bias.nbytes for kernel, bias, _ in layers)
+
+    @property
+    def input_size(self):
+        return self.layers[0][0].shape[0]
+
+    def predict(self, inputs):
+        """
+        :param inputs: 2D array-like, one row of input features per sample.
+        :return: 2D array with the output of the last layer for every sample.
+        """
+        x = np.asarray(inputs, dtype=np.float32)
+        if x.ndim != 2 or x.shape[1] != self.input_size:
+            raise ValueError(f"Expected input rows with {self.input_size} features, got shape {x.shape}")
+
+        for kernel, bias, activation in self.layers:
+            x = activation(x @ kernel + bias)
+        return x
+
+    def predict_classes(self, inputs):
+        return np.argmax(self.predict(inputs), axis=1)
+
+
+class KerasModel:
+    """
+    TensorFlow model with the same interface as DenseNetwork, used for models which the
+    NumPy engine does not support.
+    """
+
+    def __init__(self, model):
+        self.model = model
+        self.nbytes = sum(weight.nbytes for weight in model.get_weights())
+
+    @property
+    def input_size(self):
+        return self.model.input_shape[-1]
+
+    def predict(self, inputs):
+        return self.model.predict(np.asarray(inputs), verbose=0)
+
+    def predict_classes(self, inputs):
+        return np.argmax(self.predict(inputs), axis=1)
+
+
+def decode_attribute(value):
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+def load_dense_network(path):
+    """
+    Read the layer configuration and weights of a Keras .h5 model without TensorFlow.
+    :param path: Path to the .h5 file.
+    :return: DenseNetwork with the weights of the model.
+    :raises UnsupportedModelError: If the model uses something else than Dense layers.
+    """
+    import h5py
+
+    with h5py.File(path, "r") as model_file:
+        if "model_config" not in model_file.attrs:
+            raise UnsupportedModelError(f"{path} does not contain a model configuration")
+
+        model_config = json.loads(decode_attribute(model_file.attrs["model_config"]))
+        if model_config.get("class_name") != "Sequential":
+            raise UnsupportedModelError(f"Only Sequential models are supported, got {model_config.get('class_name')}")
+
+        weights = model_file["model_weights"]
+        layers = []
+        for layer in model_config["config"]["layers"]:
+            class_name = layer["class_name"]
+            config = layer["config"]
+            if class_name in INFERENCE_IDENTITY_LAYERS:
+                continue
+
+            activation = config.get("activation")
+            if class_name != "Dense" or activation not in ACTIVATIONS:
+                raise UnsupportedModelError(f"Unsupported layer {class_name} with activation {activation}")
+
+            layer_group = weights[config["name"]]
+            weight_names = [decode_attribute(name) for name in layer_group.attrs["weight_names"]]
+            kernel = np.asarray(layer_group[weight_names[0]], dtype=np.float32)
+            if config.get("use_bias", True):
+                bias = np.asarray(layer_group[weight_names[1]], dtype=np.float32)
+            else:
+                bias = np.zeros(kernel.shape[1], dtype=np.float32)
+
+            layers.append((kernel, bias, activation))
+
+    if not layers:
+        raise UnsupportedModelError(f"{path} does not contain any Dense layer")
+
+    return DenseNetwork(layers)
+
+
+def load_mark_model(path):
+    """
+    Load a mark model for inference. Models made of Dense layers are run in NumPy, TensorFlow is
+    imported only for models which the NumPy engine does not support.
+    :param path: Path to the .h5 model.
+    :return: DenseNetwork or KerasModel.
+    """
+    try:
+        return load_dense_network(path)
+    except UnsupportedModelError:
+        import tensorflow as tf
+        return KerasModel(tf.keras.models.load_model(path, compile=False))
+
+
+def verify_against_keras(path, mark_values=range(7)):
+    """
+    Compare the predicted classes with TensorFlow on every combination of input marks.
+    :param path: Path to the .h5 file.
+    :param mark_values: Values every input feature can have.
+    :return: Number of inputs for which the predicted class differs.
+    """
+    import tensorflow as tf
+
+    network = load_dense_network(path)
+    keras_model = tf.keras.models.load_model(path, compile=False)
+
+    inputs = np.array(list(itertools.product(mark_values, repeat=network.input_size)), dtype=np.float32)
+    expected = np.argmax(keras_model.predict(inputs, verbose=0), axis=1)
+    actual = np.argmax(network.predict(inputs), axis=1)
+    return int(np.count_nonzero(expected != actual))
+
+
+def main():
+    """
+    Check that the NumPy forward pass predicts the same classes as TensorFlow.
+    Usage: python dense_network.py --verify <model.h5> [<model.h5> ...]
+    """
+    if len(sys.argv) < 3 or sys.argv[1] != "--verify":
+        print("Usage: python dense_network.py --verify <model.h5> [<model.h5> ...]")
+        sys.exit(1)
+
+    mismatched_models = 0
+    for path in sys.argv[2:]:
+        mismatches = verify_against_keras(path)
+        print(f"{path}: {mismatches} mismatching predictions")
+        mismatched_models += mismatches > 0
+
+    sys.exit(1 if mismatched_models else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,365 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+# Model libraries are imported only once the models are loaded, see benchmarks/import_budget.py.
+from json_lines_worker import get_request_data, is_batch
+from micro_batching import MicroBatcher
+from neural_network_marks_predictions import load_models as load_mark_models, run_model_batch
+from passing_chance_prediction import (format_passing_probability, get_passing_probabilities,
+                                       load_models as load_chance_models)
+from prediction_tables import MARK_VALUES
+from subject_clustering import handle_request as handle_clustering_request, load_models as load_clustering_models
+
+# Local HTTP/1.1 service keeping the models of all three prediction scripts loaded. Requests
+# and responses are the JSON of the --serve mode of the scripts:
+#   POST /predict/mark     {"data": {...}} -> {"results": {...}}, see neural_network_marks_predictions.serve
+#   POST /predict/chance   {"data": {...}} -> {"results": {...}}, see passing_chance_prediction.serve
+#   POST /cluster          {"studyProgramId": 3, "focusVectors": [...], ...}, see subject_clustering.serve
+#   GET  /ready            200 once the models are loaded, 503 before
+# Connections are kept alive, inference runs in a thread pool so the event loop keeps accepting
+# requests. Invalid requests are answered with 400 and {"error": ...}.
+#
+# Mark and chance requests for the same subject arriving within --batch-window-ms of each other
+# are answered with one forward pass over all their rows, at most --max-batch-size rows at once,
+# see micro_batching.py. The first request of a batch waits at most the window; 0 turns it off.
+#
+# With --workers N the models are loaded once and N forked worker processes share them
+# copy-on-write and accept connections on the same port, see prefork.py. Mark models which need
+# TensorFlow (see dense_network.load_mark_model) are not fork-safe and must not be served so.
+#
+# Usage: python inference_service.py --mark-models MARK_PATHS_JSON --chance-models CHANCE_PATHS_JSON
+#                                    --clustering-models MODEL_PATH [MODEL_PATH ...]
+#                                    [--lookup TABLE_PATH] [--host HOST] [--port PORT] [--threads N]
+#                                    [--batch-window-ms MS] [--max-batch-size ROWS]
+#                                    [--workers N [--max-worker-memory MB]]
+
+DEFAULT_HOST = "127.0.0.1"
+DEFAULT_PORT = 8090
+MAX_HEADER_LINES = 100
+MAX_BODY_BYTES = 1024 * 1024
+# Idle keep-alive connections are closed after this many seconds
+KEEP_ALIVE_SECONDS = 60
+DEFAULT_BATCH_WINDOW_MS = 2
+DEFAULT_MAX_BATCH_SIZE = 256
+
+
+class HttpError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class InferenceService:
+    def __init__(self, mark_model_paths, chance_model_paths, clustering_model_paths, table_path=None, threads=None,
+                 batch_window_ms=DEFAULT_BATCH_WINDOW_MS, max_batch_size=DEFAULT_MAX_BATCH_SIZE):
+        """
+        :param mark_model_paths: Dictionary with subject names as keys and paths to mark models as values.
+        :param chance_model_paths: Dictionary with subject names as keys and paths to chance models as values.
+        :param clustering_model_paths: Paths to the pickled KMeans models.
+        :param table_path: Optional path to the prediction tables, see prediction_tables.py.
+        :param threads: Number of inference threads.
+        :param batch_window_ms: How long mark and chance requests wait for others of the same subject.
+        :param max_batch_size: Number of rows which are predicted without waiting for the window to end.
+        """
+        self.mark_models = load_mark_models(mark_model_paths, table_path)
+        self.chance_models = load_chance_models(chance_model_paths, table_path)
+        self.clustering_model_paths = clustering_model_paths
+        self.executor = ThreadPoolExecutor(threads or os.cpu_count(), thread_name_prefix="inference")
+        self.batcher = MicroBatcher(self.run_batch, self.executor, batch_window_ms / 1000, max_batch_size)
+        self.ready = False
+
+        self.routes = {}
+        if mark_model_paths:
+            self.routes["/predict/mark"] = self.predict_marks
+        if chance_model_paths:
+            self.routes["/predict/chance"] = self.predict_passing_chances
+        if clustering_model_paths:
+            self.routes["/cluster"] = self.cluster
+
+    async def predict_marks(self, request):
+        return {"results": await self.predict_batched("mark", self.mark_models, get_request_data(request))}
+
+    async def predict_passing_chances(self, request):
+        return {"results": await self.predict_batched("chance", self.chance_models, get_request_data(request))}
+
+    async def predict_batched(self, kind, models, encoded_marks_dict):
+        """
+        Predict every subject present in the request together with the concurrent requests for it.
+        :param kind: "mark" or "chance".
+        :param encoded_marks_dict: Dictionary with subject names as keys and input arrays (or lists of
+                                   input arrays) as values.
+        :return: Dictionary with subject names as keys and predictions (or lists of them) as values,
+                 the same as predict_marks and predict_passing_chances of the scripts.
+        """
+        # Every subject is validated before any is submitted, so an invalid request submits nothing
+        inputs = {}
+        for subject_name, subject_input in encoded_marks_dict.items():
+            if subject_name not in models:
+                raise ValueError(f"No model loaded for subject: {subject_name}")
+            inputs[subject_name] = get_input_rows(subject_name, subject_input)
+
+        # Rows of a different length would fail the whole batch, so they are batched separately
+        submissions = {subject_name: self.batcher.submit((kind, subject_name, len(input_rows[0])), input_rows)
+                       for subject_name, input_rows in inputs.items()}
+
+        results = dict(zip(submissions, await asyncio.gather(*submissions.values())))
+        return {subject_name: results[subject_name] if is_batch(subject_input) else results[subject_name][0]
+                for subject_name, subject_input in encoded_marks_dict.items()}
+
+    def run_batch(self, key, input_rows):
+        """
+        :param key: Tuple of the kind, subject name and row length, see predict_batched.
+        :return: Decoded mark or formatted passing chance of every row.
+        """
+        kind, subject_name, _ = key
+        if kind == "mark":
+            return run_model_batch(self.mark_models[subject_name], input_rows)
+        return [format_passing_probability(probability)
+                for probability in get_passing_probabilities(self.chance_models[subject_name], input_rows)]
+
+    def cluster(self, request):
+        return handle_clustering_request(self.clustering_model_paths, request)
+
+    def load(self):
+        """
+        Load every model, so that the first requests do not wait for them.
+        """
+        self.mark_models.load_all()
+        self.chance_models.load_all()
+        if self.clustering_model_paths:
+            load_clustering_models(self.clustering_model_paths)
+
+    def readiness(self):
+        status = HTTPStatus.OK if self.ready else HTTPStatus.SERVICE_UNAVAILABLE
+        return status, {"ready": self.ready, "routes": sorted(self.routes), "batching": self.batcher.statistics()}
+
+    async def start(self, host, port):
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"Listening on {', '.join(str(sock.getsockname()) for sock in server.sockets)}", file=sys.stderr)
+
+        await asyncio.get_running_loop().run_in_executor(self.executor, self.load)
+        self.ready = True
+        print("Models loaded", file=sys.stderr)
+        return server
+
+    async def respond(self, method, path, body):
+        """
+        :return: Tuple of the HTTP status and the JSON serializable response.
+        """
+        if path == "/ready":
+            if method != "GET":
+                raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, "Use GET for /ready.")
+            return self.readiness()
+
+        handler = self.routes.get(path)
+        if handler is None:
+            raise HttpError(HTTPStatus.NOT_FOUND, f"No route {path}, available: {', '.join(sorted(self.routes))}")
+        if method != "POST":
+            raise HttpError(HTTPStatus.METHOD_NOT_ALLOWED, f"Use POST for {path}.")
+
+        try:
+            request = json.loads(body)
+        except (json.JSONDecodeError, UnicodeDecodeError):
+            raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid JSON input.")
+
+        try:
+            if asyncio.iscoroutinefunction(handler):
+                return HTTPStatus.OK, await handler(request)
+            return HTTPStatus.OK, await asyncio.get_running_loop().run_in_executor(self.executor, handler, request)
+        except ValueError as e:
+            raise HttpError(HTTPStatus.BAD_REQUEST, str(e))
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                try:
+                    request_line = await asyncio.wait_for(reader.readline(), KEEP_ALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    break
+                if not request_line:
+                    break
+
+                try:
+                    method, path, version, headers = await read_head(request_line, reader)
+                    body = await read_body(reader, headers)
+                except HttpError as e:
+                    # The rest of the request cannot be skipped reliably
+                    status, response, keep_alive = e.status, {"error": str(e)}, False
+                else:
+                    keep_alive = wants_keep_alive(version, headers)
+                    try:
+                        status, response = await self.respond(method, path, body)
+                    except HttpError as e:
+                        status, response = e.status, {"error": str(e)}
+                    except Exception as e:  # a single bad request must not take the service down
+                        print(f"Error answering a request: {e!r}", file=sys.stderr)
+                        status, response = HTTPStatus.INTERNAL_SERVER_ERROR, {"error": str(e)}
+
+                writer.write(encode_response(status, response, keep_alive))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+
+async def read_head(request_line, reader):
+    """
+    :return: Tuple of the method, path without the query, HTTP version and a dictionary of the
+             headers with lowercase names.
+    """
+    try:
+        method, target, version = request_line.decode("latin-1").split()
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid request line.")
+
+    headers = {}
+    for _ in range(MAX_HEADER_LINES):
+        line = (await reader.readline()).decode("latin-1").strip()
+        if not line:
+            return method, target.split("?", 1)[0], version, headers
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+    raise HttpError(HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE, "Too many headers.")
+
+
+async def read_body(reader, headers):
+    if "chunked" in headers.get("transfer-encoding", ""):
+        raise HttpError(HTTPStatus.LENGTH_REQUIRED, "Chunked requests are not supported, send a Content-Length.")
+    try:
+        length = int(headers.get("content-length", 0))
+    except ValueError:
+        raise HttpError(HTTPStatus.BAD_REQUEST, "Invalid Content-Length.")
+    if length > MAX_BODY_BYTES:
+        raise HttpError(HTTPStatus.REQUEST_ENTITY_TOO_LARGE, f"Requests are limited to {MAX_BODY_BYTES} bytes.")
+    return await reader.readexactly(length) if length > 0 else b""
+
+
+def is_mark(value):
+    return (isinstance(value, (int, float)) and not isinstance(value, bool) and float(value).is_integer()
+            and 0 <= value < MARK_VALUES)
+
+
+def get_input_rows(subject_name, subject_input):
+    """
+    :param subject_input: One list of encoded marks, or a list of such lists.
+    :return: List of the input rows.
+    :raises ValueError: If the input is not a non-empty list of marks (whole numbers from 0 to 6, see
+                        prediction_tables.MARK_VALUES) or a list of such lists of one length.
+    """
+    input_rows = subject_input if is_batch(subject_input) else [subject_input]
+    for row in input_rows:
+        if (not isinstance(row, list) or not row or len(row) != len(input_rows[0])
+                or not all(is_mark(value) for value in row)):
+            raise ValueError(f"Input of subject {subject_name} must be a list of marks from 0 to {MARK_VALUES - 1} "
+                             "or a list of such lists of the same length.")
+    return input_rows
+
+
+def wants_keep_alive(version, headers):
+    connection = headers.get("connection", "").lower()
+    if version == "HTTP/1.0":
+        return connection == "keep-alive"
+    return connection != "close"
+
+
+def encode_response(status, response, keep_alive):
+    body = json.dumps(response).encode()
+    head = (f"HTTP/1.1 {status.value} {status.phrase}\r\n"
+            "Content-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode("latin-1") + body
+
+
+def parse_json_argument(argument, name):
+    try:
+        model_paths = json.loads(argument)
+    except json.JSONDecodeError:
+        model_paths = None
+    if not isinstance(model_paths, dict):
+        raise argparse.ArgumentTypeError(f"{name} must be a JSON object of subject->model path")
+    return model_paths
+
+
+async def serve_until_stopped(service, server):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signal_number, stop.set)
+
+    async with server:
+        await stop.wait()
+    service.executor.shutdown(wait=False, cancel_futures=True)
+
+
+async def run(service, host, port):
+    await serve_until_stopped(service, await service.start(host, port))
+
+
+async def run_worker(service, listening_socket):
+    await serve_until_stopped(service, await asyncio.start_server(service.handle_connection, sock=listening_socket))
+
+
+def run_prefork(service, host, port, worker_count, max_worker_bytes=None):
+    """
+    Load the models, then serve them from worker_count forked processes sharing one listening socket.
+    """
+    import socket
+    from prefork import run_workers
+
+    service.load()
+    service.ready = True
+    listening_socket = socket.create_server((host, port))
+    print(f"Listening on {listening_socket.getsockname()}", file=sys.stderr)
+
+    with listening_socket:
+        run_workers(lambda: asyncio.run(run_worker(service, listening_socket)), worker_count, max_worker_bytes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HTTP service answering predictions with loaded models.")
+    parser.add_argument("--mark-models", type=lambda value: parse_json_argument(value, "--mark-models"),
+                        default={}, help="JSON object with subject names and mark model paths")
+    parser.add_argument("--chance-models", type=lambda value: parse_json_argument(value, "--chance-models"),
+                        default={}, help="JSON object with subject names and passing chance model paths")
+    parser.add_argument("--clustering-models", nargs="+", default=[], help="paths to the pickled KMeans models")
+    parser.add_argument("--lookup", metavar="TABLE_PATH",
+                        help="answer predictions from precomputed prediction tables, see prediction_tables.py")
+    parser.add_argument("--host", default=DEFAULT_HOST)
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--threads", type=int,
+                        help="inference threads of every worker, the number of CPUs per worker by default")
+    parser.add_argument("--batch-window-ms", type=float, default=DEFAULT_BATCH_WINDOW_MS,
+                        help="how long mark and chance requests wait to be predicted together, 0 to turn it off")
+    parser.add_argument("--max-batch-size", type=int, default=DEFAULT_MAX_BATCH_SIZE,
+                        help="number of rows predicted at once without waiting for the batch window")
+    parser.add_argument("--workers", type=int, default=0,
+                        help="number of forked worker processes sharing the loaded models, 0 for one process")
+    parser.add_argument("--max-worker-memory", type=int, metavar="MB",
+                        help="restart a worker once its private memory exceeds this many megabytes")
+    arguments = parser.parse_args()
+
+    if not (arguments.mark_models or arguments.chance_models or arguments.clustering_models):
+        parser.error("at least one of --mark-models, --chance-models and --clustering-models is required")
+
+    threads = arguments.threads or max(1, os.cpu_count() // max(1, arguments.workers))
+    service = InferenceService(arguments.mark_models, arguments.chance_models, arguments.clustering_models,
+                               arguments.lookup, threads, arguments.batch_window_ms, arguments.max_batch_size)
+    if arguments.workers > 0:
+        max_worker_bytes = arguments.max_worker_memory * 1024 * 1024 if arguments.max_worker_memory else None
+        run_prefork(service, arguments.host, arguments.port, arguments.workers, max_worker_bytes)
+    else:
+        asyncio.run(run(service, arguments.host, arguments.port))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import json
+import sys
+
+# Health check request of the worker pools, answered with the ready message
+PING_REQUEST = {"ping": True}
+
+
+def serve_json_lines(handle_request, ready_message, input_stream=None, output_stream=None):
+    """
+    Run the newline-delimited JSON loop shared by the --serve mode of the prediction scripts.
+
+    Writes the ready message first, then reads one JSON request per line and writes one JSON
+    response per line until the input stream is closed. PING_REQUEST is answered with the ready
+    message again without calling handle_request.
+    :param handle_request: Function taking a parsed request and returning a JSON serializable response.
+    :param ready_message: Dictionary written once before the first request is read.
+    :param input_stream: Stream to read requests from (stdin by default).
+    :param output_stream: Stream to write responses to (stdout by default).
+    """
+    input_stream = input_stream or sys.stdin
+    output_stream = output_stream or sys.stdout
+
+    write_line(output_stream, ready_message)
+
+    for line in input_stream:
+        line = line.strip()
+        if not line:
+            continue
+
+        try:
+            request = json.loads(line)
+        except json.JSONDecodeError:
+            response = {"error": "Invalid JSON input."}
+        else:
+            try:
+                response = ready_message if request == PING_REQUEST else handle_request(request)
+            except Exception as e:  # a single bad request must not take the worker down
+                response = {"error": str(e)}
+
+        write_line(output_stream, response)
+
+
+def write_line(output_stream, message):
+    output_stream.write(json.dumps(message) + "\n")
+    output_stream.flush()
+
+
+def get_request_data(request):
+    """
+    Extract the subject->input dictionary of a request.
+    :param request: Parsed JSON request.
+    :return: The 'data' dictionary.
+    :raises ValueError: If the request does not contain a 'data' dictionary.
+    """
+    if not isinstance(request, dict) or not isinstance(request.get("data"), dict):
+        raise ValueError("Request must contain a 'data' field with a dictionary of subject->input.")
+    return request["data"]
+
+
+def is_batch(subject_input):
+    """
+    :param subject_input: Input of one subject, either one row of features or a list of rows.
+    :return: True if the input is a list of rows.
+    """
+    return isinstance(subject_input, list) and len(subject_input) > 0 and isinstance(subject_input[0], list)
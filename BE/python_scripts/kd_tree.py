@@ -0,0 +1,181 @@
+import heapq
+import os
+import sys
+
+import numpy as np
+
+from model_files import file_sha256, load_npy_directory, save_npy_directory_atomically
+
+# Maximal number of subjects in a leaf. Leaves are scanned with one vectorised distance
+# computation, so large leaves keep the number of nodes visited in Python low.
+LEAF_SIZE = 256
+VERIFY_QUERIES = 100
+ARRAY_NAMES = ("points", "indices", "lower", "upper", "children", "ranges")
+
+
+class KDTree:
+    """
+    KD-tree over the focus vectors of the subjects, answering exact k-nearest-subject queries.
+    Nodes are stored in flat arrays, so the tree can be memory-mapped from .npy files:
+    - points: focus vectors, reordered so that every node covers a contiguous range
+    - indices: row of every reordered point in the focus matrix
+    - lower, upper: bounding box of the points of every node
+    - children: left and right child of every node, -1 for leaves
+    - ranges: start and end of the points of every node
+    """
+
+    def __init__(self, points, indices, lower, upper, children, ranges):
+        self.points = points
+        self.indices = indices
+        self.lower = lower
+        self.upper = upper
+        self.children = children
+        self.ranges = ranges
+        self.nbytes = sum(array.nbytes for array in (points, indices, lower, upper, children, ranges))
+
+    @classmethod
+    def build(cls, focus, leaf_size=LEAF_SIZE):
+        """
+        :param focus: Array with the focus vector of every subject.
+        :param leaf_size: Maximal number of points in a leaf.
+        :return: The KDTree.
+        """
+        focus = np.asarray(focus, dtype=np.float64)
+        order = np.arange(len(focus))
+        lower, upper, children, ranges = [], [], [], []
+
+        def build_node(start, end):
+            node = len(ranges)
+            node_points = focus[order[start:end]]
+            lower.append(node_points.min(axis=0))
+            upper.append(node_points.max(axis=0))
+            children.append([-1, -1])
+            ranges.append([start, end])
+
+            spread = upper[node] - lower[node]
+            if end - start <= leaf_size or not spread.any():
+                return node
+
+            # Split at the median of the widest dimension
+            dimension = int(np.argmax(spread))
+            middle = (start + end) // 2
+            node_order = order[start:end]
+            order[start:end] = node_order[np.argpartition(focus[node_order, dimension], middle - start)]
+            left = build_node(start, middle)
+            right = build_node(middle, end)
+            children[node] = [left, right]
+            return node
+
+        if len(focus):
+            build_node(0, len(focus))
+
+        return cls(focus[order], order.astype(np.int32), np.array(lower).reshape(-1, focus.shape[1]),
+                   np.array(upper).reshape(-1, focus.shape[1]), np.array(children, dtype=np.int32).reshape(-1, 2),
+                   np.array(ranges, dtype=np.int64).reshape(-1, 2))
+
+    def box_distance(self, node, point):
+        """
+        :return: Squared distance from the point to the bounding box of the node.
+        """
+        outside = np.maximum(self.lower[node] - point, 0) + np.maximum(point - self.upper[node], 0)
+        return float(outside @ outside)
+
+    def query(self, point, k):
+        """
+        Find the k subjects nearest to the point, visiting the nodes closest to it first and
+        skipping every node farther than the k-th best subject found so far.
+        :param point: Focus vector.
+        :param k: Number of subjects to return.
+        :return: Tuple of arrays with the rows of the subjects in the focus matrix and their
+                 distances from the point, ordered by distance and then by row.
+        """
+        point = np.asarray(point, dtype=np.float64)
+        if point.shape != (self.points.shape[1],):
+            raise ValueError(f"Focus vector must have {self.points.shape[1]} values, got shape {point.shape}")
+
+        k = min(k, len(self.points))
+        best_rows = np.empty(0, dtype=np.int64)
+        best_distances = np.empty(0)
+        if k == 0:
+            return best_rows, best_distances
+
+        heap = [(self.box_distance(0, point), 0)]
+        while heap:
+            node_distance, node = heapq.heappop(heap)
+            if len(best_rows) == k and node_distance > best_distances[-1]:
+                break
+
+            left, right = self.children[node]
+            if left >= 0:
+                heapq.heappush(heap, (self.box_distance(left, point), int(left)))
+                heapq.heappush(heap, (self.box_distance(right, point), int(right)))
+                continue
+
+            start, end = self.ranges[node]
+            differences = self.points[start:end] - point
+            rows = np.concatenate([best_rows, self.indices[start:end]])
+            distances = np.concatenate([best_distances, np.einsum("ij,ij->i", differences, differences)])
+            order = np.lexsort((rows, distances))[:k]
+            best_rows, best_distances = rows[order], distances[order]
+
+        return best_rows, np.sqrt(best_distances)
+
+
+def tree_path(model_path):
+    return os.path.splitext(model_path)[0] + ".kdtree"
+
+
+def verify_against_brute_force(tree, focus, queries=VERIFY_QUERIES, k=10):
+    """
+    Check that the tree returns the same subjects as a full scan for random focus vectors.
+    :raises ValueError: If a result differs.
+    """
+    rng = np.random.default_rng(0)
+    for point in rng.uniform(focus.min(), focus.max(), size=(queries, focus.shape[1])):
+        rows, _ = tree.query(point, k)
+        distances = np.einsum("ij,ij->i", focus - point, focus - point)
+        expected = np.lexsort((np.arange(len(focus)), distances))[:k]
+        if not np.array_equal(rows, expected):
+            raise ValueError(f"KD-tree differs from a full scan for the focus vector {point.tolist()}")
+
+
+def export_kd_tree(model_path, focus, source_path):
+    """
+    Build the KD-tree of a focus matrix, verify it and store it next to the model. Storing is
+    skipped if the directory is read-only.
+    :param model_path: Path to the pickled KMeans model the focus matrix belongs to.
+    :param focus: Array with the focus vector of every subject.
+    :param source_path: File the focus matrix was loaded from.
+    :return: The KDTree.
+    """
+    tree = KDTree.build(focus)
+    verify_against_brute_force(tree, focus)
+
+    source_sha256 = file_sha256(source_path)
+    try:
+        save_npy_directory_atomically(tree_path(model_path), source_sha256[:16],
+                                      {"source_sha256": source_sha256, "leaf_size": LEAF_SIZE},
+                                      **{name: getattr(tree, name) for name in ARRAY_NAMES})
+    except OSError as e:
+        print(f"Could not store KD-tree for {model_path}: {e}", file=sys.stderr)
+
+    return tree
+
+
+def load_kd_tree(model_path, focus, source_path):
+    """
+    Load the memory-mapped KD-tree of a focus matrix. The stored tree is used when it was built
+    from the current focus matrix file, otherwise it is built again.
+    :param model_path: Path to the pickled KMeans model the focus matrix belongs to.
+    :param focus: Array with the focus vector of every subject.
+    :param source_path: File the focus matrix was loaded from.
+    :return: The KDTree.
+    """
+    try:
+        metadata, arrays = load_npy_directory(tree_path(model_path), ARRAY_NAMES)
+        if metadata.get("source_sha256") == file_sha256(source_path) and metadata.get("leaf_size") == LEAF_SIZE:
+            return KDTree(**arrays)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return export_kd_tree(model_path, focus, source_path)
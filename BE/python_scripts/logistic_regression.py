@@ -0,0 +1,132 @@
+import itertools
+import os
+import pickle
+import sys
+import warnings
+
+import numpy as np
+
+from model_files import file_sha256, save_npz_atomically
+
+# Maximal allowed difference between the NumPy scorer and sklearn's predict_proba
+VERIFY_TOLERANCE = 1e-9
+
+
+class LogisticScorer:
+    """
+    Binary logistic regression reduced to its coefficients, scored with NumPy only.
+    """
+
+    def __init__(self, coef, intercept, classes):
+        """
+        :param coef: Array of shape (n_features,) with the coefficients of the positive class.
+        :param intercept: Intercept of the positive class.
+        :param classes: The two class labels, the positive class is the second one.
+        """
+        self.coef = np.asarray(coef, dtype=np.float64).reshape(-1)
+        self.intercept = float(intercept)
+        self.classes = np.asarray(classes)
+        self.nbytes = self.coef.nbytes + self.classes.nbytes
+
+    @classmethod
+    def from_estimator(cls, model):
+        """
+        :param model: Fitted sklearn LogisticRegression with two classes.
+        :return: LogisticScorer with the same coefficients.
+        """
+        if len(model.classes_) != 2:
+            raise ValueError(f"Only binary models are supported, got {len(model.classes_)} classes")
+        return cls(model.coef_[0], model.intercept_[0], model.classes_)
+
+    @property
+    def input_size(self):
+        return self.coef.shape[0]
+
+    def predict_proba(self, inputs):
+        """
+        :param inputs: One row of input features, or a 2D array-like with one row per sample.
+        :return: Probability of the positive class, a float for one row or an array for many rows.
+        """
+        x = np.asarray(inputs, dtype=np.float64)
+        if x.shape[-1] != self.input_size:
+            raise ValueError(f"Expected input rows with {self.input_size} features, got shape {x.shape}")
+
+        decision = x @ self.coef + self.intercept
+        probability = np.exp(-np.logaddexp(0, -decision))
+        return float(probability) if x.ndim == 1 else probability
+
+
+def scorer_path(model_path):
+    return os.path.splitext(model_path)[0] + ".scorer.npz"
+
+
+def verify_against_estimator(scorer, model, mark_values=range(7)):
+    """
+    Compare the scorer with sklearn's predict_proba on every combination of input marks.
+    :raises ValueError: If the probabilities differ by more than VERIFY_TOLERANCE.
+    """
+    inputs = np.array(list(itertools.product(mark_values, repeat=scorer.input_size)), dtype=float)
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # models fitted with feature names
+        expected = model.predict_proba(inputs)[:, 1]
+
+    difference = np.max(np.abs(expected - scorer.predict_proba(inputs)))
+    if difference > VERIFY_TOLERANCE:
+        raise ValueError(f"Scorer differs from sklearn by {difference}")
+
+
+def export_logistic_scorer(model_path):
+    """
+    Unpickle a LogisticRegression model, convert it to a LogisticScorer, verify it against
+    sklearn and store it next to the model. Storing is skipped if the directory is read-only.
+    :param model_path: Path to the pickled model.
+    :return: The LogisticScorer.
+    """
+    with open(model_path, "rb") as f:
+        model = pickle.load(f)
+
+    scorer = LogisticScorer.from_estimator(model)
+    verify_against_estimator(scorer, model)
+
+    try:
+        save_npz_atomically(scorer_path(model_path), coef=scorer.coef, intercept=scorer.intercept,
+                            classes=scorer.classes, source_sha256=file_sha256(model_path))
+    except OSError as e:
+        print(f"Could not store scorer for {model_path}: {e}", file=sys.stderr)
+
+    return scorer
+
+
+def load_logistic_scorer(model_path):
+    """
+    Load the scorer of a pickled LogisticRegression model. The stored scorer is used when it
+    was exported from the current model file, otherwise it is exported again.
+    :param model_path: Path to the pickled model.
+    :return: The LogisticScorer.
+    """
+    try:
+        with np.load(scorer_path(model_path)) as stored:
+            if str(stored["source_sha256"]) == file_sha256(model_path):
+                return LogisticScorer(stored["coef"], stored["intercept"], stored["classes"])
+    except (OSError, KeyError, ValueError):
+        pass
+
+    return export_logistic_scorer(model_path)
+
+
+def main():
+    """
+    Export and verify scorers of the given models.
+    Usage: python logistic_regression.py --export <model.pkl> [<model.pkl> ...]
+    """
+    if len(sys.argv) < 3 or sys.argv[1] != "--export":
+        print("Usage: python logistic_regression.py --export <model.pkl> [<model.pkl> ...]")
+        sys.exit(1)
+
+    for path in sys.argv[2:]:
+        export_logistic_scorer(path)
+        print(f"{path}: exported to {scorer_path(path)}")
+
+
+if __name__ == "__main__":
+    main()
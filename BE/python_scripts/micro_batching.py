@@ -0,0 +1,89 @@
+import asyncio
+
+
+class MicroBatcher:
+    """
+    Coalesces the input rows of concurrent requests for the same model into one batch. Rows
+    submitted under the same key are collected for window_seconds after the first of them, or
+    until max_batch_rows are waiting, then run with one call of run_batch in the executor and
+    the results are handed back to every caller in the order of its rows. If a batch of several
+    requests fails, every request is run again on its own, so that only the bad one fails.
+    """
+
+    def __init__(self, run_batch, executor, window_seconds, max_batch_rows):
+        """
+        :param run_batch: Function taking a key and a list of input rows and returning one
+                          result per row.
+        :param executor: Executor running run_batch.
+        :param window_seconds: How long the first request of a batch waits for others, 0 to run
+                               every request on its own.
+        :param max_batch_rows: Number of waiting rows which run a batch before the window ends.
+        """
+        self.run_batch = run_batch
+        self.executor = executor
+        self.window_seconds = window_seconds
+        self.max_batch_rows = max_batch_rows
+        self.pending = {}
+        self.timers = {}
+        self.running = set()
+        self.batches = 0
+        self.rows = 0
+        self.split_batches = 0
+
+    async def submit(self, key, input_rows):
+        """
+        :param key: Hashable key of the model, only rows with the same key are batched together.
+        :param input_rows: List with the input rows of one request.
+        :return: List with the results of the rows.
+        """
+        future = asyncio.get_running_loop().create_future()
+        batch = self.pending.setdefault(key, [])
+        batch.append((input_rows, future))
+
+        if self.window_seconds <= 0 or sum(len(rows) for rows, _ in batch) >= self.max_batch_rows:
+            self.flush(key)
+        elif len(batch) == 1:
+            self.timers[key] = asyncio.get_running_loop().call_later(self.window_seconds, self.flush, key)
+        return await future
+
+    def flush(self, key):
+        timer = self.timers.pop(key, None)
+        if timer is not None:
+            timer.cancel()
+        batch = self.pending.pop(key, None)
+        if batch:
+            task = asyncio.ensure_future(self.run(key, batch))
+            self.running.add(task)
+            task.add_done_callback(self.running.discard)
+
+    async def run(self, key, batch):
+        input_rows = [row for rows, _ in batch for row in rows]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(self.executor, self.run_batch, key, input_rows)
+        except Exception as e:
+            if len(batch) > 1:
+                self.split_batches += 1
+                await asyncio.gather(*(self.run(key, [request]) for request in batch))
+                return
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        # Counted only on success, rows of a split batch are counted once by the retries
+        self.batches += 1
+        self.rows += len(input_rows)
+        start = 0
+        for rows, future in batch:
+            if not future.done():  # the caller may have gone away
+                future.set_result(list(results[start:start + len(rows)]))
+            start += len(rows)
+
+    def statistics(self):
+        return {
+            "windowMs": self.window_seconds * 1000,
+            "maxBatchRows": self.max_batch_rows,
+            "batches": self.batches,
+            "rows": self.rows,
+            "splitBatches": self.split_batches,
+        }
@@ -0,0 +1,142 @@
+import os
+import sys
+import threading
+from collections import OrderedDict
+from collections.abc import Mapping
+
+# Memory budget of the loaded models, can be changed with the ALFRI_MODEL_CACHE_BYTES variable
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+def file_signature(path):
+    """
+    :return: (mtime, size) of the file, None if the file does not exist.
+    """
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def estimate_size(model, paths):
+    """
+    :return: Size of the model in bytes, taken from its nbytes attribute (summed for dictionaries
+             of models) or from the size of its files.
+    """
+    if isinstance(model, dict):
+        return sum(estimate_size(value, []) for value in model.values())
+    if hasattr(model, "nbytes"):
+        return int(model.nbytes)
+    return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+
+class ModelCache:
+    """
+    LRU cache of loaded models. An entry is reloaded when one of its files is replaced on disk
+    (its mtime or size changes) and the least recently used entries are evicted once the models
+    take more than max_bytes. Safe to use from several threads, a model is loaded by one of them.
+    """
+
+    def __init__(self, max_bytes=None):
+        if max_bytes is None:
+            max_bytes = int(os.environ.get("ALFRI_MODEL_CACHE_BYTES", DEFAULT_MAX_BYTES))
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        # Reentrant, because loading an entry may get other entries
+        self.lock = threading.RLock()
+
+    def get(self, key, paths, load):
+        """
+        :param key: Hashable key of the entry.
+        :param paths: Files the entry is loaded from.
+        :param load: Function without arguments loading the entry.
+        :return: The cached or freshly loaded entry.
+        """
+        signature = tuple(file_signature(path) for path in paths)
+
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                entry_signature, model, _ = entry
+                if entry_signature == signature:
+                    self.entries.move_to_end(key)
+                    return model
+                self.remove(key)
+
+            model = load()
+            size = estimate_size(model, paths)
+            self.entries[key] = (signature, model, size)
+            self.total_bytes += size
+            self.evict()
+            return model
+
+    def get_model(self, path, loader):
+        """
+        :param path: Path to the model file.
+        :param loader: Function loading the model from its path.
+        :return: The cached or freshly loaded model.
+        """
+        return self.get((loader, os.path.abspath(path)), [path], lambda: loader(path))
+
+    def remove(self, key):
+        _, _, size = self.entries.pop(key)
+        self.total_bytes -= size
+
+    def evict(self):
+        # The most recently loaded entry stays even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+            self.remove(next(iter(self.entries)))
+
+
+MODEL_CACHE = ModelCache()
+
+
+class LazyModels(Mapping):
+    """
+    Subject -> model mapping which loads a model when it is accessed, or all of them with
+    load_all. A model which cannot be loaded is reported on stderr and returned as None, it is not
+    loaded again until its file changes.
+    """
+
+    def __init__(self, model_paths, load_model):
+        """
+        :param model_paths: Dictionary with subject names as keys and paths to models as values.
+        :param load_model: Function loading the model of a subject, usually through MODEL_CACHE.
+        """
+        self.model_paths = model_paths
+        self.load_model = load_model
+        # Subject -> file signature of the model which failed to load
+        self.failures = {}
+
+    def __getitem__(self, subject):
+        if subject not in self.model_paths:
+            raise KeyError(subject)
+        signature = file_signature(self.model_paths[subject])
+        if subject in self.failures and self.failures[subject] == signature:
+            return None
+        try:
+            model = self.load_model(subject)
+        except Exception as e:
+            print(f"Error loading model for {subject}: {e}", file=sys.stderr)
+            self.failures[subject] = signature
+            return None  # Mark this model as not loadable
+        self.failures.pop(subject, None)
+        return model
+
+    def load_all(self):
+        """
+        Load every model, so that the first requests do not wait for them.
+        """
+        for subject in self:
+            self[subject]
+
+    def __contains__(self, subject):
+        return subject in self.model_paths
+
+    def __iter__(self):
+        return iter(self.model_paths)
+
+    def __len__(self):
+        return len(self.model_paths)
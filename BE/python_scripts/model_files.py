@@ -0,0 +1,115 @@
+import contextlib
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+
+def file_sha256(path):
+    """
+    :param path: Path to the file.
+    :return: Hex SHA-256 digest of the file content.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@contextlib.contextmanager
+def staged_files(paths):
+    """
+    Write several files so that readers never see a partially written file. The caller writes
+    temporary files next to the targets, which replace the targets one right after another
+    once the block finishes without an error. The set of files is not replaced atomically, a
+    reader can find some of them replaced and the others not yet.
+    :param paths: Target paths of the files.
+    :return: Context manager yielding the list of temporary paths to write, in the order of paths.
+    """
+    tmp_paths = []
+    try:
+        for path in paths:
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp")
+            os.close(fd)
+            tmp_paths.append(tmp_path)
+        yield tmp_paths
+
+        for tmp_path in tmp_paths:
+            os.chmod(tmp_path, 0o644)
+        for tmp_path, path in zip(tmp_paths, paths):
+            os.replace(tmp_path, path)
+    finally:
+        for tmp_path in tmp_paths:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+
+
+def save_npz_atomically(path, **arrays):
+    """
+    Write arrays into a .npz file so that readers never see a partially written file.
+    :param path: Target path of the .npz file.
+    :param arrays: Arrays to store, keyed by name.
+    """
+    with staged_files([path]) as (tmp_path,):
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+
+
+def save_npy_directory_atomically(link_path, version, metadata, **arrays):
+    """
+    Write arrays as .npy files which can be memory-mapped, together with a metadata.json file.
+    The files are written into a new directory <link_path>-<version> and the symlink link_path
+    is then switched to it, so readers see either the previous or the new complete set of
+    files. Directories of other versions are removed.
+    :param link_path: Path of the symlink readers open the files through.
+    :param version: Version of the content, e.g. a checksum of the source file.
+    :param metadata: JSON serializable dictionary stored as metadata.json.
+    :param arrays: Arrays to store, keyed by name.
+    """
+    link_path = os.path.abspath(link_path)
+    directory = f"{link_path}-{version}"
+    tmp_directory = tempfile.mkdtemp(dir=os.path.dirname(link_path), suffix=".tmp")
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_directory, name + ".npy"), array)
+        with open(os.path.join(tmp_directory, "metadata.json"), "w") as f:
+            json.dump(metadata, f)
+        os.chmod(tmp_directory, 0o755)
+
+        if os.path.isdir(directory):
+            # The same version was already written completely
+            shutil.rmtree(tmp_directory)
+        else:
+            os.rename(tmp_directory, directory)
+    except BaseException:
+        shutil.rmtree(tmp_directory, ignore_errors=True)
+        raise
+
+    tmp_link = f"{link_path}.{os.getpid()}.tmp"
+    os.symlink(os.path.basename(directory), tmp_link)
+    os.replace(tmp_link, link_path)
+
+    # Readers which still have files of an old version mapped keep them until they close them
+    for old_directory in glob.glob(glob.escape(link_path) + "-*"):
+        if old_directory != directory:
+            shutil.rmtree(old_directory, ignore_errors=True)
+
+
+def load_npy_directory(link_path, names, mmap_mode="r"):
+    """
+    Load arrays written by save_npy_directory_atomically.
+    :param link_path: Path of the symlink given to save_npy_directory_atomically.
+    :param names: Names of the arrays to load.
+    :param mmap_mode: Passed to np.load, the arrays are memory-mapped read-only by default.
+    :return: Tuple of the metadata dictionary and a dictionary with the arrays.
+    """
+    # Resolved once, so that all files come from the same version
+    directory = os.path.realpath(link_path)
+    with open(os.path.join(directory, "metadata.json")) as f:
+        metadata = json.load(f)
+    return metadata, {name: np.load(os.path.join(directory, name + ".npy"), mmap_mode=mmap_mode) for name in names}
@@ -7,10 +7,14 @@ logging.getLogger('tensorflow').setLevel(logging.ERROR)
 warnings.filterwarnings("ignore", category=UserWarning)  # Suppress user warnings
 warnings.filterwarnings("ignore", category=FutureWarning)  # Suppress future warnings
 
+import argparse
 import json
 import sys
-import tensorflow as tf
-import numpy as np
+
+# NumPy, h5py and TensorFlow are imported only once a model is loaded, so that invalid
+# requests fail fast. See benchmarks/import_budget.py.
+from json_lines_worker import get_request_data, is_batch, serve_json_lines
+from model_cache import MODEL_CACHE, LazyModels
 
 # Example structure of model_paths input:
 # {
@@ -30,39 +34,153 @@ DECODE_MAP = {
 }
 
 
-def load_models(model_paths):
+def load_models(model_paths, table_path=None):
     """
-    Load TensorFlow models from provided paths.
+    Load models from provided paths. Models are loaded on first access through MODEL_CACHE, so
+    they are reused across requests of the serve mode and reloaded when their file changes.
     :param model_paths: Dictionary with subject names as keys and paths to models as values.
-    :return: Dictionary with loaded models.
+    :param table_path: Optional path to the prediction tables (see prediction_tables.py). When
+                       given, predictions are looked up in the tables instead of running the models.
+    :return: Mapping with subject names as keys and loaded models (None if not loadable) as values.
     """
-    models = {}
-    for subject, path in model_paths.items():
-        try:
-            models[subject] = tf.keras.models.load_model(path, compile=False)
-        except Exception as e:
-            print(f"Error loading model for {subject}: {e}")
-            models[subject] = None  # Mark this model as not loadable
-    return models
+    def load_model(subject):
+        if table_path is not None:
+            from prediction_tables import cached_prediction_tables
+            try:
+                return cached_prediction_tables(table_path, mark_model_paths=model_paths)[subject]
+            except Exception as e:
+                print(f"Error loading prediction tables, running the model instead: {e}", file=sys.stderr)
+
+        from dense_network import load_mark_model
+        return MODEL_CACHE.get_model(model_paths[subject], load_mark_model)
+
+    return LazyModels(model_paths, load_model)
+
+
+def run_model_batch(model, input_rows):
+    """
+    Run inference for many inputs of one subject with a single forward pass.
+    :param model: The model to use for inference (DenseNetwork, KerasModel or SubjectTable).
+    :param input_rows: A list of input feature lists.
+    :return: List with the decoded predicted mark of every input.
+    """
+    if model is None:
+        return ["Error: Model not loaded"] * len(input_rows)
+    if len(input_rows) == 0:
+        return []
+
+    predicted_categories = model.predict_classes(input_rows)
+
+    return [DECODE_MAP.get(int(category), "Unknown") for category in predicted_categories]
 
 
 def run_model(model, input_data):
     """
     Run inference for a specific model with the provided input data.
-    :param model: The TensorFlow model to use for inference.
+    :param model: The model to use for inference (DenseNetwork, KerasModel or SubjectTable).
     :param input_data: A list of input features for the model.
     :return: The decoded predicted mark.
     """
+    return run_model_batch(model, [input_data])[0]
+
+
+def run_subject_model(model, subject_input):
+    """
+    :param subject_input: One list of input features, or a list of such lists.
+    :return: The decoded mark, or a list of decoded marks for a list of inputs.
+    """
+    if is_batch(subject_input):
+        return run_model_batch(model, subject_input)
+    return run_model(model, subject_input)
+
+
+def predict_marks(models, encoded_marks_dict):
+    """
+    Predict marks for every subject present in the request.
+    :param models: Dictionary with subject names as keys and loaded models as values.
+    :param encoded_marks_dict: Dictionary with subject names as keys and input arrays (or lists of
+                               input arrays) as values.
+    :return: Dictionary with subject names as keys and decoded marks (or lists of them) as values.
+    """
+    results = {}
+    for subject_name, subject_input in encoded_marks_dict.items():
+        if subject_name not in models:
+            raise ValueError(f"No model loaded for subject: {subject_name}")
+        results[subject_name] = run_subject_model(models[subject_name], subject_input)
+    return results
+
+
+def predict_classes(models, subject, input_rows):
+    """
+    :param models: Dictionary with subject names as keys and loaded models as values.
+    :param input_rows: Array with one input feature list per row.
+    :return: Array with the predicted class (see DECODE_MAP) of every row.
+    :raises ValueError: If the model of the subject is not loaded.
+    """
+    model = models[subject]
     if model is None:
-        return "Error: Model not loaded"
+        raise ValueError(f"Model for subject {subject} is not loaded.")
+    return model.predict_classes(input_rows)
+
+
+def serve_socket(model_paths, socket_path, table_path=None):
+    """
+    Long-running mode answering MARK requests of the binary protocol on a Unix domain socket,
+    see binary_protocol.py.
+    """
+    from binary_protocol import MARK, serve_unix_socket
+
+    models = load_models(model_paths, table_path)
+    models.load_all()
+    serve_unix_socket(socket_path, list(models), {MARK: lambda subject, rows: predict_classes(models, subject, rows)})
 
-    input_array = np.array([input_data])
 
-    predictions = model.predict(input_array, verbose=0)
+def serve(model_paths, table_path=None):
+    """
+    Long-running mode. Keeps the loaded models in memory and answers newline-delimited JSON
+    requests read from stdin, writing one JSON response line per request to stdout.
+
+    Once the models are loaded, a {"ready": true, "models": [...]} line is written so the
+    caller knows it can start sending requests.
+
+    request example:
+    {"data": {"Matematicka analyza 1": [0, 0, 0], "Diskretna pravdepodobnost": [[0, 0], [4, 6]]}}
+
+    response example:
+    {"results": {"Matematicka analyza 1": "A", "Diskretna pravdepodobnost": ["A", "E"]}}
+    """
+    models = load_models(model_paths, table_path)
+    models.load_all()
 
-    predicted_category = np.argmax(predictions, axis=1)[0]
+    def handle_request(request):
+        return {"results": predict_marks(models, get_request_data(request))}
 
-    return DECODE_MAP.get(predicted_category, "Unknown")
+    serve_json_lines(handle_request, {"ready": True, "models": list(models)})
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Predict marks of subjects with the neural network models.")
+    parser.add_argument("input_json", nargs="?", help="JSON string with input data, omitted with --serve and --socket")
+    parser.add_argument("model_paths_json", help="JSON string with model paths")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the models loaded and answer newline-delimited JSON requests from stdin")
+    parser.add_argument("--socket", metavar="SOCKET_PATH",
+                        help="keep the models loaded and answer binary requests on a Unix domain socket")
+    parser.add_argument("--lookup", metavar="TABLE_PATH",
+                        help="answer from precomputed prediction tables, rebuilt when a model file changes")
+    arguments = parser.parse_args()
+
+    if arguments.input_json is None and not (arguments.serve or arguments.socket):
+        parser.error("input_json is required unless --serve or --socket is used")
+    return arguments
+
+
+def parse_json_argument(argument, name):
+    try:
+        return json.loads(argument)
+    except json.JSONDecodeError:
+        print(f"Invalid JSON {name}.")
+        sys.exit(1)
 
 
 def main():
@@ -72,11 +190,21 @@ def main():
     - JSON string with input data (first argument)
     - JSON string with model paths (second argument)
 
-    input_data example:
+    or, for the long-running mode (see serve):
+    - --serve
+    - JSON string with model paths
+
+    or, for the binary protocol on a Unix domain socket (see serve_socket):
+    - --socket <socket_path>
+    - JSON string with model paths
+
+    Optionally --lookup <table_path> answers from precomputed prediction tables.
+
+    input_data example (a list of input arrays is predicted in one batch):
     {
        "data": {
            "Matematicka analyza 1": [0, 0, 0],
-           "Algoritmy a udajove struktury 1": [0, 0]
+           "Algoritmy a udajove struktury 1": [[0, 0, 0], [1, 2, 6]]
        }
     }
 
@@ -86,24 +214,17 @@ def main():
        "Algoritmy a udajove struktury 1": "./best_models/aus1.h5"
     }
     """
+    arguments = parse_arguments()
+    model_paths = parse_json_argument(arguments.model_paths_json, "model paths")
 
-    if len(sys.argv) != 3:
-        print("Usage: python run_models.py <input_json> <model_paths_json>")
-        sys.exit(1)
+    if arguments.socket:
+        serve_socket(model_paths, arguments.socket, arguments.lookup)
+        return
+    if arguments.serve:
+        serve(model_paths, arguments.lookup)
+        return
 
-    input_json = sys.argv[1]
-    try:
-        input_data = json.loads(input_json)
-    except json.JSONDecodeError:
-        print("Invalid JSON input.")
-        sys.exit(1)
-
-    model_paths_json = sys.argv[2]
-    try:
-        model_paths = json.loads(model_paths_json)
-    except json.JSONDecodeError:
-        print("Invalid JSON model paths.")
-        sys.exit(1)
+    input_data = parse_json_argument(arguments.input_json, "input")
 
     if "data" not in input_data:
         print("Input JSON must contain a 'data' field with a dictionary of subject->input.")
@@ -114,7 +235,7 @@ def main():
         print("The 'data' field must be a dictionary mapping each subject to its input array.")
         sys.exit(1)
 
-    models = load_models(model_paths)
+    models = load_models(model_paths, arguments.lookup)
 
     results = {}
     for subject_name, model in models.items():
@@ -123,7 +244,7 @@ def main():
             print(f"No input data provided for subject: {subject_name}")
             sys.exit(1)
 
-        results[subject_name] = run_model(model, subject_input)
+        results[subject_name] = run_subject_model(model, subject_input)
 
     # output
     print(json.dumps(results, indent=4))
@@ -5,42 +5,161 @@ os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 warnings.filterwarnings('ignore')
 
 
+import argparse
 import json
 import sys
-import pickle
-import numpy as np
 
-def load_models(model_paths):
+# NumPy is imported only once a model is loaded, so that invalid requests fail fast.
+# See benchmarks/import_budget.py.
+from json_lines_worker import get_request_data, is_batch, serve_json_lines
+from model_cache import MODEL_CACHE, LazyModels
+
+def load_models(model_paths, table_path=None):
     """
-    Load binary LogisticRegression models from provided .pkl paths.
+    Load binary LogisticRegression models from provided .pkl paths as NumPy scorers. Models are
+    loaded on first access through MODEL_CACHE, so they are reused across requests of the serve
+    mode and reloaded when their file changes.
     :param model_paths: Dictionary with subject names as keys and paths to models as values.
-    :return: Dictionary with loaded models (or None if load fails).
-    """
-    models = {}
-    for subject, path in model_paths.items():
-        try:
-            with open(path, "rb") as f:
-                models[subject] = pickle.load(f)
-        except Exception as e:
-            print(f"Error loading model for {subject}: {e}")
-            models[subject] = None
-    return models
+    :param table_path: Optional path to the prediction tables (see prediction_tables.py). When
+                       given, probabilities are looked up in the tables instead of scoring the models.
+    :return: Mapping with loaded LogisticScorer models (or None if load fails).
+    """
+    def load_model(subject):
+        if table_path is not None:
+            from prediction_tables import cached_prediction_tables
+            try:
+                return cached_prediction_tables(table_path, chance_model_paths=model_paths)[subject]
+            except Exception as e:
+                print(f"Error loading prediction tables, scoring the model instead: {e}", file=sys.stderr)
+
+        from logistic_regression import load_logistic_scorer
+        return MODEL_CACHE.get_model(model_paths[subject], load_logistic_scorer)
+
+    return LazyModels(model_paths, load_model)
 
 def get_passing_probability(model, input_data):
     """
     Run inference on a binary logistic regression model trained for passing vs. not passing.
     Model’s positive class (label=1) should correspond to “passing”.
-    :param model: The logistic regression model to use for inference.
+    :param model: The LogisticScorer or SubjectTable to use for inference.
     :param input_data: A list of input features for the model.
     :return: A float representing the probability (0.0 - 1.0) of passing.
     """
     if model is None:
         return None
 
-    X = np.array([input_data], dtype=float)
+    return model.predict_proba(input_data)
+
+def get_passing_probabilities(model, input_rows):
+    """
+    Run inference for many inputs of one subject at once.
+    :param model: The LogisticScorer or SubjectTable to use for inference.
+    :param input_rows: A list of input feature lists.
+    :return: List with the probability of passing (or None if the model is not loaded) for every input.
+    """
+    if model is None:
+        return [None] * len(input_rows)
+    if len(input_rows) == 0:
+        return []
+
+    return model.predict_proba(input_rows).tolist()
+
+def format_passing_probability(passing_probability):
+    if passing_probability is None:
+        return "Error: Model not loaded"
+    return f"{passing_probability * 100:.2f}"
+
+def get_formatted_passing_chance(model, subject_input):
+    """
+    :param subject_input: One list of input features, or a list of such lists.
+    :return: The formatted passing chance, or a list of them for a list of inputs.
+    """
+    if is_batch(subject_input):
+        return [format_passing_probability(probability)
+                for probability in get_passing_probabilities(model, subject_input)]
+    return format_passing_probability(get_passing_probability(model, subject_input))
+
+def predict_passing_chances(models, encoded_marks_dict):
+    """
+    Predict passing chances for every subject present in the request.
+    :param models: Dictionary with subject names as keys and loaded models as values.
+    :param encoded_marks_dict: Dictionary with subject names as keys and input arrays (or lists of
+                               input arrays) as values.
+    :return: Dictionary with subject names as keys and passing chances in percent (or lists of them) as values.
+    """
+    results = {}
+    for subject_name, subject_input in encoded_marks_dict.items():
+        if subject_name not in models:
+            raise ValueError(f"No model loaded for subject: {subject_name}")
+        results[subject_name] = get_formatted_passing_chance(models[subject_name], subject_input)
+    return results
+
+def predict_probabilities(models, subject, input_rows):
+    """
+    :param models: Dictionary with subject names as keys and loaded models as values.
+    :param input_rows: Array with one input feature list per row.
+    :return: Array with the probability (0.0 - 1.0) of passing for every row.
+    :raises ValueError: If the model of the subject is not loaded.
+    """
+    model = models[subject]
+    if model is None:
+        raise ValueError(f"Model for subject {subject} is not loaded.")
+    return model.predict_proba(input_rows)
+
+def serve_socket(model_paths, socket_path, table_path=None):
+    """
+    Long-running mode answering CHANCE requests of the binary protocol on a Unix domain socket,
+    see binary_protocol.py.
+    """
+    from binary_protocol import CHANCE, serve_unix_socket
+
+    models = load_models(model_paths, table_path)
+    models.load_all()
+    serve_unix_socket(socket_path, list(models),
+                      {CHANCE: lambda subject, rows: predict_probabilities(models, subject, rows)})
+
+def serve(model_paths, table_path=None):
+    """
+    Streaming worker mode. Keeps the loaded models in memory and answers newline-delimited
+    JSON requests read from stdin with one JSON response line per request on stdout.
+    Every model is loaded before the {"ready": true, "models": [...]} line is written.
+
+    request example:
+    {"data": {"Matematicka analyza 1": [0, 0, 0]}}
 
-    passing_prob = model.predict_proba(X)[0][1]
-    return float(passing_prob)
+    response example:
+    {"results": {"Matematicka analyza 1": "80.75"}}
+    """
+    models = load_models(model_paths, table_path)
+    models.load_all()
+
+    def handle_request(request):
+        return {"results": predict_passing_chances(models, get_request_data(request))}
+
+    serve_json_lines(handle_request, {"ready": True, "models": list(models)})
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Predict passing chances of subjects.")
+    parser.add_argument("input_json", nargs="?", help="JSON string with input data, omitted with --serve and --socket")
+    parser.add_argument("model_paths_json", help="JSON string with model paths")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the models loaded and answer newline-delimited JSON requests from stdin")
+    parser.add_argument("--socket", metavar="SOCKET_PATH",
+                        help="keep the models loaded and answer binary requests on a Unix domain socket")
+    parser.add_argument("--lookup", metavar="TABLE_PATH",
+                        help="answer from precomputed prediction tables, rebuilt when a model file changes")
+    arguments = parser.parse_args()
+
+    if arguments.input_json is None and not (arguments.serve or arguments.socket):
+        parser.error("input_json is required unless --serve or --socket is used")
+    return arguments
+
+def parse_json_argument(argument, name):
+    try:
+        return json.loads(argument)
+    except json.JSONDecodeError:
+        print(f"Invalid JSON {name}.")
+        sys.exit(1)
 
 def main():
     """
@@ -50,7 +169,7 @@ def main():
         {
           "data": {
             "Matematicka analyza 1": [feature1, feature2, ...],
-            "Diskretna pravdepodobnost": [feature1, feature2, ...],
+            "Diskretna pravdepodobnost": [[feature1, feature2, ...], [feature1, feature2, ...]],
             ...
           }
         }
@@ -60,27 +179,31 @@ def main():
           "Diskretna pravdepodobnost": "./path/to/dp.pkl",
           ...
         }
-    """
 
-    if len(sys.argv) != 3:
-        print("Usage: python run_passing_change.py <input_json> <model_paths_json>")
-        sys.exit(1)
+    or, for the streaming worker mode (see serve):
+     1) --serve
+     2) JSON string with model paths
 
-    # Parse input data
-    input_json = sys.argv[1]
-    try:
-        input_data = json.loads(input_json)
-    except json.JSONDecodeError:
-        print("Invalid JSON input.")
-        sys.exit(1)
+    or, for the binary protocol on a Unix domain socket (see serve_socket):
+     1) --socket <socket_path>
+     2) JSON string with model paths
+
+    Optionally --lookup <table_path> answers from precomputed prediction tables.
+    """
+    arguments = parse_arguments()
 
     # Parse model paths
-    model_paths_json = sys.argv[2]
-    try:
-        model_paths = json.loads(model_paths_json)
-    except json.JSONDecodeError:
-        print("Invalid JSON model paths.")
-        sys.exit(1)
+    model_paths = parse_json_argument(arguments.model_paths_json, "model paths")
+
+    if arguments.socket:
+        serve_socket(model_paths, arguments.socket, arguments.lookup)
+        return
+    if arguments.serve:
+        serve(model_paths, arguments.lookup)
+        return
+
+    # Parse input data
+    input_data = parse_json_argument(arguments.input_json, "input")
 
     if "data" not in input_data:
         print("Input JSON must contain a 'data' field with a dictionary of subject->input.")
@@ -91,7 +214,7 @@ def main():
         print("The 'data' field must be a dictionary mapping each subject to its input array.")
         sys.exit(1)
 
-    models = load_models(model_paths)
+    models = load_models(model_paths, arguments.lookup)
 
     results = {}
     for subject_name, model in models.items():
@@ -99,11 +222,7 @@ def main():
         if subject_input is None:
             print(f"No input data provided for subject: {subject_name}")
             sys.exit(1)
-        passing_probability = get_passing_probability(model, subject_input)
-        if passing_probability is None:
-            results[subject_name] = "Error: Model not loaded"
-        else:
-            results[subject_name] = f"{passing_probability * 100:.2f}"
+        results[subject_name] = get_formatted_passing_chance(model, subject_input)
 
     # output
     print(json.dumps(results, indent=4))
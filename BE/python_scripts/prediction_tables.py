@@ -0,0 +1,243 @@
+import itertools
+import json
+import os
+import sys
+
+import numpy as np
+
+from dense_network import load_mark_model
+from logistic_regression import load_logistic_scorer
+from model_cache import MODEL_CACHE
+from model_files import file_sha256, save_npz_atomically
+
+# Input marks are encoded 0-6 by MARK_MAPPING in SubjectService, 6 meaning a missing mark
+MARK_VALUES = 7
+MAX_INPUT_SIZE = 3
+TABLE_SIZE = MARK_VALUES ** MAX_INPUT_SIZE
+
+# Stored in place of a mark class when the subject has no mark model in the table
+UNKNOWN_MARK_CLASS = 255
+
+# Arrays of the table file, see build_prediction_tables
+ARRAY_NAMES = ("subjects", "input_sizes", "mark_classes", "passing_probabilities", "mark_model_sha256",
+               "chance_model_sha256")
+
+
+class SubjectTable:
+    """
+    Predictions of one subject for every possible input, indexed by the input marks read as
+    a base-7 number. Answers with the same interface as DenseNetwork (mark classes) and
+    LogisticScorer (passing probability).
+    """
+
+    def __init__(self, input_size, mark_classes, passing_probabilities):
+        self.input_size = input_size
+        self.mark_classes = mark_classes
+        self.passing_probabilities = passing_probabilities
+        self.place_values = MARK_VALUES ** np.arange(input_size - 1, -1, -1)
+        self.nbytes = mark_classes.nbytes + passing_probabilities.nbytes
+
+    def index(self, inputs):
+        """
+        :param inputs: 2D array-like with one row of encoded marks per sample.
+        :return: Array with the table index of every row.
+        """
+        x = np.asarray(inputs)
+        if x.ndim != 2 or x.shape[1] != self.input_size:
+            raise ValueError(f"Expected input rows with {self.input_size} features, got shape {x.shape}")
+
+        indices = x.astype(np.intp)
+        if np.any(indices != x) or np.any((indices < 0) | (indices >= MARK_VALUES)):
+            raise ValueError(f"Input marks must be whole numbers from 0 to {MARK_VALUES - 1}")
+        return indices @ self.place_values
+
+    def predict_classes(self, inputs):
+        mark_classes = self.mark_classes[self.index(inputs)]
+        if np.any(mark_classes == UNKNOWN_MARK_CLASS):
+            raise ValueError("Prediction table does not contain a mark model for this subject")
+        return mark_classes
+
+    def predict_proba(self, inputs):
+        one_row = np.ndim(inputs) == 1
+        passing_probabilities = self.passing_probabilities[self.index(np.atleast_2d(inputs))]
+        if np.any(np.isnan(passing_probabilities)):
+            raise ValueError("Prediction table does not contain a passing chance model for this subject")
+        return float(passing_probabilities[0]) if one_row else passing_probabilities
+
+
+def enumerate_inputs(input_size):
+    return np.array(list(itertools.product(range(MARK_VALUES), repeat=input_size)), dtype=np.float32)
+
+
+def build_prediction_tables(mark_model_paths, chance_model_paths):
+    """
+    Run every model on every possible input.
+    :param mark_model_paths: Dictionary with subject names as keys and paths to mark models as values.
+    :param chance_model_paths: Dictionary with subject names as keys and paths to chance models as values.
+    :return: Dictionary of arrays as stored in the table file.
+    """
+    subjects = sorted(set(mark_model_paths) | set(chance_model_paths))
+
+    input_sizes = np.zeros(len(subjects), dtype=np.uint8)
+    mark_classes = np.full((len(subjects), TABLE_SIZE), UNKNOWN_MARK_CLASS, dtype=np.uint8)
+    passing_probabilities = np.full((len(subjects), TABLE_SIZE), np.nan)
+    mark_checksums = []
+    chance_checksums = []
+
+    for i, subject in enumerate(subjects):
+        mark_model = load_mark_model(mark_model_paths[subject]) if subject in mark_model_paths else None
+        chance_model = load_logistic_scorer(chance_model_paths[subject]) if subject in chance_model_paths else None
+
+        sizes = {model.input_size for model in (mark_model, chance_model) if model is not None}
+        if len(sizes) != 1 or max(sizes) > MAX_INPUT_SIZE:
+            raise ValueError(f"Models of subject {subject} do not share an input size up to {MAX_INPUT_SIZE}")
+
+        input_size = sizes.pop()
+        inputs = enumerate_inputs(input_size)
+        input_sizes[i] = input_size
+
+        if mark_model is not None:
+            mark_classes[i, :len(inputs)] = mark_model.predict_classes(inputs)
+        if chance_model is not None:
+            passing_probabilities[i, :len(inputs)] = chance_model.predict_proba(inputs)
+
+        mark_checksums.append(file_sha256(mark_model_paths[subject]) if mark_model is not None else "")
+        chance_checksums.append(file_sha256(chance_model_paths[subject]) if chance_model is not None else "")
+
+    return {
+        "subjects": np.array(subjects),
+        "input_sizes": input_sizes,
+        "mark_classes": mark_classes,
+        "passing_probabilities": passing_probabilities,
+        "mark_model_sha256": np.array(mark_checksums),
+        "chance_model_sha256": np.array(chance_checksums),
+    }
+
+
+def keep_other_models(tables, previous, mark_model_paths, chance_model_paths):
+    """
+    Carry the predictions of the models which were not asked for over from the previous tables.
+    The mark and the chance script share one table file but each passes only its own kind of
+    models, so a rebuild by one of them must not drop the predictions of the other.
+    :param tables: Dictionary of arrays built from the given model paths.
+    :param previous: Dictionary of arrays of the stored tables.
+    :return: Dictionary of arrays with the rows of both.
+    """
+    kinds = (("mark_classes", "mark_model_sha256", mark_model_paths),
+             ("passing_probabilities", "chance_model_sha256", chance_model_paths))
+
+    def rows_of(arrays):
+        return {subject: {name: arrays[name][i] for name in ARRAY_NAMES if name != "subjects"}
+                for i, subject in enumerate(arrays["subjects"].tolist())}
+
+    rows = rows_of(tables)
+    for subject, previous_row in rows_of(previous).items():
+        for values_name, checksum_name, model_paths in kinds:
+            if subject in model_paths or not previous_row[checksum_name]:
+                continue
+            row = rows.get(subject)
+            if row is None:
+                rows[subject] = row = {
+                    "input_sizes": previous_row["input_sizes"],
+                    "mark_classes": np.full(TABLE_SIZE, UNKNOWN_MARK_CLASS, dtype=np.uint8),
+                    "passing_probabilities": np.full(TABLE_SIZE, np.nan),
+                    "mark_model_sha256": "",
+                    "chance_model_sha256": "",
+                }
+            elif row["input_sizes"] != previous_row["input_sizes"]:
+                continue
+            row[values_name] = previous_row[values_name]
+            row[checksum_name] = previous_row[checksum_name]
+
+    subjects = sorted(rows)
+    return {"subjects": np.array(subjects),
+            **{name: np.array([rows[subject][name] for subject in subjects])
+               for name in ARRAY_NAMES if name != "subjects"}}
+
+
+def is_up_to_date(tables, mark_model_paths, chance_model_paths):
+    """
+    :return: True if the tables contain every requested subject and were built from the
+             current content of its model files.
+    """
+    rows = {subject: i for i, subject in enumerate(tables["subjects"].tolist())}
+    for model_paths, checksums in ((mark_model_paths, tables["mark_model_sha256"]),
+                                   (chance_model_paths, tables["chance_model_sha256"])):
+        for subject, path in model_paths.items():
+            if subject not in rows or checksums[rows[subject]] != file_sha256(path):
+                return False
+    return True
+
+
+def to_subject_tables(tables):
+    return {
+        subject: SubjectTable(int(tables["input_sizes"][i]), tables["mark_classes"][i],
+                              tables["passing_probabilities"][i])
+        for i, subject in enumerate(tables["subjects"].tolist())
+    }
+
+
+def load_prediction_tables(table_path, mark_model_paths=None, chance_model_paths=None):
+    """
+    Load the prediction tables, rebuilding the table file first when it is missing or when a
+    checksum of one of the given model files changed. Models of the table file which are not
+    given are kept, see keep_other_models.
+    :param table_path: Path to the .npz table file.
+    :param mark_model_paths: Dictionary with subject names as keys and paths to mark models as values.
+    :param chance_model_paths: Dictionary with subject names as keys and paths to chance models as values.
+    :return: Dictionary with subject names as keys and SubjectTable as values.
+    """
+    mark_model_paths = mark_model_paths or {}
+    chance_model_paths = chance_model_paths or {}
+
+    previous = None
+    try:
+        with np.load(table_path) as stored:
+            previous = {name: stored[name] for name in ARRAY_NAMES}
+        if is_up_to_date(previous, mark_model_paths, chance_model_paths):
+            return to_subject_tables(previous)
+    except (OSError, KeyError, ValueError):
+        pass
+
+    tables = build_prediction_tables(mark_model_paths, chance_model_paths)
+    if previous is not None:
+        tables = keep_other_models(tables, previous, mark_model_paths, chance_model_paths)
+    try:
+        save_npz_atomically(table_path, **tables)
+    except OSError as e:
+        print(f"Could not store prediction tables to {table_path}: {e}", file=sys.stderr)
+
+    return to_subject_tables(tables)
+
+
+def cached_prediction_tables(table_path, mark_model_paths=None, chance_model_paths=None):
+    """
+    Same as load_prediction_tables, but keeps the tables in MODEL_CACHE until the table file or
+    one of the model files changes.
+    """
+    mark_model_paths = mark_model_paths or {}
+    chance_model_paths = chance_model_paths or {}
+
+    key = ("prediction_tables", os.path.abspath(table_path),
+           json.dumps([mark_model_paths, chance_model_paths], sort_keys=True))
+    paths = [table_path, *mark_model_paths.values(), *chance_model_paths.values()]
+
+    return MODEL_CACHE.get(key, paths,
+                           lambda: load_prediction_tables(table_path, mark_model_paths, chance_model_paths))
+
+
+def main():
+    """
+    Build the prediction tables.
+    Usage: python prediction_tables.py <table_path> <mark_model_paths_json> <chance_model_paths_json>
+    """
+    if len(sys.argv) != 4:
+        print("Usage: python prediction_tables.py <table_path> <mark_model_paths_json> <chance_model_paths_json>")
+        sys.exit(1)
+
+    subject_tables = load_prediction_tables(sys.argv[1], json.loads(sys.argv[2]), json.loads(sys.argv[3]))
+    print(f"Prediction tables for {len(subject_tables)} subjects stored in {sys.argv[1]}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+import gc
+import os
+import signal
+import sys
+import time
+import traceback
+
+# Seconds between two checks of the workers
+CHECK_SECONDS = 1
+# Seconds the workers get to finish after SIGTERM before they are killed
+STOP_SECONDS = 10
+
+
+def private_memory_bytes(pid):
+    """
+    :return: Memory of the process not shared with other processes (private clean and dirty
+             pages), so that model pages shared copy-on-write with the parent are not counted.
+             None if the process does not exist.
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            return sum(int(line.split()[1]) * 1024 for line in f
+                       if line.startswith(("Private_Clean:", "Private_Dirty:")))
+    except OSError:
+        pass
+
+    # Kernels without smaps_rollup, the resident set size includes the shared pages
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            return next(int(line.split()[1]) * 1024 for line in f if line.startswith("VmRSS:"))
+    except (OSError, StopIteration):
+        return None
+
+
+def start_worker(worker_main):
+    """
+    Fork a worker running worker_main, the worker exits when the function returns.
+    :return: Process id of the worker.
+    """
+    pid = os.fork()
+    if pid:
+        return pid
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, signal.SIG_DFL)
+    exit_code = 0
+    try:
+        worker_main()
+    except BaseException:
+        traceback.print_exc()
+        exit_code = 1
+    finally:
+        sys.stderr.flush()
+        os._exit(exit_code)
+
+
+def has_exited(pid):
+    """
+    :return: Tuple of whether the worker exited and its wait status.
+    """
+    try:
+        exited_pid, status = os.waitpid(pid, os.WNOHANG)
+    except ChildProcessError:
+        return True, 0
+    return exited_pid != 0, status
+
+
+def stop_workers(workers):
+    """
+    Stop the workers with SIGTERM, or with SIGKILL if they do not exit within STOP_SECONDS.
+    """
+    workers = set(workers)
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+
+    deadline = time.monotonic() + STOP_SECONDS
+    while workers and time.monotonic() < deadline:
+        workers = {pid for pid in workers if not has_exited(pid)[0]}
+        time.sleep(0.05)
+
+    for pid in workers:
+        try:
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+        except (ProcessLookupError, ChildProcessError):
+            pass
+
+
+def run_workers(worker_main, worker_count, max_worker_bytes=None):
+    """
+    Supervise worker_count forked workers until SIGINT or SIGTERM. Everything loaded before the
+    call is shared by the workers copy-on-write, gc.freeze keeps the garbage collector from
+    writing to those pages. A worker which exits or takes more than max_worker_bytes of private
+    memory is replaced by a new one.
+    :param worker_main: Function run by every worker, e.g. an accept loop on a listening socket
+                        created before the call.
+    :param worker_count: Number of workers.
+    :param max_worker_bytes: Private memory ceiling of a worker, see private_memory_bytes.
+    """
+    stopping = False
+
+    def stop(signal_number, frame):
+        nonlocal stopping
+        stopping = True
+
+    for signal_number in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signal_number, stop)
+
+    gc.freeze()
+    workers = {start_worker(worker_main) for _ in range(worker_count)}
+    print(f"Started {worker_count} workers: {', '.join(map(str, sorted(workers)))}", file=sys.stderr)
+
+    try:
+        while not stopping:
+            time.sleep(CHECK_SECONDS)
+
+            for pid in list(workers):
+                exited, status = has_exited(pid)
+                if exited:
+                    print(f"Worker {pid} exited with code {os.waitstatus_to_exitcode(status)}, restarting it",
+                          file=sys.stderr)
+                elif max_worker_bytes is not None and (private_memory_bytes(pid) or 0) > max_worker_bytes:
+                    print(f"Worker {pid} takes more than {max_worker_bytes} bytes, restarting it", file=sys.stderr)
+                    stop_workers({pid})
+                else:
+                    continue
+
+                workers.remove(pid)
+                if not stopping:
+                    workers.add(start_worker(worker_main))
+    finally:
+        stop_workers(workers)
@@ -1,56 +1,372 @@
-import joblib
-import numpy as np
+import argparse
+import json
+import struct
 import sys
-import ast
-import warnings
-from sklearn.exceptions import InconsistentVersionWarning
-
-with warnings.catch_warnings():
-    warnings.simplefilter("ignore", InconsistentVersionWarning)
-
-    model = joblib.load(sys.argv[2])
-    chosen_rows = np.array(ast.literal_eval(sys.argv[1]))
-    centroid = np.mean(chosen_rows, axis=0).reshape(1, -1)
-    predicted_cluster = model.predict(centroid)[0]
-
-    cluster_indices = np.where(model.labels_ == predicted_cluster)[0]
-    print(cluster_indices)
-
-# ak chceme robit pre kazdy predmet predikciu zvlast a vysledky spojit
-# import joblib
-# import numpy as np
-# import sys
-# import ast
-#
-# # Load the pre-trained KMeans model
-# model = joblib.load(sys.argv[2])
-#
-# # Parse the input chosen_rows from command-line argument and convert to numpy arrays
-# chosen_rows_list = ast.literal_eval(sys.argv[1])
-# chosen_rows = np.array(chosen_rows_list)
-#
-# # Initialize an empty list to store all predicted cluster indices
-# all_cluster_indices = []
-#
-# # Iterate over each set of chosen_rows
-# for chosen_rows in chosen_rows_list:
-#     # Convert chosen_rows to numpy array and reshape if necessary
-#     chosen_rows = np.array(chosen_rows)
-#     if chosen_rows.ndim == 1:
-#         chosen_rows = chosen_rows.reshape(1, -1)
-#
-#     # Calculate the centroid of chosen_rows
-#     centroid = np.mean(chosen_rows, axis=0).reshape(1, -1)
-#
-#     # Predict the cluster for the centroid
-#     predicted_cluster = model.predict(centroid)[0]
-#
-#     # Find indices of subjects belonging to the predicted cluster
-#     cluster_indices = np.where(model.labels_ == predicted_cluster)[0]
-#
-#     # Append the indices to all_cluster_indices
-#     all_cluster_indices.extend(cluster_indices)
-#
-# # Convert to numpy array to ensure uniqueness and then get distinct values
-# distinct_cluster_indices = np.unique(all_cluster_indices)
-# print(distinct_cluster_indices)
+
+# NumPy is imported only after the arguments are validated, scikit-learn only when the
+# clustering model has to be exported again. See benchmarks/import_budget.py.
+from json_lines_worker import serve_json_lines
+from model_cache import MODEL_CACHE
+
+# Binary input: little-endian uint32 row count and uint32 column count followed by the
+# row-major float64 focus values
+BINARY_HEADER = struct.Struct("<II")
+
+
+def get_focus_vectors(request):
+    """
+    :param request: Parsed JSON request, e.g. {"focusVectors": [[10, 2, 3, ...], [4, 5, 6, ...]]}
+    :return: Array with the focus vectors of the chosen subjects, one per row.
+    :raises ValueError: If the request does not contain a non-empty list of focus vectors.
+    """
+    import numpy as np
+
+    focus_vectors = request.get("focusVectors") if isinstance(request, dict) else None
+    if not isinstance(focus_vectors, list) or not focus_vectors \
+            or not all(isinstance(vector, list) for vector in focus_vectors):
+        raise ValueError("Request must contain a 'focusVectors' field with a non-empty list of vectors.")
+
+    try:
+        focus_vectors = np.array(focus_vectors, dtype=np.float64)
+    except (TypeError, ValueError):
+        focus_vectors = None
+    if focus_vectors is None or focus_vectors.ndim != 2:
+        raise ValueError("Focus vectors must be lists of numbers of the same length.")
+    return focus_vectors
+
+
+def parse_binary_input(content):
+    """
+    :param content: Bytes in the BINARY_HEADER format.
+    :return: Array of focus vectors of the chosen subjects.
+    :raises ValueError: If the content does not match its header.
+    """
+    import numpy as np
+
+    if len(content) < BINARY_HEADER.size:
+        raise ValueError("Binary input is shorter than its header.")
+    rows, columns = BINARY_HEADER.unpack_from(content)
+    values = content[BINARY_HEADER.size:]
+    if rows == 0 or len(values) != rows * columns * 8:
+        raise ValueError(f"Binary input does not contain {rows}x{columns} float64 values.")
+    return np.frombuffer(values, dtype="<f8").reshape(rows, columns)
+
+
+def read_focus_vectors(input_stream, input_format):
+    """
+    :param input_stream: Binary stream with the request.
+    :param input_format: "json" or "binary".
+    :return: Array with one focus vector per row.
+    """
+    content = input_stream.read()
+    if input_format == "binary":
+        return parse_binary_input(content)
+
+    try:
+        request = json.loads(content)
+    except json.JSONDecodeError:
+        raise ValueError("Invalid JSON input.")
+    return get_focus_vectors(request)
+
+
+def find_cluster(model, focus_vectors):
+    """
+    Blend mode: recommend the cluster of the centroid of the chosen subjects.
+    :param model: ClusteringModel of the KMeans model.
+    :param focus_vectors: Array with the focus vectors of the chosen subjects.
+    :return: Dictionary with the cluster of the centroid, the indices of the subjects in that
+             cluster and the distances of the centroid to every cluster center.
+    """
+    import numpy as np
+
+    centroid = np.mean(focus_vectors, axis=0).reshape(1, -1)
+    squared_distances = model.squared_distances(centroid)
+    predicted_cluster = int(np.argmin(squared_distances[0]))
+
+    return {
+        "clusters": [predicted_cluster],
+        "indices": model.members_of(predicted_cluster).tolist(),
+        "distances": np.sqrt(squared_distances).tolist(),
+    }
+
+
+def find_clusters_union(model, focus_vectors):
+    """
+    Union mode: recommend the clusters of every chosen subject.
+    :param model: ClusteringModel of the KMeans model.
+    :param focus_vectors: Array with the focus vectors of the chosen subjects.
+    :return: Dictionary with the distinct clusters of the chosen subjects, the sorted indices of
+             the subjects in any of them and the distances of every chosen subject to every
+             cluster center.
+    """
+    import numpy as np
+
+    squared_distances = model.squared_distances(focus_vectors)
+    predicted_clusters = np.unique(np.argmin(squared_distances, axis=1))
+
+    return {
+        "clusters": predicted_clusters.tolist(),
+        "indices": np.unique(np.concatenate([model.members_of(cluster) for cluster in predicted_clusters])).tolist(),
+        "distances": np.sqrt(squared_distances).tolist(),
+    }
+
+
+MODES = {
+    "blend": find_cluster,
+    "union": find_clusters_union,
+}
+
+
+def rank_candidates(model, focus_vectors, result, top_k=None, offset=0):
+    """
+    Order the recommended subjects by the distance of their focus vector from the centroid of the
+    chosen subjects and keep one page of them. Ties are ordered by subject index.
+    Without the focus matrix of the model the subjects of one cluster cannot be told apart, so
+    every recommended subject is returned unranked in index order, without scores and paging,
+    for the caller to rank them by their own focus vectors.
+    :param model: ClusteringModel of the KMeans model.
+    :param focus_vectors: Array with the focus vectors of the chosen subjects.
+    :param result: Result of one of the MODES.
+    :param top_k: Number of subjects to return, all if None.
+    :param offset: Number of best ranked subjects to skip.
+    :return: The result with the page of ranked indices, their subject ids and scores (distances),
+             the total number of recommended subjects and the basis of the scores ("subject", or
+             None if the subjects are not ranked).
+    """
+    import numpy as np
+
+    candidates = np.asarray(result["indices"], dtype=np.intp)
+    if model.focus is None:
+        return {
+            **result,
+            "subjectIds": model.subject_ids[candidates].tolist(),
+            "scores": None,
+            "total": len(candidates),
+            "scoreBasis": None,
+        }
+
+    differences = model.focus[candidates] - np.mean(focus_vectors, axis=0)
+    scores = np.sqrt(np.einsum("ij,ij->i", differences, differences))
+    order = np.lexsort((candidates, scores))
+    page = candidates[order[offset:] if top_k is None else order[offset:offset + top_k]]
+
+    return {
+        **result,
+        "indices": page.tolist(),
+        "subjectIds": model.subject_ids[page].tolist(),
+        "scores": scores[order][offset:offset + len(page)].tolist(),
+        "total": len(candidates),
+        "scoreBasis": "subject",
+    }
+
+
+def find_nearest_subjects(model, tree, focus_vectors, top_k=None, offset=0):
+    """
+    kdtree backend: rank the subjects nearest to the centroid of the chosen subjects, without
+    clusters.
+    :param model: ClusteringModel of the KMeans model.
+    :param tree: KDTree over the focus matrix of the model.
+    :param focus_vectors: Array with the focus vectors of the chosen subjects.
+    :param top_k: Number of subjects to return, all if None.
+    :param offset: Number of best ranked subjects to skip.
+    :return: Dictionary with the same fields as rank_candidates, with no clusters and distances.
+    """
+    import numpy as np
+
+    subjects = len(model.labels)
+    rows, distances = tree.query(np.mean(focus_vectors, axis=0), subjects if top_k is None else offset + top_k)
+
+    return {
+        "clusters": [],
+        "indices": rows[offset:].tolist(),
+        "distances": [],
+        "subjectIds": model.subject_ids[rows[offset:]].tolist(),
+        "scores": distances[offset:].tolist(),
+        "total": subjects,
+        "scoreBasis": "subject",
+    }
+
+
+BACKENDS = ("kmeans", "kdtree")
+
+
+def recommend(model_path, model, focus_vectors, mode="blend", top_k=None, offset=0, backend="kmeans"):
+    """
+    :return: Ranked page of subjects similar to the chosen ones, see MODES and rank_candidates
+             for the kmeans backend and find_nearest_subjects for the kdtree backend.
+    """
+    if backend == "kdtree":
+        if mode != "blend":
+            raise ValueError("The kdtree backend supports only the blend mode.")
+        return find_nearest_subjects(model, load_tree(model_path, model), focus_vectors, top_k, offset)
+    return rank_candidates(model, focus_vectors, MODES[mode](model, focus_vectors), top_k, offset)
+
+
+def load_models(model_paths):
+    """
+    Load clustering models through MODEL_CACHE, so that a long-running process reloads a model
+    when its pickle, metadata or focus matrix changes.
+    :param model_paths: Paths to the pickled KMeans models.
+    :return: Dictionary with model paths as keys and ClusteringModel as values.
+    """
+    from clustering_model import load_clustering_model, model_files
+
+    return {path: MODEL_CACHE.get(("clustering", path), model_files(path), lambda path=path: load_clustering_model(path))
+            for path in model_paths}
+
+
+def load_tree(model_path, model):
+    """
+    Load the KD-tree over the focus matrix of a model through MODEL_CACHE.
+    :raises ValueError: If the model has no focus matrix.
+    """
+    from clustering_model import focus_matrix_path
+    from kd_tree import load_kd_tree
+
+    source_path = focus_matrix_path(model_path)
+    if model.focus is None:
+        raise ValueError(f"The kdtree backend needs the focus matrix {source_path}, "
+                         f"export it with: python retrain_clustering.py {model_path} --export-focus ...")
+    return MODEL_CACHE.get(("kdtree", model_path), [source_path],
+                           lambda: load_kd_tree(model_path, model.focus, source_path))
+
+
+def select_model(models, study_program_id=None):
+    """
+    :param models: Dictionary with model paths as keys and ClusteringModel as values.
+    :param study_program_id: Study program of the student, may be None if there is one model.
+    :return: Tuple of the path and the model listing the study program in its metadata, or else
+             of the default model.
+    :raises ValueError: If no model serves the study program.
+    """
+    if study_program_id is None and len(models) == 1:
+        return next(iter(models.items()))
+
+    for path, model in models.items():
+        if study_program_id in model.study_program_ids:
+            return path, model
+    for path, model in models.items():
+        if model.is_default:
+            return path, model
+    raise ValueError(f"No clustering model for study program {study_program_id}")
+
+
+def parse_page_argument(request, name):
+    value = request.get(name)
+    if value is not None and (not isinstance(value, int) or isinstance(value, bool) or value < 0):
+        raise ValueError(f"'{name}' must be a non-negative integer.")
+    return value
+
+
+def handle_request(model_paths, request):
+    """
+    Answer one request of the serve mode.
+    :param model_paths: Paths to the pickled KMeans models.
+    :param request: Parsed JSON request, see serve.
+    :return: The recommendation as returned by recommend.
+    """
+    focus_vectors = get_focus_vectors(request)
+    mode = request.get("mode", "blend")
+    if mode not in MODES:
+        raise ValueError(f"'mode' must be one of {', '.join(MODES)}.")
+    backend = request.get("backend", "kmeans")
+    if backend not in BACKENDS:
+        raise ValueError(f"'backend' must be one of {', '.join(BACKENDS)}.")
+
+    model_path, model = select_model(load_models(model_paths), request.get("studyProgramId"))
+    return recommend(model_path, model, focus_vectors, mode, parse_page_argument(request, "topK"),
+                     parse_page_argument(request, "offset") or 0, backend)
+
+
+def serve(model_paths):
+    """
+    Long-running mode with the models of every study program, see json_lines_worker.serve_json_lines.
+
+    request example:
+    {"studyProgramId": 3, "focusVectors": [[10, 2, 3, 0, 0, 0, 1, 0, 4, 2, 0, 0]], "mode": "union", "topK": 10, "offset": 0,
+     "backend": "kmeans"}
+
+    response example: same as the output of main
+    """
+    models = load_models(model_paths).values()
+    ready_message = {
+        "ready": True,
+        "studyPrograms": sorted(study_program_id for model in models for study_program_id in model.study_program_ids),
+        "default": any(model.is_default for model in models),
+    }
+    serve_json_lines(lambda request: handle_request(model_paths, request), ready_message)
+
+
+def non_negative_int(value):
+    number = int(value)
+    if number < 0:
+        raise argparse.ArgumentTypeError(f"{value} is negative")
+    return number
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Find the subjects in the cluster of the chosen subjects.")
+    parser.add_argument("model_paths", nargs="+", help="paths to the pre-trained KMeans models")
+    parser.add_argument("--study-program-id", type=int,
+                        help="study program of the student, selects the model by its metadata")
+    parser.add_argument("--input-format", choices=("json", "binary"), default="json",
+                        help="format of the focus vectors on stdin")
+    parser.add_argument("--mode", choices=tuple(MODES), default="blend",
+                        help="blend: cluster of the centroid of the chosen subjects, "
+                             "union: clusters of every chosen subject")
+    parser.add_argument("--backend", choices=BACKENDS, default="kmeans",
+                        help="kmeans: subjects of the nearest clusters, kdtree: nearest subjects by their focus "
+                             "vectors (needs the focus matrix of the model)")
+    parser.add_argument("--top-k", type=non_negative_int, help="number of best ranked subjects to return")
+    parser.add_argument("--offset", type=non_negative_int, default=0, help="number of best ranked subjects to skip")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the models loaded and answer newline-delimited JSON requests from stdin")
+    return parser.parse_args()
+
+
+def main():
+    """
+    Main entry point for the script. Reads the focus vectors of the chosen subjects from stdin,
+    so the request size is not limited by the command line. The model is selected by the study
+    program from the metadata of the models (see clustering_model.load_metadata).
+    Usage: python subject_clustering.py <model_path> [<model_path> ...] [--study-program-id ID]
+                                        [--input-format json|binary] [--mode blend|union]
+                                        [--backend kmeans|kdtree] [--top-k K] [--offset N] < request
+    or, for the long-running mode (see serve):
+           python subject_clustering.py <model_path> [<model_path> ...] --serve
+
+    The recommended subjects are ordered by distance, see rank_candidates. Without the focus matrix
+    of the model they are not ranked, "scores" and "scoreBasis" are null and --top-k and --offset
+    are ignored.
+
+    input example (json):
+    {"focusVectors": [[10, 2, 3, 0, 0, 0, 1, 0, 4, 2, 0, 0], [8, 6, 7, 0, 0, 0, 0, 0, 2, 1, 0, 0]]}
+
+    output example (blend, one row of distances for the centroid):
+    {"clusters": [2], "indices": [19, 8, 20], "subjectIds": [20, 9, 21], "distances": [[4.1, 6.3, 1.2, 5.0, 7.7, 3.9]],
+     "scores": [0.8, 1.3, 2.0], "total": 3, "scoreBasis": "subject"}
+
+    output example (union, one row of distances per chosen subject):
+    {"clusters": [0, 2], "indices": [19, 3, 8, 20], "subjectIds": [20, 4, 9, 21], "distances": [[1.1, ...], [5.2, ...]],
+     "scores": [0.8, 1.1, 1.3, 2.0], "total": 4, "scoreBasis": "subject"}
+    """
+    arguments = parse_arguments()
+
+    if arguments.serve:
+        serve(arguments.model_paths)
+        return
+
+    try:
+        focus_vectors = read_focus_vectors(sys.stdin.buffer, arguments.input_format)
+        model_path, model = select_model(load_models(arguments.model_paths), arguments.study_program_id)
+        result = recommend(model_path, model, focus_vectors, arguments.mode, arguments.top_k, arguments.offset,
+                           arguments.backend)
+    except (OSError, ValueError) as e:
+        print(json.dumps({"error": str(e)}))
+        sys.exit(1)
+
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
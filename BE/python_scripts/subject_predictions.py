@@ -0,0 +1,196 @@
+import argparse
+import json
+import sys
+
+# Model libraries are imported only once a model is loaded, see benchmarks/import_budget.py.
+from json_lines_worker import get_request_data, is_batch, serve_json_lines
+from model_cache import LazyModels
+from neural_network_marks_predictions import load_models as load_mark_models, predict_classes, run_model_batch
+from passing_chance_prediction import load_models as load_chance_models, get_passing_probabilities, predict_probabilities
+
+
+def load_models(mark_model_paths, chance_model_paths, table_path=None):
+    """
+    Load the mark and the passing chance models, see load_models of the respective scripts.
+    :param table_path: Optional path to the prediction tables (see prediction_tables.py). When
+                       given, both predictions are looked up in the same table row.
+    :return: Tuple of mappings with loaded mark models and loaded chance models.
+    """
+    if table_path is None:
+        return load_mark_models(mark_model_paths), load_chance_models(chance_model_paths)
+
+    def table_or_model(fallback_models):
+        def load_model(subject):
+            from prediction_tables import cached_prediction_tables
+            try:
+                return cached_prediction_tables(table_path, mark_model_paths, chance_model_paths)[subject]
+            except Exception as e:
+                print(f"Error loading prediction tables, running the model instead: {e}", file=sys.stderr)
+            return fallback_models[subject]
+        return load_model
+
+    return (LazyModels(mark_model_paths, table_or_model(load_mark_models(mark_model_paths))),
+            LazyModels(chance_model_paths, table_or_model(load_chance_models(chance_model_paths))))
+
+
+def predict_subject(mark_model, chance_model, subject_input):
+    """
+    Run both the mark and the passing chance model on the same input.
+    :param mark_model: The model predicting the mark.
+    :param chance_model: The model predicting the passing chance.
+    :param subject_input: A list of input features shared by both models, or a list of such lists.
+    :return: Dictionary with the decoded mark and the passing probability in percent, or a list
+             of them for a list of inputs.
+    """
+    input_rows = subject_input if is_batch(subject_input) else [subject_input]
+
+    predictions = [
+        {
+            "mark": mark,
+            "passingProbability": None if passing_probability is None else round(passing_probability * 100, 2),
+        }
+        for mark, passing_probability in zip(run_model_batch(mark_model, input_rows),
+                                             get_passing_probabilities(chance_model, input_rows))
+    ]
+
+    return predictions if is_batch(subject_input) else predictions[0]
+
+
+def predict_subjects(mark_models, chance_models, encoded_marks_dict):
+    """
+    Predict the mark and the passing chance for every subject present in the request.
+    :param mark_models: Dictionary with subject names as keys and loaded mark models as values.
+    :param chance_models: Dictionary with subject names as keys and loaded chance models as values.
+    :param encoded_marks_dict: Dictionary with subject names as keys and input arrays as values.
+    :return: Dictionary with subject names as keys and predictions as values.
+    """
+    results = {}
+    for subject_name, subject_input in encoded_marks_dict.items():
+        if subject_name not in mark_models or subject_name not in chance_models:
+            raise ValueError(f"No model loaded for subject: {subject_name}")
+        results[subject_name] = predict_subject(mark_models[subject_name], chance_models[subject_name],
+                                                subject_input)
+    return results
+
+
+def serve(mark_model_paths, chance_model_paths, table_path=None):
+    """
+    Long-running mode, see json_lines_worker.serve_json_lines. Every model and the prediction
+    tables are loaded before the {"ready": true, "models": [...]} line is written.
+
+    request example:
+    {"data": {"Matematicka analyza 1": [0, 0, 0]}}
+
+    response example:
+    {"results": {"Matematicka analyza 1": {"mark": "A", "passingProbability": 80.75}}}
+    """
+    mark_models, chance_models = load_models(mark_model_paths, chance_model_paths, table_path)
+    mark_models.load_all()
+    chance_models.load_all()
+
+    def handle_request(request):
+        return {"results": predict_subjects(mark_models, chance_models, get_request_data(request))}
+
+    serve_json_lines(handle_request, {"ready": True, "models": list(mark_models)})
+
+
+def serve_socket(mark_model_paths, chance_model_paths, socket_path, table_path=None):
+    """
+    Long-running mode answering both MARK and CHANCE requests of the binary protocol on a Unix
+    domain socket for the subjects with both models, see binary_protocol.py.
+    """
+    from binary_protocol import CHANCE, MARK, serve_unix_socket
+
+    mark_models, chance_models = load_models(mark_model_paths, chance_model_paths, table_path)
+    mark_models.load_all()
+    chance_models.load_all()
+    serve_unix_socket(socket_path, [subject for subject in mark_models if subject in chance_models], {
+        MARK: lambda subject, rows: predict_classes(mark_models, subject, rows),
+        CHANCE: lambda subject, rows: predict_probabilities(chance_models, subject, rows),
+    })
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description="Predict marks and passing chances of subjects.")
+    parser.add_argument("input_json", nargs="?", help="JSON string with input data, omitted with --serve and --socket")
+    parser.add_argument("mark_model_paths_json", help="JSON string with mark model paths")
+    parser.add_argument("chance_model_paths_json", help="JSON string with passing chance model paths")
+    parser.add_argument("--serve", action="store_true",
+                        help="keep the models loaded and answer newline-delimited JSON requests from stdin")
+    parser.add_argument("--socket", metavar="SOCKET_PATH",
+                        help="keep the models loaded and answer binary requests on a Unix domain socket")
+    parser.add_argument("--lookup", metavar="TABLE_PATH",
+                        help="answer from precomputed prediction tables, rebuilt when a model file changes")
+    arguments = parser.parse_args()
+
+    if arguments.input_json is None and not (arguments.serve or arguments.socket):
+        parser.error("input_json is required unless --serve or --socket is used")
+    return arguments
+
+
+def parse_json_argument(argument, name):
+    try:
+        return json.loads(argument)
+    except json.JSONDecodeError:
+        print(f"Invalid JSON {name}.")
+        sys.exit(1)
+
+
+def main():
+    """
+    Main entry point for the script. Predicts both the mark and the passing chance of every
+    subject from a single set of input vectors.
+    Expects:
+    - JSON string with input data (first argument), same as neural_network_marks_predictions.py
+    - JSON string with mark model paths (second argument)
+    - JSON string with passing chance model paths (third argument)
+
+    or, for the long-running mode (see serve):
+    - --serve
+    - JSON string with mark model paths
+    - JSON string with passing chance model paths
+
+    or, for the binary protocol on a Unix domain socket (see serve_socket):
+    - --socket <socket_path>
+    - JSON string with mark model paths
+    - JSON string with passing chance model paths
+
+    Optionally --lookup <table_path> answers from precomputed prediction tables.
+
+    output example:
+    {
+       "Matematicka analyza 1": {"mark": "A", "passingProbability": 80.75}
+    }
+    """
+    arguments = parse_arguments()
+    mark_model_paths = parse_json_argument(arguments.mark_model_paths_json, "mark model paths")
+    chance_model_paths = parse_json_argument(arguments.chance_model_paths_json, "chance model paths")
+
+    if arguments.socket:
+        serve_socket(mark_model_paths, chance_model_paths, arguments.socket, arguments.lookup)
+        return
+    if arguments.serve:
+        serve(mark_model_paths, chance_model_paths, arguments.lookup)
+        return
+
+    input_data = parse_json_argument(arguments.input_json, "input")
+    try:
+        encoded_marks_dict = get_request_data(input_data)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    mark_models, chance_models = load_models(mark_model_paths, chance_model_paths, arguments.lookup)
+
+    try:
+        results = predict_subjects(mark_models, chance_models, encoded_marks_dict)
+    except ValueError as e:
+        print(e)
+        sys.exit(1)
+
+    # output
+    print(json.dumps(results, indent=4))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from binary_protocol import (  # noqa: E402
+    CHANCE, ERROR, FRAME_HEADER, MARK, OK, REQUEST_HEADER, RESPONSE_HEADER, read_frame,
+)
+from dense_network import load_mark_model  # noqa: E402
+from logistic_regression import load_logistic_scorer  # noqa: E402
+
+MARK_SUBJECT = "Matematicka analyza 1"
+CHANCE_SUBJECT = "Diskretna pravdepodobnost"
+
+
+class SocketWorkerTest(unittest.TestCase):
+    def start_worker(self, script, subject, model_path):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        socket_path = os.path.join(directory, "worker.sock")
+        worker = subprocess.Popen([sys.executable, os.path.join(SCRIPTS_DIR, script), "--socket", socket_path,
+                                   json.dumps({subject: model_path})], stdout=subprocess.PIPE, text=True)
+        self.addCleanup(worker.wait)
+        self.addCleanup(worker.terminate)
+        ready = json.loads(worker.stdout.readline())
+        self.assertEqual(ready["subjects"], [subject])
+
+        connection = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        connection.connect(socket_path)
+        self.addCleanup(connection.close)
+        stream = connection.makefile("rwb")
+        self.addCleanup(stream.close)
+        self.assertEqual(read_frame(stream), subject.encode())
+        return stream
+
+    def call(self, stream, request_type, rows, subject_id=0):
+        rows = np.asarray(rows, dtype=np.int8).reshape(len(rows), -1)
+        payload = REQUEST_HEADER.pack(request_type, subject_id, *rows.shape) + rows.tobytes()
+        stream.write(FRAME_HEADER.pack(len(payload)) + payload)
+        stream.flush()
+        response = read_frame(stream)
+        status, count = RESPONSE_HEADER.unpack_from(response)
+        return status, count, response[RESPONSE_HEADER.size:]
+
+    def test_mark_classes_match_the_model(self):
+        model_path = os.path.join(MODELS_DIR, "mata1.h5")
+        stream = self.start_worker("neural_network_marks_predictions.py", MARK_SUBJECT, model_path)
+        rows = np.array([[0, 0, 0], [2, 0, 1], [0, 0, 2], [0, 2, 0], [1, 0, 1], [0, 4, 0]])
+
+        status, count, classes = self.call(stream, MARK, rows)
+
+        self.assertEqual((status, count), (OK, len(rows)))
+        np.testing.assert_array_equal(np.frombuffer(classes, dtype=np.uint8),
+                                      load_mark_model(model_path).predict_classes(rows.astype(np.float32)))
+
+    def test_probabilities_match_the_model(self):
+        model_path = os.path.join(MODELS_DIR, "dp.pkl")
+        stream = self.start_worker("passing_chance_prediction.py", CHANCE_SUBJECT, model_path)
+        rows = np.array([[0, 0], [4, 6], [2, 1]])
+
+        status, count, probabilities = self.call(stream, CHANCE, rows)
+
+        self.assertEqual((status, count), (OK, len(rows)))
+        np.testing.assert_allclose(np.frombuffer(probabilities, dtype="<f4"),
+                                   load_logistic_scorer(model_path).predict_proba(rows.astype(float)), rtol=1e-6)
+
+    def test_bad_requests_are_answered_with_errors(self):
+        stream = self.start_worker("neural_network_marks_predictions.py", MARK_SUBJECT,
+                                   os.path.join(MODELS_DIR, "mata1.h5"))
+
+        for request_type, rows, subject_id in ((MARK, [[0, 0]], 0), (MARK, [[0, 0, 0]], 1), (CHANCE, [[0, 0, 0]], 0)):
+            with self.subTest(request_type=request_type, rows=rows, subject_id=subject_id):
+                status, count, message = self.call(stream, request_type, rows, subject_id)
+                self.assertEqual((status, count), (ERROR, 0))
+                self.assertTrue(message)
+
+        # The connection still answers after the errors
+        self.assertEqual(self.call(stream, MARK, [[0, 0, 0]])[:2], (OK, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from cluster_index import ClusterIndex  # noqa: E402
+from clustering_model import (  # noqa: E402
+    FOCUS_VALUES, ClusteringModel, load_clustering_model, load_kmeans_model, load_metadata, metadata_path,
+)
+
+MODEL_FILES = ("kmeans_model.pkl", "kmeans_model_manazment.pkl")
+
+
+def focus_vectors(model, rng):
+    # Cluster centers, whole focus values as stored in the database and values between them
+    return np.vstack([model.cluster_centers_,
+                      rng.integers(0, FOCUS_VALUES, size=(2000, model.n_features_in_)),
+                      rng.uniform(0, FOCUS_VALUES - 1, size=(2000, model.n_features_in_))])
+
+
+class ClusteringModelTest(unittest.TestCase):
+    def test_assignment_matches_kmeans(self):
+        rng = np.random.default_rng(1)
+        for model_file in MODEL_FILES:
+            with self.subTest(model=model_file):
+                model = load_kmeans_model(os.path.join(MODELS_DIR, model_file))
+                queries = focus_vectors(model, rng)
+
+                np.testing.assert_array_equal(ClusteringModel.from_estimator(model).predict(queries),
+                                              model.predict(queries))
+
+    def test_index_lists_the_subjects_of_every_cluster(self):
+        for model_file in MODEL_FILES:
+            with self.subTest(model=model_file):
+                model = load_kmeans_model(os.path.join(MODELS_DIR, model_file))
+                index = ClusteringModel.from_estimator(model).index
+
+                for cluster in range(model.n_clusters):
+                    np.testing.assert_array_equal(index.members_of(cluster), np.flatnonzero(model.labels_ == cluster))
+                with self.assertRaises(ValueError):
+                    index.members_of(model.n_clusters)
+
+    def test_index_of_labels_without_some_clusters(self):
+        index = ClusterIndex.from_labels(np.array([2, 0, 2, 2, 0]), 4)
+
+        self.assertEqual([index.members_of(cluster).tolist() for cluster in range(4)], [[1, 4], [], [0, 2, 3], []])
+
+    def test_loaded_model_takes_focus_columns_in_order(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        model_path = shutil.copy(os.path.join(MODELS_DIR, "kmeans_model.pkl"), directory)
+        shutil.copy(metadata_path(os.path.join(MODELS_DIR, "kmeans_model.pkl")), directory)
+        model = load_kmeans_model(model_path)
+
+        clustering_model = load_clustering_model(model_path, with_focus=False)
+        # Loaded again from the stored arrays
+        stored_model = load_clustering_model(model_path, with_focus=False)
+
+        queries = focus_vectors(model, np.random.default_rng(2))
+        # Column i of the model is column feature_order[i] of FOCUS_COLUMNS
+        focus_order_queries = np.empty_like(queries)
+        focus_order_queries[:, load_metadata(model_path, stored_model)["feature_order"]] = queries
+        for loaded_model in (clustering_model, stored_model):
+            np.testing.assert_array_equal(loaded_model.predict(focus_order_queries), model.predict(queries))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,39 @@
+import glob
+import importlib.util
+import os
+import sys
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from dense_network import DenseNetwork, load_dense_network, verify_against_keras  # noqa: E402
+
+MARK_MODEL_PATHS = sorted(glob.glob(os.path.join(MODELS_DIR, "*.h5")))
+
+
+class DenseNetworkTest(unittest.TestCase):
+    @unittest.skipUnless(importlib.util.find_spec("tensorflow"), "needs TensorFlow")
+    def test_classes_match_keras_on_shipped_models(self):
+        self.assertTrue(MARK_MODEL_PATHS)
+        for path in MARK_MODEL_PATHS:
+            with self.subTest(model=os.path.basename(path)):
+                # Every combination of input marks
+                self.assertEqual(verify_against_keras(path), 0)
+
+    def test_loads_shipped_models_without_tensorflow(self):
+        for path in MARK_MODEL_PATHS:
+            with self.subTest(model=os.path.basename(path)):
+                self.assertIsInstance(load_dense_network(path), DenseNetwork)
+
+    def test_rejects_rows_of_another_size(self):
+        network = load_dense_network(MARK_MODEL_PATHS[0])
+        with self.assertRaises(ValueError):
+            network.predict(np.zeros((1, network.input_size + 1)))
+
+
+if __name__ == "__main__":
+    unittest.main()
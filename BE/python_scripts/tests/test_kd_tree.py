@@ -0,0 +1,73 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from kd_tree import KDTree, load_kd_tree, verify_against_brute_force  # noqa: E402
+
+
+def brute_force(focus, point, k):
+    distances = np.einsum("ij,ij->i", focus - point, focus - point)
+    rows = np.lexsort((np.arange(len(focus)), distances))[:k]
+    return rows, np.sqrt(distances[rows])
+
+
+class KDTreeTest(unittest.TestCase):
+    def setUp(self):
+        rng = np.random.default_rng(1)
+        # Whole focus values as stored in the database, with many ties
+        self.focus = rng.integers(0, 11, size=(3000, 12)).astype(np.float64)
+        self.queries = np.vstack([self.focus[:20], rng.uniform(0, 10, size=(50, 12))])
+
+    def test_matches_brute_force(self):
+        for leaf_size in (4, 256):
+            tree = KDTree.build(self.focus, leaf_size=leaf_size)
+            for k in (1, 10, 100):
+                with self.subTest(leaf_size=leaf_size, k=k):
+                    for point in self.queries:
+                        rows, distances = tree.query(point, k)
+                        expected_rows, expected_distances = brute_force(self.focus, point, k)
+
+                        np.testing.assert_array_equal(rows, expected_rows)
+                        np.testing.assert_allclose(distances, expected_distances, rtol=0, atol=1e-12)
+
+    def test_ties_are_ordered_by_row(self):
+        focus = np.array([[1.0, 1.0], [0.0, 0.0], [1.0, 1.0], [1.0, 1.0]])
+        tree = KDTree.build(focus, leaf_size=1)
+
+        rows, distances = tree.query([1.0, 1.0], 3)
+
+        self.assertEqual(rows.tolist(), [0, 2, 3])
+        self.assertEqual(distances.tolist(), [0.0, 0.0, 0.0])
+
+    def test_k_larger_than_the_subjects(self):
+        tree = KDTree.build(self.focus[:5])
+
+        rows, _ = tree.query(self.queries[0], 10)
+
+        self.assertEqual(sorted(rows.tolist()), list(range(5)))
+        self.assertEqual(len(KDTree.build(np.empty((0, 12))).query(self.queries[0], 10)[0]), 0)
+
+    def test_stored_tree_matches_brute_force(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        model_path = os.path.join(directory, "kmeans_model.pkl")
+        source_path = os.path.join(directory, "kmeans_model.focus.csv")
+        with open(source_path, "w") as f:
+            f.write("focus")
+
+        load_kd_tree(model_path, self.focus, source_path)
+        tree = load_kd_tree(model_path, self.focus, source_path)
+
+        self.assertIsInstance(tree.points, np.memmap)
+        verify_against_brute_force(tree, self.focus)
+
+
+if __name__ == "__main__":
+    unittest.main()
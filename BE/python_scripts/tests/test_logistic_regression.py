@@ -0,0 +1,56 @@
+import itertools
+import os
+import pickle
+import sys
+import unittest
+import warnings
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from logistic_regression import VERIFY_TOLERANCE, load_logistic_scorer  # noqa: E402
+
+CHANCE_MODEL_FILES = ("mata1.pkl", "dp.pkl", "aus1.pkl", "model_DIS.pkl", "model_OPTS.pkl", "model_AUS.pkl")
+
+
+def sklearn_probabilities(model, inputs):
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", UserWarning)  # models fitted with feature names
+        return model.predict_proba(inputs)[:, 1]
+
+
+class LogisticScorerTest(unittest.TestCase):
+    def test_probabilities_match_sklearn(self):
+        rng = np.random.default_rng(1)
+        for model_file in CHANCE_MODEL_FILES:
+            with self.subTest(model=model_file):
+                path = os.path.join(MODELS_DIR, model_file)
+                with open(path, "rb") as f:
+                    model = pickle.load(f)
+                scorer = load_logistic_scorer(path)
+
+                # Every combination of input marks and random inputs between them
+                inputs = np.vstack([
+                    np.array(list(itertools.product(range(7), repeat=scorer.input_size)), dtype=float),
+                    rng.uniform(-1, 7, size=(100, scorer.input_size)),
+                ])
+                np.testing.assert_allclose(scorer.predict_proba(inputs), sklearn_probabilities(model, inputs),
+                                           rtol=0, atol=VERIFY_TOLERANCE)
+
+    def test_one_row_gives_a_float(self):
+        path = os.path.join(MODELS_DIR, "dp.pkl")
+        with open(path, "rb") as f:
+            model = pickle.load(f)
+
+        probability = load_logistic_scorer(path).predict_proba([1, 2])
+
+        self.assertIsInstance(probability, float)
+        self.assertAlmostEqual(probability, sklearn_probabilities(model, np.array([[1.0, 2.0]]))[0],
+                               delta=VERIFY_TOLERANCE)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import asyncio
+import gc
+import os
+import sys
+import unittest
+import warnings
+from concurrent.futures import ThreadPoolExecutor
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from inference_service import InferenceService, get_input_rows  # noqa: E402
+from micro_batching import MicroBatcher  # noqa: E402
+
+# Usage: python -m unittest discover -s tests (from python_scripts)
+
+
+def sum_rows(key, input_rows):
+    """
+    Stand-in for a model, fails the whole batch on a row with a negative value.
+    """
+    if any(value < 0 for row in input_rows for value in row):
+        raise ValueError("Negative input")
+    return [sum(row) for row in input_rows]
+
+
+class MicroBatcherTest(unittest.IsolatedAsyncioTestCase):
+    def setUp(self):
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.batcher = MicroBatcher(sum_rows, self.executor, window_seconds=0.05, max_batch_rows=256)
+
+    def tearDown(self):
+        self.executor.shutdown()
+
+    async def test_batches_concurrent_requests(self):
+        results = await asyncio.gather(self.batcher.submit("subject", [[1, 2], [3, 4]]),
+                                       self.batcher.submit("subject", [[5, 6]]))
+
+        self.assertEqual(results, [[3, 7], [11]])
+        self.assertEqual(self.batcher.statistics()["batches"], 1)
+
+    async def test_bad_request_fails_only_itself(self):
+        results = await asyncio.gather(self.batcher.submit("subject", [[1, 2]]),
+                                       self.batcher.submit("subject", [[-1, 2]]),
+                                       self.batcher.submit("subject", [[3, 4], [5, 6]]),
+                                       return_exceptions=True)
+
+        self.assertEqual(results[0], [3])
+        self.assertIsInstance(results[1], ValueError)
+        self.assertEqual(results[2], [7, 11])
+        statistics = self.batcher.statistics()
+        self.assertEqual(statistics["splitBatches"], 1)
+        # Only the rows of the successful retries are counted
+        self.assertEqual((statistics["batches"], statistics["rows"]), (2, 3))
+
+    async def test_single_bad_request_fails(self):
+        with self.assertRaises(ValueError):
+            await self.batcher.submit("subject", [[-1, 2]])
+        self.assertEqual(self.batcher.statistics()["splitBatches"], 0)
+
+
+class PredictBatchedTest(unittest.IsolatedAsyncioTestCase):
+    async def test_invalid_request_submits_nothing(self):
+        chance_model_paths = {"Diskretna pravdepodobnost": os.path.join(SCRIPTS_DIR, "models", "dp.pkl")}
+        service = InferenceService({}, chance_model_paths, [])
+        self.addCleanup(service.executor.shutdown)
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            with self.assertRaises(ValueError):
+                await service.predict_batched("chance", service.chance_models,
+                                              {"Diskretna pravdepodobnost": [1, 2], "Unknown subject": [1, 2]})
+            gc.collect()
+
+        self.assertEqual([str(warning.message) for warning in caught if warning.category is RuntimeWarning], [])
+        self.assertEqual(service.batcher.statistics()["rows"], 0)
+
+
+class GetInputRowsTest(unittest.TestCase):
+    def test_accepts_marks(self):
+        self.assertEqual(get_input_rows("subject", [0, 6, 2.0]), [[0, 6, 2.0]])
+        self.assertEqual(get_input_rows("subject", [[0, 1], [5, 6]]), [[0, 1], [5, 6]])
+
+    def test_rejects_invalid_marks(self):
+        for subject_input in ([7], [-1], [2.5], [True], ["1"], [None], [], [[1, 2], [3]]):
+            with self.subTest(subject_input=subject_input), self.assertRaises(ValueError):
+                get_input_rows("subject", subject_input)
+
+
+if __name__ == "__main__":
+    unittest.main()
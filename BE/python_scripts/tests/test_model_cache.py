@@ -0,0 +1,94 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+from model_cache import LazyModels, ModelCache  # noqa: E402
+
+
+class ModelCacheTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.paths = [os.path.join(directory, f"model_{i}.bin") for i in range(3)]
+        for path in self.paths:
+            with open(path, "wb") as f:
+                f.write(b"model")
+        self.loads = []
+
+    def load(self, path):
+        self.loads.append(path)
+        return np.zeros(100, dtype=np.uint8)  # 100 bytes
+
+    def test_evicts_least_recently_used_to_the_budget(self):
+        cache = ModelCache(max_bytes=250)
+        cache.get_model(self.paths[0], self.load)
+        cache.get_model(self.paths[1], self.load)
+        cache.get_model(self.paths[0], self.load)  # paths[1] is now the least recently used
+
+        cache.get_model(self.paths[2], self.load)
+
+        self.assertEqual(cache.total_bytes, 200)
+        self.assertLessEqual(cache.total_bytes, cache.max_bytes)
+        cache.get_model(self.paths[0], self.load)
+        cache.get_model(self.paths[2], self.load)
+        self.assertEqual(self.loads, [self.paths[0], self.paths[1], self.paths[2]])
+        cache.get_model(self.paths[1], self.load)
+        self.assertEqual(self.loads[-1], self.paths[1])
+
+    def test_keeps_an_entry_larger_than_the_budget(self):
+        cache = ModelCache(max_bytes=50)
+        model = cache.get_model(self.paths[0], self.load)
+
+        self.assertIs(cache.get_model(self.paths[0], self.load), model)
+        self.assertEqual(len(self.loads), 1)
+
+    def test_reloads_when_the_file_changes(self):
+        cache = ModelCache(max_bytes=1000)
+        path = self.paths[0]
+        first = cache.get_model(path, self.load)
+        self.assertIs(cache.get_model(path, self.load), first)
+
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        second = cache.get_model(path, self.load)
+        self.assertIsNot(second, first)
+
+        # Same mtime, different size
+        stat = os.stat(path)
+        with open(path, "ab") as f:
+            f.write(b"more")
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+        self.assertIsNot(cache.get_model(path, self.load), second)
+
+        self.assertEqual(len(self.loads), 3)
+        self.assertEqual(cache.total_bytes, 100)
+
+    def test_failed_model_is_retried_after_its_file_changes(self):
+        path = self.paths[0]
+
+        def load_model(subject):
+            self.loads.append(subject)
+            with open(path, "rb") as f:
+                if f.read() == b"model":
+                    raise ValueError("not a model")
+            return subject
+
+        models = LazyModels({"subject": path}, load_model)
+        self.assertIsNone(models["subject"])
+        self.assertIsNone(models["subject"])
+        self.assertEqual(len(self.loads), 1)
+
+        with open(path, "wb") as f:
+            f.write(b"fixed model")
+        self.assertEqual(models["subject"], "subject")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from dense_network import load_mark_model  # noqa: E402
+from logistic_regression import load_logistic_scorer  # noqa: E402
+from model_files import file_sha256  # noqa: E402
+from prediction_tables import load_prediction_tables  # noqa: E402
+
+SUBJECT = "Matematicka analyza 1"
+INPUT_ROWS = np.array([[0, 0, 0], [1, 2, 6], [5, 4, 3]], dtype=np.float32)
+
+
+class PredictionTablesTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.table_path = os.path.join(directory, "prediction_tables.npz")
+        self.mark_model_paths = {SUBJECT: shutil.copy(os.path.join(MODELS_DIR, "mata1.h5"), directory)}
+        self.chance_model_paths = {SUBJECT: shutil.copy(os.path.join(MODELS_DIR, "mata1.pkl"), directory)}
+
+    def test_lookup_matches_the_models(self):
+        table = load_prediction_tables(self.table_path, self.mark_model_paths, self.chance_model_paths)[SUBJECT]
+
+        np.testing.assert_array_equal(table.predict_classes(INPUT_ROWS),
+                                      load_mark_model(self.mark_model_paths[SUBJECT]).predict_classes(INPUT_ROWS))
+        np.testing.assert_allclose(table.predict_proba(INPUT_ROWS),
+                                   load_logistic_scorer(self.chance_model_paths[SUBJECT]).predict_proba(INPUT_ROWS),
+                                   rtol=0, atol=1e-12)
+
+    def test_changed_model_file_rebuilds_the_table(self):
+        load_prediction_tables(self.table_path, chance_model_paths=self.chance_model_paths)
+        shutil.copy(os.path.join(MODELS_DIR, "aus1.pkl"), self.chance_model_paths[SUBJECT])
+
+        table = load_prediction_tables(self.table_path, chance_model_paths=self.chance_model_paths)[SUBJECT]
+
+        np.testing.assert_allclose(table.predict_proba(INPUT_ROWS),
+                                   load_logistic_scorer(self.chance_model_paths[SUBJECT]).predict_proba(INPUT_ROWS),
+                                   rtol=0, atol=1e-12)
+        with np.load(self.table_path) as stored:
+            self.assertEqual(stored["chance_model_sha256"].tolist(), [file_sha256(self.chance_model_paths[SUBJECT])])
+
+    def test_scripts_sharing_the_file_keep_each_others_models(self):
+        # The mark and the chance script each pass only their own kind of models
+        load_prediction_tables(self.table_path, mark_model_paths=self.mark_model_paths)
+        load_prediction_tables(self.table_path, chance_model_paths=self.chance_model_paths)
+        table_sha256 = file_sha256(self.table_path)
+
+        table = load_prediction_tables(self.table_path, mark_model_paths=self.mark_model_paths)[SUBJECT]
+
+        self.assertEqual(file_sha256(self.table_path), table_sha256)
+        table.predict_classes(INPUT_ROWS)
+        table.predict_proba(INPUT_ROWS)
+
+
+if __name__ == "__main__":
+    unittest.main()
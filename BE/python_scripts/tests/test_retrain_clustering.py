@@ -0,0 +1,91 @@
+import json
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SCRIPTS_DIR)
+
+import clustering_model  # noqa: E402
+from clustering_model import (  # noqa: E402
+    FOCUS_COLUMNS, MixedVersionsError, focus_matrix_path, load_clustering_model, metadata_path,
+)
+from model_files import file_sha256  # noqa: E402
+from retrain_clustering import SOURCE_COLUMNS, csv_rows, export_focus, retrain  # noqa: E402
+
+
+class RetrainClusteringTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.model_path = os.path.join(directory, "kmeans_model.pkl")
+        self.source_path = os.path.join(directory, "focus.csv")
+        rows = np.column_stack([np.arange(1, 61), np.random.default_rng(1).integers(0, 11, size=(60, 12))])
+        self.write_source(rows)
+        self.open_rows = lambda: csv_rows(self.source_path)
+
+    def write_source(self, rows):
+        with open(self.source_path, "w") as f:
+            f.write(",".join(SOURCE_COLUMNS) + "\n")
+            np.savetxt(f, rows, fmt="%d", delimiter=",")
+
+    def retrain(self):
+        return retrain(self.model_path, self.open_rows, {"studyProgramIds": [3], "default": False}, n_clusters=3)
+
+    def test_metadata_lists_the_files_of_its_version(self):
+        self.retrain()
+
+        with open(metadata_path(self.model_path)) as f:
+            metadata = json.load(f)
+        self.assertEqual(metadata["modelSha256"], file_sha256(self.model_path))
+        self.assertEqual(metadata["focusSha256"], file_sha256(focus_matrix_path(self.model_path)))
+        model = load_clustering_model(self.model_path)
+        self.assertEqual(model.focus.shape, (60, len(FOCUS_COLUMNS)))
+        np.testing.assert_array_equal(model.predict(model.focus), model.labels)
+
+    def test_files_of_different_versions_are_loaded_again(self):
+        self.retrain()
+        focus_path = focus_matrix_path(self.model_path)
+        new_focus_path = shutil.copy(focus_path, focus_path + ".new")
+        # A reader finds the focus matrix of another version, which is replaced before its retry
+        with open(focus_path, "a") as f:
+            f.write("0,0,0,0,0,0,0,0,0,0,0,0\n")
+
+        with mock.patch.object(clustering_model.time, "sleep",
+                               side_effect=lambda _: os.replace(new_focus_path, focus_path)) as sleep:
+            model = load_clustering_model(self.model_path)
+
+        sleep.assert_called_once()
+        self.assertEqual(len(model.focus), 60)
+
+    def test_files_which_stay_mixed_are_rejected(self):
+        self.retrain()
+        previous_model_path = shutil.copy(self.model_path, self.model_path + ".previous")
+        retrain(self.model_path, self.open_rows, {"studyProgramIds": [3], "default": False}, n_clusters=4)
+        # The previous model next to the metadata and focus matrix of the new one
+        shutil.copy(previous_model_path, self.model_path)
+
+        with mock.patch.object(clustering_model.time, "sleep") as sleep, self.assertRaises(MixedVersionsError):
+            load_clustering_model(self.model_path)
+        self.assertEqual(sleep.call_count, clustering_model.LOAD_ATTEMPTS - 1)
+
+    def test_export_focus_updates_the_checksum(self):
+        self.retrain()
+        os.unlink(focus_matrix_path(self.model_path))
+
+        export_focus(self.model_path, self.open_rows)
+
+        with open(metadata_path(self.model_path)) as f:
+            metadata = json.load(f)
+        self.assertEqual(metadata["focusSha256"], file_sha256(focus_matrix_path(self.model_path)))
+        self.assertEqual(metadata["studyProgramIds"], [3])
+        self.assertEqual(len(load_clustering_model(self.model_path).focus), 60)
+
+
+if __name__ == "__main__":
+    unittest.main()
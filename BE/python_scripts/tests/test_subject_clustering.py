@@ -0,0 +1,64 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+import numpy as np
+
+SCRIPTS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODELS_DIR = os.path.join(SCRIPTS_DIR, "models")
+sys.path.insert(0, SCRIPTS_DIR)
+
+from clustering_model import FOCUS_COLUMNS, focus_matrix_path, load_clustering_model, metadata_path  # noqa: E402
+from subject_clustering import recommend  # noqa: E402
+
+FOCUS_VECTORS = np.array([[10, 2, 3, 0, 0, 0, 1, 0, 4, 2, 0, 0], [8, 6, 7, 0, 0, 0, 0, 0, 2, 1, 0, 0]], dtype=float)
+
+
+class RecommendTest(unittest.TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.model_path = shutil.copy(os.path.join(MODELS_DIR, "kmeans_model.pkl"), directory)
+        shutil.copy(metadata_path(os.path.join(MODELS_DIR, "kmeans_model.pkl")), directory)
+
+    def test_without_focus_matrix_subjects_are_not_ranked(self):
+        model = load_clustering_model(self.model_path)
+        self.assertIsNone(model.focus)
+
+        result = recommend(self.model_path, model, FOCUS_VECTORS, "blend", top_k=2, offset=1)
+
+        # Every subject of the cluster, in index order and not paged
+        members = model.members_of(result["clusters"][0])
+        self.assertEqual(result["indices"], members.tolist())
+        self.assertEqual(result["subjectIds"], model.subject_ids[members].tolist())
+        self.assertEqual(result["total"], len(members))
+        self.assertIsNone(result["scores"])
+        self.assertIsNone(result["scoreBasis"])
+
+    def test_subjects_are_ranked_by_their_focus_vectors(self):
+        labels = load_clustering_model(self.model_path, with_focus=False).labels
+        focus = np.random.default_rng(1).integers(0, 11, size=(len(labels), len(FOCUS_COLUMNS)))
+        with open(focus_matrix_path(self.model_path), "w") as f:
+            f.write(",".join(FOCUS_COLUMNS) + "\n")
+            np.savetxt(f, focus, fmt="%d", delimiter=",")
+        model = load_clustering_model(self.model_path)
+
+        for mode in ("blend", "union"):
+            with self.subTest(mode=mode):
+                all_subjects = recommend(self.model_path, model, FOCUS_VECTORS, mode)
+                page = recommend(self.model_path, model, FOCUS_VECTORS, mode, top_k=3, offset=2)
+
+                candidates = np.array(all_subjects["indices"])
+                distances = np.linalg.norm(focus[candidates] - FOCUS_VECTORS.mean(axis=0), axis=1)
+                self.assertEqual(sorted(candidates.tolist()),
+                                 np.flatnonzero(np.isin(labels, all_subjects["clusters"])).tolist())
+                np.testing.assert_array_equal(np.diff(distances) >= 0, True)
+                self.assertEqual(page["indices"], all_subjects["indices"][2:5])
+                np.testing.assert_allclose(page["scores"], distances[2:5])
+                self.assertEqual((page["total"], page["scoreBasis"]), (len(candidates), "subject"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,9 @@
+package sk.uniza.fri.alfri.constant;
+
+/**
+ * How subject_clustering.py recommends subjects similar to the chosen ones. BLEND returns the
+ * cluster of the centroid of all chosen subjects, UNION the clusters of every chosen subject.
+ */
+public enum ClusteringMode {
+  BLEND, UNION
+}
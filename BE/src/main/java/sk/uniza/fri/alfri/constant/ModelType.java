@@ -1,6 +0,0 @@
-package sk.uniza.fri.alfri.constant;
-
-/** Created by petos on 1/5/25. */
-public enum ModelType {
-  CHANCE, MARK
-}
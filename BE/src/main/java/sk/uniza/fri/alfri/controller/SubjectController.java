@@ -3,12 +3,10 @@ package sk.uniza.fri.alfri.controller;
 import jakarta.persistence.EntityNotFoundException;
 import jakarta.validation.Valid;
 import jakarta.validation.constraints.Positive;
+import jakarta.validation.constraints.PositiveOrZero;
 import java.io.IOException;
 import java.time.Duration;
-import java.util.ArrayList;
 import java.util.List;
-import java.util.Map;
-import java.util.stream.Collectors;
 
 import lombok.extern.slf4j.Slf4j;
 import org.modelmapper.ModelMapper;
@@ -23,6 +21,7 @@ import sk.uniza.fri.alfri.common.pagitation.PagitationRequestQuery;
 import sk.uniza.fri.alfri.common.pagitation.SearchDefinition;
 import sk.uniza.fri.alfri.common.pagitation.SortDefinition;
 import sk.uniza.fri.alfri.common.pagitation.SortRequestQuery;
+import sk.uniza.fri.alfri.constant.ClusteringMode;
 import sk.uniza.fri.alfri.dto.KeywordDTO;
 import sk.uniza.fri.alfri.dto.StudentYearCountDTO;
 import sk.uniza.fri.alfri.dto.SubjectGradeDto;
@@ -155,15 +154,18 @@ public class SubjectController {
 
   @PostMapping("/similarSubjects")
   public ResponseEntity<List<SubjectDto>> getSimilarSubject(
-      @RequestBody @Valid List<SubjectExtendedDto> subjects) {
-    log.info("Getting similar subjects for {} subjects", subjects.size());
+      @RequestBody @Valid List<SubjectExtendedDto> subjects,
+      @RequestParam(defaultValue = "BLEND") ClusteringMode mode,
+      @RequestParam(required = false) @Positive Integer limit,
+      @RequestParam(defaultValue = "0") @PositiveOrZero int offset) {
+    log.info("Getting similar subjects for {} subjects in {} mode", subjects.size(), mode);
 
     List<Subject> subjectList =
         subjects.stream().map(SubjectMapper.INSTANCE::fromSubjectExtendedDtotoEntity).toList();
 
     List<StudyProgramSubject> similarSubjects;
     try {
-      similarSubjects = subjectService.getSimilarSubjects(subjectList);
+      similarSubjects = subjectService.getSimilarSubjects(subjectList, mode, limit, offset);
     } catch (IOException e) {
       return ResponseEntity.badRequest().build();
     }
@@ -197,28 +199,8 @@ public class SubjectController {
 
     log.info("Making prediction by student year for user with email {}", currentUserEmail);
 
-    List<String> marksList = subjectService.makePassingMarkPrediction(currentUserEmail);
-    List<String> chanceList = subjectService.makePassingChancePrediction(currentUserEmail);
-
-    Map<String, String> marksMap = marksList.stream().map(s -> s.split(":", 2))
-        .collect(Collectors.toMap(arr -> arr[0].trim(), arr -> arr[1].trim()));
-
-    Map<String, Double> chanceMap = chanceList.stream().map(s -> s.split(":", 2))
-        .collect(Collectors.toMap(arr -> arr[0].trim(), arr -> Double.valueOf(arr[1].trim())));
-
-    List<SubjectsPredictionsResult> result = new ArrayList<>();
-    for (Map.Entry<String, String> entry : marksMap.entrySet()) {
-      String subjectName = entry.getKey();
-      String mark = entry.getValue();
-      Double passingChance = chanceMap.getOrDefault(subjectName, 0.0);
-
-      SubjectsPredictionsResult prediction = new SubjectsPredictionsResult();
-      prediction.setSubjectName(subjectName);
-      prediction.setMark(mark);
-      prediction.setPassingProbability(passingChance);
-
-      result.add(prediction);
-    }
+    List<SubjectsPredictionsResult> result =
+        subjectService.makeMarkAndPassingChancePrediction(currentUserEmail);
 
     return ResponseEntity.ok(result);
   }
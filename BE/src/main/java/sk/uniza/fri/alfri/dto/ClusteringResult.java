@@ -0,0 +1,15 @@
+package sk.uniza.fri.alfri.dto;
+
+import java.util.List;
+import lombok.Data;
+
+@Data
+public class ClusteringResult {
+  private List<Integer> clusters;
+  private List<Integer> indices;
+  private List<Integer> subjectIds;
+  private List<List<Double>> distances;
+  private List<Double> scores;
+  private int total;
+  private String scoreBasis;
+}
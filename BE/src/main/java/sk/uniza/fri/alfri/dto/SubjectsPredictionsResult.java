@@ -5,6 +5,7 @@ import lombok.Data;
 @Data
 public class SubjectsPredictionsResult {
   private String subjectName;
-  private double passingProbability;
+  // null if the subject has no passing chance model
+  private Double passingProbability;
   private String mark;
 }
@@ -0,0 +1,13 @@
+package sk.uniza.fri.alfri.exception;
+
+import java.io.Serial;
+
+/** Thrown when every python worker of a script stays busy longer than the acquire timeout. */
+public class PythonWorkersBusyException extends RuntimeException {
+  @Serial
+  private static final long serialVersionUID = -3318735150370271947L;
+
+  public PythonWorkersBusyException(String message) {
+    super(message);
+  }
+}
@@ -18,6 +18,7 @@ import org.springframework.web.context.request.WebRequest;
 import org.springframework.web.servlet.mvc.method.annotation.ResponseEntityExceptionHandler;
 import sk.uniza.fri.alfri.exception.InvalidCredentialsException;
 import sk.uniza.fri.alfri.exception.PythonOutputParsingException;
+import sk.uniza.fri.alfri.exception.PythonWorkersBusyException;
 import sk.uniza.fri.alfri.exception.QuestionnaireNotFilledException;
 import sk.uniza.fri.alfri.exception.UserAlreadyRegisteredException;
 
@@ -95,6 +96,14 @@ public class GlobalExceptionHandler extends ResponseEntityExceptionHandler {
         request.getDescription(false));
   }
 
+  @ExceptionHandler(PythonWorkersBusyException.class)
+  public ResponseEntity<Object> handlePythonWorkersBusyException(PythonWorkersBusyException ex,
+      WebRequest request) {
+    log.warn(ex.getMessage());
+    return buildResponseEntity(HttpStatus.SERVICE_UNAVAILABLE, ex.getMessage(),
+        request.getDescription(false));
+  }
+
   @ExceptionHandler(Exception.class)
   public ResponseEntity<Object> handleGenericException(Exception ex, WebRequest request) {
     log.error("Unhandled exception: ", ex);
@@ -1,5 +1,6 @@
 package sk.uniza.fri.alfri.repository;
 
+import java.util.Collection;
 import java.util.List;
 import java.util.Optional;
 import org.springframework.data.domain.Page;
@@ -13,5 +14,7 @@ public interface StudyProgramSubjectRepository {
 
   Optional<StudyProgramSubject> findByIdSubjectId(Integer id, Integer studyProgramId);
 
+  List<StudyProgramSubject> findAllByIdSubjectIds(Collection<Integer> ids, Integer studyProgramId);
+
   List<StudyProgramSubject> findMandatorySubjects(Long studyProgramId, int year);
 }
@@ -1,5 +1,6 @@
 package sk.uniza.fri.alfri.repository;
 
+import java.util.Collection;
 import java.util.List;
 import java.util.Optional;
 import org.springframework.data.domain.Page;
@@ -37,6 +38,11 @@ public class StudyProgramSubjectRepositoryImpl implements StudyProgramSubjectRep
     return studyProgramSubjectSpringDataRepository.findById_SubjectIdAndId_StudyProgramId(id, studyProgramId);
   }
 
+  @Override
+  public List<StudyProgramSubject> findAllByIdSubjectIds(Collection<Integer> ids, Integer studyProgramId) {
+    return studyProgramSubjectSpringDataRepository.findAllById_SubjectIdInAndId_StudyProgramId(ids, studyProgramId);
+  }
+
     @Override
     public List<StudyProgramSubject> findMandatorySubjects(Long studyProgramId, int year) {
         return this.studyProgramSubjectSpringDataRepository.findAllMandatorySubjectsForStudyProgramAndYear(studyProgramId, year);
@@ -1,5 +1,6 @@
 package sk.uniza.fri.alfri.repository;
 
+import java.util.Collection;
 import java.util.List;
 import java.util.Optional;
 import org.springframework.data.jpa.repository.JpaRepository;
@@ -14,6 +15,9 @@ public interface StudyProgramSubjectSpringDataRepository
     JpaSpecificationExecutor<StudyProgramSubject> {
   Optional<StudyProgramSubject> findById_SubjectIdAndId_StudyProgramId(Integer id, Integer studyProgramId);
 
+  List<StudyProgramSubject> findAllById_SubjectIdInAndId_StudyProgramId(Collection<Integer> ids,
+      Integer studyProgramId);
+
   @Query("""
         SELECT s FROM StudyProgramSubject s
         WHERE s.obligation = 'Pov.'
@@ -3,8 +3,10 @@ package sk.uniza.fri.alfri.service;
 import org.springframework.data.domain.Page;
 import sk.uniza.fri.alfri.common.pagitation.PageDefinition;
 import sk.uniza.fri.alfri.common.pagitation.SearchDefinition;
+import sk.uniza.fri.alfri.constant.ClusteringMode;
 import sk.uniza.fri.alfri.dto.KeywordDTO;
 import sk.uniza.fri.alfri.dto.StudentYearCountDTO;
+import sk.uniza.fri.alfri.dto.SubjectsPredictionsResult;
 import sk.uniza.fri.alfri.dto.focus.FocusCategorySumDTO;
 import sk.uniza.fri.alfri.entity.StudyProgramSubject;
 import sk.uniza.fri.alfri.entity.Subject;
@@ -21,7 +23,8 @@ public interface ISubjectService {
 
   Subject findBySubjectCode(String subjectCode);
 
-  List<StudyProgramSubject> getSimilarSubjects(List<Subject> originalSubjects) throws IOException;
+  List<StudyProgramSubject> getSimilarSubjects(List<Subject> originalSubjects, ClusteringMode mode,
+      Integer limit, int offset) throws IOException;
 
   List<StudyProgramSubject> findSubjectByIds(List<Integer> ids);
 
@@ -31,9 +34,7 @@ public interface ISubjectService {
 
   List<Subject> findAll();
 
-  List<String> makePassingChancePrediction(String userEmail);
-
-  List<String> makePassingMarkPrediction(String userEmail);
+  List<SubjectsPredictionsResult> makeMarkAndPassingChancePrediction(String userEmail);
 
   List<FocusCategorySumDTO> getMostPopularFocuses();
 
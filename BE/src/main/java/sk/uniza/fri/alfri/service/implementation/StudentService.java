@@ -1,9 +1,11 @@
 package sk.uniza.fri.alfri.service.implementation;
 
+import com.fasterxml.jackson.databind.JsonNode;
 import jakarta.persistence.EntityNotFoundException;
 
 import java.io.IOException;
-
+import java.util.Map;
+import lombok.extern.slf4j.Slf4j;
 import org.springframework.core.io.ResourceLoader;
 import org.springframework.stereotype.Service;
 import sk.uniza.fri.alfri.entity.Student;
@@ -12,19 +14,26 @@ import sk.uniza.fri.alfri.entity.User;
 import sk.uniza.fri.alfri.repository.StudentRepository;
 import sk.uniza.fri.alfri.repository.StudyProgramRepository;
 import sk.uniza.fri.alfri.service.IStudentService;
-import sk.uniza.fri.alfri.util.ProcessUtils;
+import sk.uniza.fri.alfri.util.PythonWorkerPool;
+import sk.uniza.fri.alfri.util.SubjectPredictionCommand;
 
 @Service
+@Slf4j
 public class StudentService implements IStudentService {
   private final StudentRepository studentRepository;
   private final StudyProgramRepository studyProgramRepository;
   private final ResourceLoader resourceLoader;
+  private final PythonWorkerPool pythonWorkerPool;
+  private final SubjectPredictionCommand subjectPredictionCommand;
 
   public StudentService(StudentRepository studentRepository,
-      StudyProgramRepository studyProgramRepository, ResourceLoader resourceLoader) {
+      StudyProgramRepository studyProgramRepository, ResourceLoader resourceLoader,
+      PythonWorkerPool pythonWorkerPool, SubjectPredictionCommand subjectPredictionCommand) {
     this.studentRepository = studentRepository;
     this.studyProgramRepository = studyProgramRepository;
     this.resourceLoader = resourceLoader;
+    this.pythonWorkerPool = pythonWorkerPool;
+    this.subjectPredictionCommand = subjectPredictionCommand;
   }
 
   public StudyProgram getUsersStudyProgram(String userEmail) {
@@ -42,12 +51,16 @@ public class StudentService implements IStudentService {
     return getUsersStudyProgram(user.getEmail());
   }
 
+  /**
+   * Sends an empty prediction request to the subject prediction workers used by
+   * {@link SubjectService#makeMarkAndPassingChancePrediction}, which starts them if they are not
+   * running.
+   */
   @Override
   public void makePrediction() throws IOException {
-    ProcessBuilder processBuilder =
-        new ProcessBuilder("python3", "./python_scripts/passing_chance_prediction.py");
-    String output = ProcessUtils.getOutputFromProces(processBuilder, false);
-    System.out.println(output);
+    JsonNode output = this.pythonWorkerPool.call(this.subjectPredictionCommand.get(),
+        Map.of("data", Map.of()));
+    log.info("Output of makePrediction: {}", output);
   }
 
   @Override
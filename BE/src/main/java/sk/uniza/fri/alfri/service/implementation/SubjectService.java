@@ -2,11 +2,13 @@ package sk.uniza.fri.alfri.service.implementation;
 
 import com.fasterxml.jackson.core.JsonProcessingException;
 import com.fasterxml.jackson.core.type.TypeReference;
+import com.fasterxml.jackson.databind.JsonNode;
 import com.fasterxml.jackson.databind.ObjectMapper;
 import jakarta.persistence.EntityNotFoundException;
 import java.io.IOException;
 import java.util.*;
 import java.util.stream.Collectors;
+import java.util.stream.IntStream;
 
 import jakarta.persistence.Tuple;
 import lombok.extern.slf4j.Slf4j;
@@ -17,9 +19,11 @@ import org.springframework.data.domain.Pageable;
 import org.springframework.stereotype.Service;
 import sk.uniza.fri.alfri.common.pagitation.PageDefinition;
 import sk.uniza.fri.alfri.common.pagitation.SearchDefinition;
-import sk.uniza.fri.alfri.constant.ModelType;
+import sk.uniza.fri.alfri.constant.ClusteringMode;
+import sk.uniza.fri.alfri.dto.ClusteringResult;
 import sk.uniza.fri.alfri.dto.KeywordDTO;
 import sk.uniza.fri.alfri.dto.StudentYearCountDTO;
+import sk.uniza.fri.alfri.dto.SubjectsPredictionsResult;
 import sk.uniza.fri.alfri.dto.focus.FocusCategorySumDTO;
 import sk.uniza.fri.alfri.entity.Answer;
 import sk.uniza.fri.alfri.entity.AnswerText;
@@ -39,7 +43,9 @@ import sk.uniza.fri.alfri.repository.SubjectKeywordRepository;
 import sk.uniza.fri.alfri.repository.SubjectRepository;
 import sk.uniza.fri.alfri.service.FormService;
 import sk.uniza.fri.alfri.service.ISubjectService;
-import sk.uniza.fri.alfri.util.ProcessUtils;
+import sk.uniza.fri.alfri.util.ClusteringResultCache;
+import sk.uniza.fri.alfri.util.PythonWorkerPool;
+import sk.uniza.fri.alfri.util.SubjectPredictionCommand;
 
 @Service
 @Slf4j
@@ -49,22 +55,6 @@ public class SubjectService implements ISubjectService {
   private static final Map<String, Integer> MARK_MAPPING =
       Map.of("A", 0, "B", 1, "C", 2, "D", 3, "E", 4, "Fx", 5, "*", 6);
 
-  private static final Map<String, String> CHANCE_MODEL_PATHS =
-      Map.of("Matematicka analyza 1", "python_scripts/models/mata1.pkl",
-          "Diskretna pravdepodobnost", "python_scripts/models/dp.pkl",
-          "Algoritmy a udajove struktury 1", "python_scripts/models/aus1.pkl",
-          "Diskretna simulacia", "python_scripts/models/model_DIS.pkl", "Optimalizacia sieti",
-          "python_scripts/models/model_OPTS.pkl", "Algoritmy a udajove struktury 2",
-          "python_scripts/models/model_AUS.pkl");
-
-  private static final Map<String, String> MARK_MODEL_PATHS =
-      Map.of("Matematicka analyza 1", "python_scripts/models/mata1.h5",
-          "Diskretna pravdepodobnost", "python_scripts/models/dp.h5",
-          "Algoritmy a udajove struktury 1", "python_scripts/models/aus1.h5",
-          "Diskretna simulacia", "python_scripts/models/best_model_DIS.h5",
-          "Optimalizacia sieti", "python_scripts/models/best_model_OPTS.h5",
-          "Algoritmy a udajove struktury 2", "python_scripts/models/best_model_AUS.h5");
-
   private final StudyProgramSubjectRepository studyProgramSubjectRepository;
   private final SubjectRepository subjectRepository;
   private final AnswerRepository answerRepository;
@@ -75,7 +65,10 @@ public class SubjectService implements ISubjectService {
   private final SubjectKeywordRepository subjectKeywordRepository;
   private final AuthService authService;
   private final StudentSubjectRepository studentSubjectRepository;
-
+  private final ClusteringResultCache clusteringResultCache;
+  private final PythonWorkerPool pythonWorkerPool;
+  private final SubjectPredictionCommand subjectPredictionCommand;
+  private final ObjectMapper mapper;
 
   @Value("${python.executable_path}")
   private String pythonExcecutablePath;
@@ -89,17 +82,13 @@ public class SubjectService implements ISubjectService {
     @Value("${python.clustering_prediction_MAN_model_path}")
     private String clusteringPredictionMANModelPath;
 
-  @Value("${python.passing_change_prediction_script_path}")
-  private String passingChangePredictionScriptPath;
-
-  @Value("${python.passing_mark_prediction_script_path}")
-  private String passingMarkPredictionScriptPath;
-
   public SubjectService(StudyProgramSubjectRepository studyProgramSubjectRepository,
       SubjectRepository subjectRepository, AnswerRepository answerRepository,
       FocusRepository focusRepository, SubjectGradeRepository subjectGradeRepository,
       StudentService studentService, FormService formService,
-        SubjectKeywordRepository subjectKeywordRepository, AuthService authService, StudentSubjectRepository studentSubjectRepository) {
+        SubjectKeywordRepository subjectKeywordRepository, AuthService authService, StudentSubjectRepository studentSubjectRepository,
+      ClusteringResultCache clusteringResultCache, PythonWorkerPool pythonWorkerPool,
+      SubjectPredictionCommand subjectPredictionCommand, ObjectMapper mapper) {
     this.studyProgramSubjectRepository = studyProgramSubjectRepository;
     this.subjectRepository = subjectRepository;
     this.subjectGradeRepository = subjectGradeRepository;
@@ -110,6 +99,10 @@ public class SubjectService implements ISubjectService {
     this.subjectKeywordRepository = subjectKeywordRepository;
     this.authService = authService;
     this.studentSubjectRepository = studentSubjectRepository;
+    this.clusteringResultCache = clusteringResultCache;
+    this.pythonWorkerPool = pythonWorkerPool;
+    this.subjectPredictionCommand = subjectPredictionCommand;
+    this.mapper = mapper;
   }
 
   private static List<List<Integer>> getFocusesAttributes(List<Focus> subjectsFocuses) {
@@ -146,46 +139,113 @@ public class SubjectService implements ISubjectService {
   }
 
   @Override
-  public List<StudyProgramSubject> getSimilarSubjects(List<Subject> originalSubjects)
-      throws IOException {
+  public List<StudyProgramSubject> getSimilarSubjects(List<Subject> originalSubjects,
+      ClusteringMode mode, Integer limit, int offset) throws IOException {
 
     List<Focus> subjectsFocuses = originalSubjects.stream().map(Subject::getFocus).toList();
     List<List<Integer>> focusesAttributes = getFocusesAttributes(subjectsFocuses);
     User currentUser = this.authService.getCurrentUser().orElseThrow(() -> new RuntimeException("Cannot find user."));
     Integer studyProgramId = currentUser.getStudent().getStudyProgramId();
 
-    ProcessBuilder processBuilder =
-        new ProcessBuilder(pythonExcecutablePath, clusteringPredictionScriptPath,
-            Arrays.toString(focusesAttributes.toArray()), studyProgramId == 3 ? this.clusteringPredictionINFModelPath : this.clusteringPredictionMANModelPath);
-    String output = ProcessUtils.getOutputFromProces(processBuilder, false);
+    ClusteringResultCache.Key cacheKey = ClusteringResultCache.key(focusesAttributes, studyProgramId,
+        mode, limit, offset,
+        List.of(this.clusteringPredictionINFModelPath, this.clusteringPredictionMANModelPath));
+    Optional<List<Integer>> cachedSubjectIds = this.clusteringResultCache.get(cacheKey);
+    if (cachedSubjectIds.isPresent()) {
+      log.info("Returning {} cached similar subjects", cachedSubjectIds.get().size());
+      return findSubjectByIds(cachedSubjectIds.get());
+    }
+
+    // The script selects the model of the study program by the metadata stored next to the models
+    Map<String, Object> request = new HashMap<>();
+    request.put("studyProgramId", studyProgramId);
+    request.put("focusVectors", focusesAttributes);
+    request.put("mode", mode.name().toLowerCase());
+    request.put("offset", offset);
+    if (limit != null) {
+      request.put("topK", limit);
+    }
+
+    JsonNode output = this.pythonWorkerPool.call(List.of(pythonExcecutablePath,
+        clusteringPredictionScriptPath, this.clusteringPredictionINFModelPath,
+        this.clusteringPredictionMANModelPath), request);
     log.info("Output of clustering: {}", output);
 
-    String cleaned = output.replace("[", "").replace("]", "").replace("\"", "");
-    String[] parts = cleaned.split(" ");
-    List<Integer> result = new ArrayList<>();
-    for (String part : parts) {
-      if (part.isEmpty()) {
+    ClusteringResult clusteringResult;
+    try {
+      clusteringResult = this.mapper.treeToValue(output, ClusteringResult.class);
+    } catch (JsonProcessingException e) {
+      throw new PythonOutputParsingException(
+          String.format("There was an error parsing clustering result. Output: %s", output));
+    }
+    List<StudyProgramSubject> similarSubjects = findSubjectByIds(clusteringResult.getSubjectIds());
+    if (clusteringResult.getScoreBasis() == null) {
+      // The model has no focus matrix, so the script cannot tell apart the subjects of a cluster
+      // and returns all of them unranked
+      similarSubjects = rankByFocusDistance(similarSubjects, focusesAttributes, limit, offset);
+      log.info("Returning {} of {} similar subjects ranked by their focus", similarSubjects.size(),
+          clusteringResult.getTotal());
+    } else {
+      log.info("Returning {} of {} similar subjects ranked by {} distance", similarSubjects.size(),
+          clusteringResult.getTotal(), clusteringResult.getScoreBasis());
+    }
+
+    this.clusteringResultCache.put(cacheKey,
+        similarSubjects.stream().map(subject -> subject.getId().getSubjectId()).toList());
+    return similarSubjects;
+  }
+
+  /**
+   * Orders subjects by the distance of their focus from the centroid of the chosen subjects, like
+   * the clustering script does with the focus matrix of its model, and keeps one page of them.
+   * Ties keep the order of the given subjects, subjects without a focus come last.
+   */
+  private static List<StudyProgramSubject> rankByFocusDistance(List<StudyProgramSubject> subjects,
+      List<List<Integer>> focusesAttributes, Integer limit, int offset) {
+    double[] centroid = new double[focusesAttributes.get(0).size()];
+    for (List<Integer> focusAttributes : focusesAttributes) {
+      for (int i = 0; i < centroid.length; i++) {
+        centroid[i] += (double) focusAttributes.get(i) / focusesAttributes.size();
+      }
+    }
+
+    double[] distances = new double[subjects.size()];
+    for (int subject = 0; subject < subjects.size(); subject++) {
+      Subject entity = subjects.get(subject).getSubject();
+      if (entity == null || entity.getFocus() == null) {
+        distances[subject] = Double.POSITIVE_INFINITY;
         continue;
       }
-      part = part.strip();
-      // TODO adds a constant number of subjects due to the model returning indexes from 0 for management subjects, FIX
-      result.add(studyProgramId == 3 ? Integer.parseInt(part) : Integer.parseInt(part) + 87);
+      List<Integer> focusAttributes = getFocusesAttributes(List.of(entity.getFocus())).get(0);
+      double squaredDistance = 0;
+      for (int i = 0; i < centroid.length; i++) {
+        double difference = focusAttributes.get(i) - centroid[i];
+        squaredDistance += difference * difference;
+      }
+      distances[subject] = Math.sqrt(squaredDistance);
     }
 
-    return findSubjectByIds(result);
+    // A stable sort keeps ties in the order of the subjects
+    return IntStream.range(0, subjects.size()).boxed()
+        .sorted(Comparator.comparingDouble(subject -> distances[subject])).skip(offset)
+        .limit(limit != null ? limit : Long.MAX_VALUE).map(subjects::get).toList();
   }
 
   @Override
   public List<StudyProgramSubject> findSubjectByIds(List<Integer> ids) {
-    List<StudyProgramSubject> subjectList = new ArrayList<>();
-
     User currentUser = this.authService.getCurrentUser().orElseThrow(() -> new RuntimeException("Cannot find user."));
 
+    // Loaded with one query, the returned list keeps the order of the ids
+    Map<Integer, StudyProgramSubject> subjectsById = studyProgramSubjectRepository
+        .findAllByIdSubjectIds(ids, currentUser.getStudent().getStudyProgramId()).stream()
+        .collect(Collectors.toMap(subject -> subject.getId().getSubjectId(), subject -> subject));
+
+    List<StudyProgramSubject> subjectList = new ArrayList<>();
     ids.forEach(id -> {
-        Integer fixedId = id + 1; // Due to data change
-      StudyProgramSubject subject = studyProgramSubjectRepository.findByIdSubjectId(fixedId, currentUser.getStudent().getStudyProgramId())
-          .orElseThrow(() -> new EntityNotFoundException(
-              String.format("Subject with id %d was not found!", id)));
+      StudyProgramSubject subject = subjectsById.get(id);
+      if (subject == null) {
+        throw new EntityNotFoundException(String.format("Subject with id %d was not found!", id));
+      }
       subjectList.add(subject);
     });
 
@@ -257,7 +317,7 @@ public class SubjectService implements ISubjectService {
   }
 
   @Override
-  public List<String> makePassingChancePrediction(String userEmail) {
+  public List<SubjectsPredictionsResult> makeMarkAndPassingChancePrediction(String userEmail) {
     Student userStudent = studentService.getStudentByUserEmail(userEmail);
     int studentYear = userStudent.getYear();
 
@@ -269,101 +329,24 @@ public class SubjectService implements ISubjectService {
 
     log.info("Subjects inputs: {}", subjectInputs);
 
-    Map<String, String> modelPaths =
-        subjectNames.stream().collect(Collectors.toMap(subjectName -> subjectName,
-            subjectName -> getModelPath(subjectName, ModelType.CHANCE)));
+    JsonNode output = this.pythonWorkerPool.call(this.subjectPredictionCommand.get(),
+        Map.of("data", subjectInputs));
 
-    ObjectMapper mapper = new ObjectMapper();
-    String inputJson;
-    String modelPathsJson;
-    try {
-      inputJson = mapper.writeValueAsString(Map.of("data", subjectInputs));
-      modelPathsJson = mapper.writeValueAsString(modelPaths);
-    } catch (JsonProcessingException e) {
-      throw new PythonOutputParsingException("Failed to create JSON input for the python script");
-    }
-
-      ProcessBuilder processBuilder = new ProcessBuilder(pythonExcecutablePath,
-              passingChangePredictionScriptPath, inputJson, modelPathsJson);
+    log.info("Output of makeMarkAndPassingChancePrediction: {}", output);
 
-    String output;
+    Map<String, SubjectsPredictionsResult> predictions;
     try {
-      output = ProcessUtils.getOutputFromProces(processBuilder, false);
-    } catch (IOException e) {
+      predictions = this.mapper.convertValue(output.required("results"), new TypeReference<>() {});
+    } catch (IllegalArgumentException e) {
       throw new PythonOutputParsingException(
-          "Error running Python passing chance script: " + e.getMessage());
+          String.format("There was an error parsing subject predictions. Output: %s", output));
     }
 
-    log.info("Output of makePassingChancePrediction: {}", output);
-
-    Map<String, String> predictions;
-    try {
-      predictions = mapper.readValue(output, new TypeReference<>() {});
-    } catch (IOException e) {
-      throw new PythonOutputParsingException(
-          String.format("There was an error parsing passing chance. Output: %s", output.trim()));
-    }
+    predictions.forEach((subjectName, prediction) -> prediction.setSubjectName(subjectName));
 
     log.info("Returning predictions: {}", predictions);
 
-    return predictions.entrySet().stream().map(entry -> entry.getKey() + ": " + entry.getValue())
-        .toList();
-  }
-
-  @Override
-  public List<String> makePassingMarkPrediction(String userEmail) {
-    Student userStudent = studentService.getStudentByUserEmail(userEmail);
-    int studentYear = userStudent.getYear();
-
-    List<String> subjectNames = this.getSubjectNamesToPredictByStudentsYear(studentYear);
-
-    Map<String, List<Integer>> subjectInputs = new HashMap<>();
-
-    subjectNames.forEach(subjectName -> subjectInputs.put(subjectName, this
-        .getMarksRequiredToPredictSubjectFromQuestionnaire(subjectName, userStudent.getUser())));
-
-    log.info("Subjects inputs: {}", subjectInputs);
-
-    Map<String, String> modelPaths =
-        subjectNames.stream().collect(Collectors.toMap(subjectName -> subjectName,
-            subjectName -> getModelPath(subjectName, ModelType.MARK)));
-
-    ObjectMapper mapper = new ObjectMapper();
-    String inputJson;
-    String modelPathsJson;
-
-    try {
-      inputJson = mapper.writeValueAsString(Map.of("data", subjectInputs));
-      modelPathsJson = mapper.writeValueAsString(modelPaths);
-    } catch (JsonProcessingException e) {
-      throw new PythonOutputParsingException("Failed to create JSON input for the python script");
-    }
-
-      ProcessBuilder processBuilder = new ProcessBuilder(pythonExcecutablePath,
-              passingMarkPredictionScriptPath, inputJson, modelPathsJson);
-
-    String output;
-    try {
-      output = ProcessUtils.getOutputFromProces(processBuilder, true);
-    } catch (IOException e) {
-      throw new PythonOutputParsingException(
-          "Error running Python prediction script: " + e.getMessage());
-    }
-
-    log.info("Output of makePassingMarkPrediction: {}", output);
-
-    Map<String, String> predictions;
-    try {
-      predictions = mapper.readValue(output, new TypeReference<>() {});
-    } catch (IOException e) {
-      throw new PythonOutputParsingException(
-          String.format("There was error parsing passing mark with output: %s ", output.trim()));
-    }
-
-    log.info("Returning predictions: {}", predictions);
-
-    return predictions.entrySet().stream().map(entry -> entry.getKey() + ": " + entry.getValue())
-        .toList();
+    return new ArrayList<>(predictions.values());
   }
 
     @Override
@@ -465,13 +448,6 @@ public class SubjectService implements ISubjectService {
     }
   }
 
-  private String getModelPath(String subjectName, ModelType type) {
-    return switch (type) {
-      case CHANCE -> CHANCE_MODEL_PATHS.get(subjectName);
-      case MARK -> MARK_MODEL_PATHS.get(subjectName);
-    };
-  }
-
   @Override
   public List<SubjectGrade> getFilteredSubjects(String sortCriteria, Integer numberOfSubjects) {
     Pageable pageable = PageRequest.of(0, numberOfSubjects);
@@ -0,0 +1,100 @@
+package sk.uniza.fri.alfri.util;
+
+import java.io.IOException;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.attribute.BasicFileAttributes;
+import java.util.ArrayList;
+import java.util.Comparator;
+import java.util.LinkedHashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.Optional;
+import org.springframework.beans.factory.annotation.Value;
+import org.springframework.stereotype.Component;
+import sk.uniza.fri.alfri.constant.ClusteringMode;
+
+/**
+ * LRU cache of the similar subjects returned by the clustering script, so that popular subject
+ * selections are answered without starting Python. The focus vectors of the chosen subjects are
+ * sorted, because the result does not depend on their order. All entries are dropped when a
+ * clustering model file changes.
+ */
+@Component
+public class ClusteringResultCache {
+  private static final Comparator<List<Integer>> VECTOR_ORDER = (first, second) -> {
+    for (int i = 0; i < Math.min(first.size(), second.size()); i++) {
+      int comparison = Integer.compare(first.get(i), second.get(i));
+      if (comparison != 0) {
+        return comparison;
+      }
+    }
+    return Integer.compare(first.size(), second.size());
+  };
+
+  private final Map<Key, List<Integer>> entries;
+  private List<Long> modelVersion = List.of();
+
+  public ClusteringResultCache(@Value("${python.clustering_result_cache_size:1024}") int capacity) {
+    this.entries = new LinkedHashMap<>(16, 0.75f, true) {
+      @Override
+      protected boolean removeEldestEntry(Map.Entry<Key, List<Integer>> eldest) {
+        return size() > capacity;
+      }
+    };
+  }
+
+  /**
+   * Key of one clustering request.
+   *
+   * @param focusVectors focus vectors of the chosen subjects in canonical order
+   * @param modelVersion modification times and sizes of the model files
+   */
+  public record Key(List<List<Integer>> focusVectors, Integer studyProgramId, ClusteringMode mode,
+      Integer limit, int offset, List<Long> modelVersion) {
+  }
+
+  /**
+   * @param modelPaths paths to the pickled clustering models, their metadata and focus matrices
+   *        next to them are part of the version too
+   */
+  public static Key key(List<List<Integer>> focusVectors, Integer studyProgramId,
+      ClusteringMode mode, Integer limit, int offset, List<String> modelPaths) {
+    List<List<Integer>> canonicalVectors =
+        focusVectors.stream().map(List::copyOf).sorted(VECTOR_ORDER).toList();
+    return new Key(canonicalVectors, studyProgramId, mode, limit, offset, modelVersion(modelPaths));
+  }
+
+  private static List<Long> modelVersion(List<String> modelPaths) {
+    List<Long> version = new ArrayList<>();
+    for (String modelPath : modelPaths) {
+      String basePath = modelPath.replaceFirst("\\.pkl$", "");
+      for (String path : List.of(modelPath, basePath + ".meta.json", basePath + ".focus.csv")) {
+        try {
+          BasicFileAttributes attributes = Files.readAttributes(Path.of(path), BasicFileAttributes.class);
+          version.add(attributes.lastModifiedTime().toMillis());
+          version.add(attributes.size());
+        } catch (IOException e) {
+          // Missing optional file
+          version.add(-1L);
+          version.add(-1L);
+        }
+      }
+    }
+    return version;
+  }
+
+  public synchronized Optional<List<Integer>> get(Key key) {
+    if (!key.modelVersion().equals(this.modelVersion)) {
+      this.entries.clear();
+      this.modelVersion = key.modelVersion();
+    }
+    return Optional.ofNullable(this.entries.get(key));
+  }
+
+  public synchronized void put(Key key, List<Integer> subjectIds) {
+    if (key.modelVersion().equals(this.modelVersion)) {
+      this.entries.put(key, List.copyOf(subjectIds));
+    }
+  }
+}
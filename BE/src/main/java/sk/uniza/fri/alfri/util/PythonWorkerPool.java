@@ -0,0 +1,362 @@
+package sk.uniza.fri.alfri.util;
+
+import com.fasterxml.jackson.core.JsonProcessingException;
+import com.fasterxml.jackson.databind.JsonNode;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import jakarta.annotation.PreDestroy;
+import java.io.BufferedReader;
+import java.io.BufferedWriter;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.io.OutputStreamWriter;
+import java.io.Writer;
+import java.nio.charset.StandardCharsets;
+import java.time.Duration;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Map;
+import java.util.Optional;
+import java.util.concurrent.BlockingDeque;
+import java.util.concurrent.BlockingQueue;
+import java.util.concurrent.ConcurrentHashMap;
+import java.util.concurrent.ExecutorService;
+import java.util.concurrent.Executors;
+import java.util.concurrent.LinkedBlockingDeque;
+import java.util.concurrent.LinkedBlockingQueue;
+import java.util.concurrent.ScheduledExecutorService;
+import java.util.concurrent.Semaphore;
+import java.util.concurrent.TimeUnit;
+import lombok.extern.slf4j.Slf4j;
+import org.springframework.beans.factory.annotation.Value;
+import org.springframework.stereotype.Component;
+import sk.uniza.fri.alfri.exception.PythonOutputParsingException;
+import sk.uniza.fri.alfri.exception.PythonWorkersBusyException;
+
+/**
+ * Pool of prediction scripts running in their --serve mode, see
+ * python_scripts/json_lines_worker.py, so that a request neither starts a process nor loads the
+ * models again. Every command gets at most poolSize workers, started on demand. A request waits at
+ * most the acquire timeout for a free worker and fails with {@link PythonWorkersBusyException}
+ * after it, so a burst of requests cannot start an unbounded number of processes. A worker which
+ * does not answer within the request timeout, exits or fails the periodic health check is killed
+ * and replaced.
+ */
+@Slf4j
+@Component
+public class PythonWorkerPool {
+  private static final ObjectMapper MAPPER = new ObjectMapper();
+  private static final String PING_REQUEST = "{\"ping\": true}";
+
+  private final int poolSize;
+  private final Duration startTimeout;
+  private final Duration requestTimeout;
+  private final Duration acquireTimeout;
+  private final Map<List<String>, Workers> workersByCommand = new ConcurrentHashMap<>();
+  private final ScheduledExecutorService healthChecks =
+      Executors.newSingleThreadScheduledExecutor(runnable -> {
+        Thread thread = new Thread(runnable, "python-worker-health-check");
+        thread.setDaemon(true);
+        return thread;
+      });
+  // Workers which failed the health check are started here, so that a slow start does not delay
+  // the checks of the other commands
+  private final ExecutorService restarts = Executors.newCachedThreadPool(runnable -> {
+    Thread thread = new Thread(runnable, "python-worker-restart");
+    thread.setDaemon(true);
+    return thread;
+  });
+  private volatile boolean closed;
+
+  public PythonWorkerPool(@Value("${python.worker_pool_size:2}") int poolSize,
+      @Value("${python.worker_start_timeout_ms:60000}") long startTimeoutMs,
+      @Value("${python.worker_request_timeout_ms:30000}") long requestTimeoutMs,
+      @Value("${python.worker_acquire_timeout_ms:2000}") long acquireTimeoutMs,
+      @Value("${python.worker_health_check_interval_ms:30000}") long healthCheckIntervalMs) {
+    this.poolSize = poolSize;
+    this.startTimeout = Duration.ofMillis(startTimeoutMs);
+    this.requestTimeout = Duration.ofMillis(requestTimeoutMs);
+    this.acquireTimeout = Duration.ofMillis(acquireTimeoutMs);
+    if (healthCheckIntervalMs > 0) {
+      this.healthChecks.scheduleWithFixedDelay(this::checkHealth, healthCheckIntervalMs,
+          healthCheckIntervalMs, TimeUnit.MILLISECONDS);
+    }
+  }
+
+  /**
+   * Sends one request to a worker of the command.
+   *
+   * @param command python executable, script path and the arguments of the script, --serve is
+   *        added
+   * @param request JSON serializable request, see the serve function of the script
+   * @return the response of the script
+   * @throws PythonWorkersBusyException if no worker of the command becomes free in time
+   * @throws PythonOutputParsingException if the worker fails, does not answer in time or answers
+   *         with an error
+   */
+  public JsonNode call(List<String> command, Object request) {
+    String requestLine;
+    try {
+      requestLine = MAPPER.writeValueAsString(request);
+    } catch (JsonProcessingException e) {
+      throw new PythonOutputParsingException("Failed to create JSON input for the python script");
+    }
+
+    JsonNode response =
+        this.workersByCommand.computeIfAbsent(List.copyOf(command), Workers::new).call(requestLine);
+    if (response.has("error")) {
+      throw new PythonOutputParsingException(
+          String.format("Python script error: %s", response.get("error").asText()));
+    }
+    return response;
+  }
+
+  private void checkHealth() {
+    try {
+      this.workersByCommand.values().forEach(Workers::checkHealth);
+    } catch (RuntimeException e) {
+      // An exception would cancel the next checks
+      log.error("Python worker health check failed", e);
+    }
+  }
+
+  @PreDestroy
+  public void close() {
+    this.closed = true;
+    this.healthChecks.shutdownNow();
+    this.restarts.shutdownNow();
+    this.workersByCommand.values().forEach(Workers::close);
+  }
+
+  /** Workers of one command, the idle ones are reused most recently used first. */
+  private final class Workers {
+    private final List<String> command;
+    private final Semaphore permits = new Semaphore(poolSize, true);
+    private final BlockingDeque<Worker> idle = new LinkedBlockingDeque<>();
+
+    private Workers(List<String> command) {
+      this.command = command;
+    }
+
+    private JsonNode call(String requestLine) {
+      acquire();
+      Worker worker = null;
+      try {
+        worker = takeWorker();
+        JsonNode response = worker.call(requestLine, requestTimeout);
+        this.idle.offerFirst(worker);
+        worker = null;
+        return response;
+      } finally {
+        if (worker != null) {
+          worker.destroy();
+        }
+        this.permits.release();
+      }
+    }
+
+    private void acquire() {
+      try {
+        if (this.permits.tryAcquire(acquireTimeout.toMillis(), TimeUnit.MILLISECONDS)) {
+          return;
+        }
+      } catch (InterruptedException e) {
+        Thread.currentThread().interrupt();
+      }
+      throw new PythonWorkersBusyException(String.format(
+          "All %d python workers of %s are busy, try again later", poolSize, this.command.get(1)));
+    }
+
+    private Worker takeWorker() {
+      Worker worker;
+      while ((worker = this.idle.pollFirst()) != null) {
+        if (worker.isAlive()) {
+          return worker;
+        }
+        log.warn("Python worker {} exited, replacing it", worker.pid());
+        worker.destroy();
+      }
+      return Worker.start(this.command, startTimeout);
+    }
+
+    /**
+     * Pings the idle workers, busy ones are left alone. Failed workers are replaced by
+     * {@link #restart} without holding a permit, so callers are not kept waiting for the start.
+     */
+    private void checkHealth() {
+      for (Worker worker : new ArrayList<>(this.idle)) {
+        if (!this.permits.tryAcquire()) {
+          return;
+        }
+        try {
+          if (!this.idle.remove(worker)) {
+            continue;
+          }
+          if (worker.isHealthy(requestTimeout)) {
+            this.idle.offerLast(worker);
+            continue;
+          }
+        } finally {
+          this.permits.release();
+        }
+
+        log.warn("Python worker {} failed the health check, restarting it", worker.pid());
+        worker.destroy();
+        restarts.execute(this::restart);
+      }
+    }
+
+    private void restart() {
+      Worker worker;
+      try {
+        worker = Worker.start(this.command, startTimeout);
+      } catch (PythonOutputParsingException e) {
+        log.error("Failed to restart a python worker: {}", e.getMessage());
+        return;
+      }
+      // Callers may have started workers on demand in the meantime
+      if (closed || this.idle.size() >= poolSize) {
+        worker.destroy();
+      } else {
+        this.idle.offerLast(worker);
+      }
+    }
+
+    private void close() {
+      Worker worker;
+      while ((worker = this.idle.pollFirst()) != null) {
+        worker.destroy();
+      }
+    }
+  }
+
+  /** One running script, its output is read by a daemon thread so that reads can time out. */
+  private static final class Worker {
+    private final Process process;
+    private final Writer stdin;
+    // Optional.empty() marks the end of the output, lines which are not responses are skipped
+    private final BlockingQueue<Optional<String>> lines = new LinkedBlockingQueue<>();
+
+    private Worker(Process process) {
+      this.process = process;
+      this.stdin = new BufferedWriter(
+          new OutputStreamWriter(process.getOutputStream(), StandardCharsets.UTF_8));
+
+      Thread reader = new Thread(this::readOutput, "python-worker-" + process.pid());
+      reader.setDaemon(true);
+      reader.start();
+    }
+
+    private static Worker start(List<String> command, Duration startTimeout) {
+      List<String> serveCommand = new ArrayList<>(command);
+      serveCommand.add("--serve");
+
+      Worker worker;
+      try {
+        worker = new Worker(new ProcessBuilder(serveCommand)
+            .redirectError(ProcessBuilder.Redirect.INHERIT).start());
+      } catch (IOException e) {
+        throw new PythonOutputParsingException(
+            String.format("Error starting python worker %s: %s", command.get(1), e.getMessage()));
+      }
+
+      try {
+        // The script announces that its models are loaded
+        JsonNode readyMessage = worker.readResponse(startTimeout);
+        if (!readyMessage.path("ready").asBoolean()) {
+          throw new PythonOutputParsingException(
+              String.format("Python worker %s did not start: %s", command.get(1), readyMessage));
+        }
+      } catch (RuntimeException e) {
+        worker.destroy();
+        throw e;
+      }
+      log.info("Started python worker {} for {}", worker.pid(), command.get(1));
+      return worker;
+    }
+
+    private void readOutput() {
+      try (BufferedReader stdout = new BufferedReader(
+          new InputStreamReader(this.process.getInputStream(), StandardCharsets.UTF_8))) {
+        String line;
+        while ((line = stdout.readLine()) != null) {
+          // Libraries may print to stdout too, only the JSON lines are responses
+          if (line.startsWith("{")) {
+            this.lines.add(Optional.of(line));
+          } else {
+            log.debug("Python worker {}: {}", pid(), line);
+          }
+        }
+      } catch (IOException e) {
+        log.debug("Python worker {} output closed: {}", pid(), e.getMessage());
+      }
+      this.lines.add(Optional.empty());
+    }
+
+    private JsonNode call(String requestLine, Duration timeout) {
+      try {
+        this.stdin.write(requestLine);
+        this.stdin.write('\n');
+        this.stdin.flush();
+      } catch (IOException e) {
+        throw new PythonOutputParsingException(
+            String.format("Error writing to python worker %d: %s", pid(), e.getMessage()));
+      }
+      return readResponse(timeout);
+    }
+
+    private JsonNode readResponse(Duration timeout) {
+      Optional<String> line;
+      try {
+        line = this.lines.poll(timeout.toMillis(), TimeUnit.MILLISECONDS);
+      } catch (InterruptedException e) {
+        Thread.currentThread().interrupt();
+        throw new PythonOutputParsingException(
+            String.format("Interrupted while waiting for python worker %d", pid()));
+      }
+      if (line == null) {
+        throw new PythonOutputParsingException(String.format(
+            "Python worker %d did not answer within %d ms", pid(), timeout.toMillis()));
+      }
+      if (line.isEmpty()) {
+        throw new PythonOutputParsingException(
+            String.format("Python worker %d exited without answering", pid()));
+      }
+
+      try {
+        return MAPPER.readTree(line.get());
+      } catch (JsonProcessingException e) {
+        throw new PythonOutputParsingException(
+            String.format("There was an error parsing python worker output: %s", line.get()));
+      }
+    }
+
+    private boolean isHealthy(Duration timeout) {
+      if (!isAlive()) {
+        return false;
+      }
+      try {
+        return call(PING_REQUEST, timeout).path("ready").asBoolean();
+      } catch (PythonOutputParsingException e) {
+        log.warn(e.getMessage());
+        return false;
+      }
+    }
+
+    private boolean isAlive() {
+      return this.process.isAlive();
+    }
+
+    private long pid() {
+      return this.process.pid();
+    }
+
+    private void destroy() {
+      this.process.destroyForcibly();
+      try {
+        this.stdin.close();
+      } catch (IOException e) {
+        // The process is gone already
+      }
+    }
+  }
+}
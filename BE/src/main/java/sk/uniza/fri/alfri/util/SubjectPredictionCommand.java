@@ -0,0 +1,58 @@
+package sk.uniza.fri.alfri.util;
+
+import com.fasterxml.jackson.core.JsonProcessingException;
+import com.fasterxml.jackson.databind.ObjectMapper;
+import java.util.List;
+import java.util.Map;
+import org.springframework.beans.factory.annotation.Value;
+import org.springframework.stereotype.Component;
+import sk.uniza.fri.alfri.exception.PythonOutputParsingException;
+
+/**
+ * Command of python_scripts/subject_predictions.py, which predicts the mark and the passing chance
+ * of a subject in one request. {@link PythonWorkerPool} keeps workers per command, so everyone
+ * calling the script with this command is served by the same workers.
+ */
+@Component
+public class SubjectPredictionCommand {
+  // The workers get the models of all subjects and load only the requested ones, so that every
+  // student is served by the same workers
+  private static final Map<String, String> CHANCE_MODEL_PATHS =
+      Map.of("Matematicka analyza 1", "python_scripts/models/mata1.pkl",
+          "Diskretna pravdepodobnost", "python_scripts/models/dp.pkl",
+          "Algoritmy a udajove struktury 1", "python_scripts/models/aus1.pkl",
+          "Diskretna simulacia", "python_scripts/models/model_DIS.pkl", "Optimalizacia sieti",
+          "python_scripts/models/model_OPTS.pkl", "Algoritmy a udajove struktury 2",
+          "python_scripts/models/model_AUS.pkl");
+
+  private static final Map<String, String> MARK_MODEL_PATHS =
+      Map.of("Matematicka analyza 1", "python_scripts/models/mata1.h5",
+          "Diskretna pravdepodobnost", "python_scripts/models/dp.h5",
+          "Algoritmy a udajove struktury 1", "python_scripts/models/aus1.h5",
+          "Diskretna simulacia", "python_scripts/models/best_model_DIS.h5",
+          "Optimalizacia sieti", "python_scripts/models/best_model_OPTS.h5",
+          "Algoritmy a udajove struktury 2", "python_scripts/models/best_model_AUS.h5");
+
+  private final List<String> command;
+
+  public SubjectPredictionCommand(ObjectMapper mapper,
+      @Value("${python.executable_path}") String pythonExecutablePath,
+      @Value("${python.subject_prediction_script_path}") String subjectPredictionScriptPath,
+      @Value("${python.prediction_tables_path}") String predictionTablesPath) {
+    try {
+      this.command = List.of(pythonExecutablePath, subjectPredictionScriptPath,
+          mapper.writeValueAsString(MARK_MODEL_PATHS),
+          mapper.writeValueAsString(CHANCE_MODEL_PATHS), "--lookup", predictionTablesPath);
+    } catch (JsonProcessingException e) {
+      throw new PythonOutputParsingException("Failed to create JSON input for the python script");
+    }
+  }
+
+  /**
+   * @return python executable, script path and the arguments of the script, see
+   *         {@link PythonWorkerPool#call}
+   */
+  public List<String> get() {
+    return this.command;
+  }
+}
@@ -0,0 +1,165 @@
+package sk.uniza.fri.alfri.util;
+
+import java.io.Closeable;
+import java.io.EOFException;
+import java.io.IOException;
+import java.net.StandardProtocolFamily;
+import java.net.UnixDomainSocketAddress;
+import java.nio.ByteBuffer;
+import java.nio.ByteOrder;
+import java.nio.channels.SocketChannel;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Path;
+import java.util.HashMap;
+import java.util.List;
+import java.util.Map;
+import java.util.Set;
+import sk.uniza.fri.alfri.exception.PythonOutputParsingException;
+
+/**
+ * Client of the binary protocol of the prediction scripts started with --socket, see
+ * python_scripts/binary_protocol.py. The marks are sent as int8 values encoded like
+ * MARK_MAPPING in SubjectService, so a request needs neither JSON nor a new process. One client
+ * holds one connection and sends one request at a time.
+ */
+public class UnixSocketModelClient implements Closeable {
+  public static final byte MARK = 1;
+  public static final byte CHANCE = 2;
+
+  private static final int FRAME_HEADER_SIZE = 4;
+  private static final int REQUEST_HEADER_SIZE = 6;
+  private static final int RESPONSE_HEADER_SIZE = 3;
+  private static final int MAX_FRAME_BYTES = 1024 * 1024;
+  // Limits of the uint16 row count and uint8 column count of the request header
+  private static final int MAX_ROWS = 0xFFFF;
+  private static final int MAX_COLUMNS = 0xFF;
+  private static final byte STATUS_OK = 0;
+
+  private final SocketChannel channel;
+  private final Map<String, Integer> subjectIds = new HashMap<>();
+
+  public UnixSocketModelClient(Path socketPath) throws IOException {
+    this.channel = SocketChannel.open(StandardProtocolFamily.UNIX);
+    try {
+      this.channel.connect(UnixDomainSocketAddress.of(socketPath));
+
+      // The server announces its subjects first, their positions are the subject ids
+      String hello = StandardCharsets.UTF_8.decode(readFrame()).toString();
+      List<String> subjects = hello.isEmpty() ? List.of() : List.of(hello.split("\n"));
+      for (int i = 0; i < subjects.size(); i++) {
+        this.subjectIds.put(subjects.get(i), i);
+      }
+    } catch (IOException | RuntimeException e) {
+      this.channel.close();
+      throw e;
+    }
+  }
+
+  public Set<String> getSubjects() {
+    return this.subjectIds.keySet();
+  }
+
+  /**
+   * @param subject subject name as in the model paths of the script
+   * @param rows encoded marks, one row of the same length per prediction
+   * @return predicted class of every row, 0 for A up to 6 for a missing mark
+   */
+  public synchronized byte[] predictMarks(String subject, byte[][] rows) throws IOException {
+    ByteBuffer response = call(MARK, subject, rows);
+    byte[] classes = new byte[response.remaining()];
+    response.get(classes);
+    return classes;
+  }
+
+  /**
+   * @param subject subject name as in the model paths of the script
+   * @param rows encoded marks, one row of the same length per prediction
+   * @return probability of passing from 0 to 1 for every row
+   */
+  public synchronized float[] predictPassingProbabilities(String subject, byte[][] rows)
+      throws IOException {
+    ByteBuffer response = call(CHANCE, subject, rows);
+    float[] probabilities = new float[response.remaining() / Float.BYTES];
+    response.asFloatBuffer().get(probabilities);
+    return probabilities;
+  }
+
+  private ByteBuffer call(byte requestType, String subject, byte[][] rows) throws IOException {
+    Integer subjectId = this.subjectIds.get(subject);
+    if (subjectId == null) {
+      throw new IllegalArgumentException(
+          String.format("The socket worker has no model for subject %s", subject));
+    }
+    int columns = rows.length == 0 ? 0 : rows[0].length;
+    if (rows.length > MAX_ROWS) {
+      throw new IllegalArgumentException(
+          String.format("A request can have at most %d rows, got %d", MAX_ROWS, rows.length));
+    }
+    if (columns > MAX_COLUMNS) {
+      throw new IllegalArgumentException(
+          String.format("A request can have at most %d marks per row, got %d", MAX_COLUMNS, columns));
+    }
+    int payloadSize = REQUEST_HEADER_SIZE + rows.length * columns;
+    if (payloadSize > MAX_FRAME_BYTES) {
+      throw new IllegalArgumentException(String.format(
+          "A request of %dx%d marks is larger than %d bytes, split it", rows.length, columns,
+          MAX_FRAME_BYTES));
+    }
+
+    ByteBuffer request =
+        ByteBuffer.allocate(FRAME_HEADER_SIZE + payloadSize).order(ByteOrder.LITTLE_ENDIAN);
+    request.putInt(payloadSize);
+    request.put(requestType).putShort(subjectId.shortValue()).putShort((short) rows.length)
+        .put((byte) columns);
+    for (byte[] row : rows) {
+      if (row.length != columns) {
+        throw new IllegalArgumentException("All rows must have the same number of marks");
+      }
+      request.put(row);
+    }
+    request.flip();
+    while (request.hasRemaining()) {
+      this.channel.write(request);
+    }
+
+    ByteBuffer response = readFrame();
+    if (response.remaining() < RESPONSE_HEADER_SIZE) {
+      throw new PythonOutputParsingException("Socket worker response is shorter than its header");
+    }
+    byte status = response.get();
+    int count = Short.toUnsignedInt(response.getShort());
+    if (status != STATUS_OK) {
+      throw new PythonOutputParsingException(String.format("Socket worker error: %s",
+          StandardCharsets.UTF_8.decode(response)));
+    }
+    if (count != rows.length) {
+      throw new PythonOutputParsingException(
+          String.format("Socket worker returned %d values for %d rows", count, rows.length));
+    }
+    return response.slice().order(ByteOrder.LITTLE_ENDIAN);
+  }
+
+  private ByteBuffer readFrame() throws IOException {
+    ByteBuffer header = readFully(FRAME_HEADER_SIZE);
+    int length = header.getInt();
+    if (length < 0 || length > MAX_FRAME_BYTES) {
+      throw new PythonOutputParsingException(String.format("Invalid frame length %d", length));
+    }
+    return readFully(length);
+  }
+
+  private ByteBuffer readFully(int size) throws IOException {
+    ByteBuffer buffer = ByteBuffer.allocate(size).order(ByteOrder.LITTLE_ENDIAN);
+    while (buffer.hasRemaining()) {
+      if (this.channel.read(buffer) < 0) {
+        throw new EOFException("Socket worker closed the connection");
+      }
+    }
+    return buffer.flip();
+  }
+
+  @Override
+  public void close() throws IOException {
+    this.channel.close();
+  }
+}
@@ -0,0 +1,58 @@
+package sk.uniza.fri.alfri.util;
+
+import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertTrue;
+
+import java.io.IOException;
+import java.nio.file.Files;
+import java.nio.file.Path;
+import java.nio.file.attribute.FileTime;
+import java.util.List;
+import java.util.Optional;
+import org.junit.jupiter.api.BeforeEach;
+import org.junit.jupiter.api.Test;
+import org.junit.jupiter.api.io.TempDir;
+import sk.uniza.fri.alfri.constant.ClusteringMode;
+
+class ClusteringResultCacheTest {
+  private static final List<List<Integer>> FOCUS_VECTORS =
+      List.of(List.of(10, 2, 3, 0), List.of(8, 6, 7, 0), List.of(8, 6, 1, 0));
+
+  @TempDir
+  Path modelDirectory;
+
+  private Path modelPath;
+  private ClusteringResultCache cache;
+
+  @BeforeEach
+  void createModel() throws IOException {
+    this.modelPath = Files.writeString(this.modelDirectory.resolve("kmeans_model.pkl"), "model");
+    this.cache = new ClusteringResultCache(16);
+  }
+
+  private ClusteringResultCache.Key key(List<List<Integer>> focusVectors) {
+    return ClusteringResultCache.key(focusVectors, 3, ClusteringMode.BLEND, 10, 0,
+        List.of(this.modelPath.toString()));
+  }
+
+  @Test
+  void keyDoesNotDependOnFocusVectorOrder() {
+    List<List<Integer>> reversed = List.of(FOCUS_VECTORS.get(2), FOCUS_VECTORS.get(1),
+        FOCUS_VECTORS.get(0));
+    this.cache.put(key(FOCUS_VECTORS), List.of(4, 2));
+
+    assertEquals(key(FOCUS_VECTORS), key(reversed));
+    assertEquals(Optional.of(List.of(4, 2)), this.cache.get(key(reversed)));
+  }
+
+  @Test
+  void changedModelFileDropsTheEntries() throws IOException {
+    this.cache.put(key(FOCUS_VECTORS), List.of(4, 2));
+    assertEquals(Optional.of(List.of(4, 2)), this.cache.get(key(FOCUS_VECTORS)));
+
+    FileTime modified = Files.getLastModifiedTime(this.modelPath);
+    Files.setLastModifiedTime(this.modelPath, FileTime.fromMillis(modified.toMillis() + 10_000));
+
+    assertTrue(this.cache.get(key(FOCUS_VECTORS)).isEmpty());
+  }
+}
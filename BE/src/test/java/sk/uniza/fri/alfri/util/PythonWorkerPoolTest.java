@@ -0,0 +1,69 @@
+package sk.uniza.fri.alfri.util;
+
+import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertNotEquals;
+import static org.junit.jupiter.api.Assertions.assertThrows;
+
+import com.fasterxml.jackson.databind.JsonNode;
+import java.util.List;
+import java.util.Map;
+import java.util.Objects;
+import java.util.concurrent.CompletableFuture;
+import java.util.concurrent.TimeUnit;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.Test;
+import sk.uniza.fri.alfri.exception.PythonWorkersBusyException;
+
+class PythonWorkerPoolTest {
+  private static final String PYTHON =
+      Objects.requireNonNullElse(System.getenv("PYTHON_DEV_EXECUTABLE_PATH"), "python3");
+
+  // Stand-in for a prediction script in its --serve mode, answers every request with its pid
+  // after sleeping for the requested number of seconds
+  private static final String WORKER_SCRIPT = """
+      import json, os, sys, time
+      print(json.dumps({"ready": True}), flush=True)
+      for line in sys.stdin:
+          time.sleep(json.loads(line).get("sleep", 0))
+          print(json.dumps({"ready": True, "pid": os.getpid()}), flush=True)
+      """;
+
+  private static final List<String> COMMAND = List.of(PYTHON, "-c", WORKER_SCRIPT);
+
+  private PythonWorkerPool pool;
+
+  @AfterEach
+  void closePool() {
+    this.pool.close();
+  }
+
+  @Test
+  void callFailsWhenEveryWorkerStaysBusy() throws Exception {
+    this.pool = new PythonWorkerPool(1, 10_000, 10_000, 200, 0);
+    this.pool.call(COMMAND, Map.of());
+
+    CompletableFuture<JsonNode> slowCall =
+        CompletableFuture.supplyAsync(() -> this.pool.call(COMMAND, Map.of("sleep", 2)));
+    // Let the slow call take the only worker
+    Thread.sleep(500);
+
+    assertThrows(PythonWorkersBusyException.class, () -> this.pool.call(COMMAND, Map.of()));
+    assertEquals(true, slowCall.get(10, TimeUnit.SECONDS).path("ready").asBoolean());
+  }
+
+  @Test
+  void deadWorkerIsReplaced() throws Exception {
+    this.pool = new PythonWorkerPool(1, 10_000, 10_000, 2_000, 0);
+    long firstPid = this.pool.call(COMMAND, Map.of()).path("pid").asLong();
+
+    ProcessHandle firstWorker = ProcessHandle.of(firstPid).orElseThrow();
+    firstWorker.destroyForcibly();
+    firstWorker.onExit().get(10, TimeUnit.SECONDS);
+    // The exit is recorded on the Process of the worker asynchronously
+    Thread.sleep(200);
+
+    long secondPid = this.pool.call(COMMAND, Map.of()).path("pid").asLong();
+    assertNotEquals(0, secondPid);
+    assertNotEquals(firstPid, secondPid);
+  }
+}
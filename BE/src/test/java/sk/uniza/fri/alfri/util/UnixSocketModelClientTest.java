@@ -0,0 +1,116 @@
+package sk.uniza.fri.alfri.util;
+
+import static org.junit.jupiter.api.Assertions.assertArrayEquals;
+import static org.junit.jupiter.api.Assertions.assertEquals;
+import static org.junit.jupiter.api.Assertions.assertNotNull;
+import static org.junit.jupiter.api.Assertions.assertThrows;
+
+import java.io.BufferedReader;
+import java.io.IOException;
+import java.io.InputStreamReader;
+import java.nio.charset.StandardCharsets;
+import java.nio.file.Path;
+import java.util.ArrayList;
+import java.util.List;
+import java.util.Objects;
+import java.util.Set;
+import java.util.concurrent.TimeUnit;
+import org.junit.jupiter.api.AfterEach;
+import org.junit.jupiter.api.Test;
+import org.junit.jupiter.api.io.TempDir;
+import sk.uniza.fri.alfri.exception.PythonOutputParsingException;
+
+class UnixSocketModelClientTest {
+  private static final String PYTHON =
+      Objects.requireNonNullElse(System.getenv("PYTHON_DEV_EXECUTABLE_PATH"), "python3");
+  private static final Path SCRIPTS_DIRECTORY = Path.of("python_scripts");
+
+  private static final String MARK_SUBJECT = "Matematicka analyza 1";
+  private static final String CHANCE_SUBJECT = "Diskretna pravdepodobnost";
+
+  @TempDir
+  Path socketDirectory;
+
+  private final List<Process> workers = new ArrayList<>();
+
+  @AfterEach
+  void stopWorkers() throws InterruptedException {
+    // Waited for, the workers remove their socket files from the temporary directory on exit
+    for (Process worker : this.workers) {
+      worker.destroy();
+      worker.waitFor(10, TimeUnit.SECONDS);
+    }
+  }
+
+  private Path startWorker(String script, String subject, String modelFile) throws IOException {
+    Path socketPath = this.socketDirectory.resolve(script + ".sock");
+    String modelPaths = String.format("{\"%s\": \"%s\"}", subject,
+        SCRIPTS_DIRECTORY.resolve("models").resolve(modelFile));
+    Process worker = new ProcessBuilder(PYTHON, SCRIPTS_DIRECTORY.resolve(script).toString(),
+        "--socket", socketPath.toString(), modelPaths)
+        .redirectError(ProcessBuilder.Redirect.INHERIT).start();
+    this.workers.add(worker);
+
+    // The worker writes its ready line once the socket accepts connections
+    BufferedReader output = new BufferedReader(
+        new InputStreamReader(worker.getInputStream(), StandardCharsets.UTF_8));
+    assertNotNull(output.readLine(), "The socket worker exited before it was ready");
+    return socketPath;
+  }
+
+  @Test
+  void predictsMarksOverTheSocket() throws IOException {
+    Path socketPath = startWorker("neural_network_marks_predictions.py", MARK_SUBJECT, "mata1.h5");
+
+    try (UnixSocketModelClient client = new UnixSocketModelClient(socketPath)) {
+      assertEquals(Set.of(MARK_SUBJECT), client.getSubjects());
+      // Rows of every class the model predicts
+      byte[][] rows = {{0, 0, 0}, {2, 0, 1}, {0, 0, 2}, {0, 2, 0}, {1, 0, 1}, {0, 4, 0}};
+
+      assertArrayEquals(new byte[] {0, 1, 2, 4, 5, 6}, client.predictMarks(MARK_SUBJECT, rows));
+      assertArrayEquals(new byte[0], client.predictMarks(MARK_SUBJECT, new byte[0][]));
+    }
+  }
+
+  @Test
+  void predictsPassingProbabilitiesOverTheSocket() throws IOException {
+    Path socketPath = startWorker("passing_chance_prediction.py", CHANCE_SUBJECT, "dp.pkl");
+
+    try (UnixSocketModelClient client = new UnixSocketModelClient(socketPath)) {
+      float[] probabilities =
+          client.predictPassingProbabilities(CHANCE_SUBJECT, new byte[][] {{0, 0}, {4, 6}});
+
+      assertArrayEquals(new float[] {0.69715244f, 0.61873126f}, probabilities, 1e-6f);
+    }
+  }
+
+  @Test
+  void rejectsRequestsLargerThanTheHeader() throws IOException {
+    Path socketPath = startWorker("neural_network_marks_predictions.py", MARK_SUBJECT, "mata1.h5");
+
+    try (UnixSocketModelClient client = new UnixSocketModelClient(socketPath)) {
+      assertThrows(IllegalArgumentException.class,
+          () -> client.predictMarks(MARK_SUBJECT, new byte[65536][1]));
+      assertThrows(IllegalArgumentException.class,
+          () -> client.predictMarks(MARK_SUBJECT, new byte[1][256]));
+      assertThrows(IllegalArgumentException.class,
+          () -> client.predictMarks(MARK_SUBJECT, new byte[5000][255]));
+      assertThrows(IllegalArgumentException.class,
+          () -> client.predictMarks("Unknown subject", new byte[][] {{0, 0, 0}}));
+
+      // Nothing was sent, the connection still answers
+      assertArrayEquals(new byte[] {0}, client.predictMarks(MARK_SUBJECT, new byte[][] {{0, 0, 0}}));
+    }
+  }
+
+  @Test
+  void reportsErrorsOfTheWorker() throws IOException {
+    Path socketPath = startWorker("neural_network_marks_predictions.py", MARK_SUBJECT, "mata1.h5");
+
+    try (UnixSocketModelClient client = new UnixSocketModelClient(socketPath)) {
+      assertThrows(PythonOutputParsingException.class,
+          () -> client.predictMarks(MARK_SUBJECT, new byte[][] {{0, 0}}));
+      assertArrayEquals(new byte[] {0}, client.predictMarks(MARK_SUBJECT, new byte[][] {{0, 0, 0}}));
+    }
+  }
+}
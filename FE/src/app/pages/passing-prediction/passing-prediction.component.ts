@@ -38,9 +38,10 @@ export class PassingPredictionComponent implements OnInit {
         this.subjects = predictionResult;
 
         this.subjects.forEach((subject) => {
-          subject.recommendations = this.generateRecommendations(
-            subject.passingProbability,
-          );
+          subject.recommendations =
+            subject.passingProbability === null
+              ? []
+              : this.generateRecommendations(subject.passingProbability);
         });
       });
   }
@@ -209,7 +209,7 @@ export interface SubjectGradesDto {
 
 export interface SubjectPassingPrediction {
   subjectName: string;
-  passingProbability: number;
+  passingProbability: number | null;
   mark: string;
   recommendations?: string[];
 }